@@ -38,6 +38,16 @@ client = ElevenLabs(
     api_key=st.secrets["elevenlabs_api_key"],
 )
 
+# MP3 formats only: the player below embeds the clip as audio/mp3
+DEFAULT_OUTPUT_FORMAT = "mp3_22050_32"
+MP3_OUTPUT_FORMATS = {
+    "mp3_22050_32", "mp3_44100_32", "mp3_44100_64", "mp3_44100_96", "mp3_44100_128", "mp3_44100_192"
+}
+TTS_OUTPUT_FORMAT = st.secrets.get("elevenlabs_output_format", DEFAULT_OUTPUT_FORMAT)
+if TTS_OUTPUT_FORMAT not in MP3_OUTPUT_FORMATS:
+    print(f"Unsupported elevenlabs_output_format {TTS_OUTPUT_FORMAT!r}, using {DEFAULT_OUTPUT_FORMAT}")
+    TTS_OUTPUT_FORMAT = DEFAULT_OUTPUT_FORMAT
+
 # player = mpv.MPV(input_default_bindings=True, input_vo_keyboard=True, osc=True)
 
 
@@ -117,7 +127,7 @@ def text_to_speech_file(text: str) -> str:
     # Calling the text_to_speech conversion API with detailed parameters
     response = client.text_to_speech.convert(
         voice_id="9BWtsMINqrJLrRacOk9x",  # Aria pre-made voice
-        output_format="mp3_22050_32",
+        output_format=TTS_OUTPUT_FORMAT,
         text=text,
         # model_id="eleven_flash_v2_5",
         model_id="eleven_multilingual_v2",
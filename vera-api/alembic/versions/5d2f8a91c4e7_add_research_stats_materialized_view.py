@@ -0,0 +1,72 @@
+"""Add research stats materialized view
+
+Revision ID: 5d2f8a91c4e7
+Revises: 694a65473b3d
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2f8a91c4e7'
+down_revision = '694a65473b3d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Per research ID totals, refreshed periodically by StatsService
+    op.execute("""
+        CREATE MATERIALIZED VIEW IF NOT EXISTS vera_research_stats AS
+        SELECT
+            r.id AS research_id_fk,
+            COALESCE(s.total_sessions, 0) AS total_sessions,
+            COALESCE(m.total_messages, 0) AS total_messages,
+            COALESCE(m.total_conversations, 0) AS total_conversations,
+            m.last_activity
+        FROM vera_research_ids r
+        LEFT JOIN (
+            SELECT research_id_fk, COUNT(*) AS total_sessions
+            FROM vera_user_sessions
+            GROUP BY research_id_fk
+        ) s ON s.research_id_fk = r.id
+        LEFT JOIN (
+            SELECT
+                research_id_fk,
+                COUNT(*) AS total_messages,
+                COUNT(DISTINCT conversation_id) AS total_conversations,
+                MAX(timestamp) AS last_activity
+            FROM vera_conversations
+            GROUP BY research_id_fk
+        ) m ON m.research_id_fk = r.id
+    """)
+
+    # Unique index is required for REFRESH MATERIALIZED VIEW CONCURRENTLY
+    op.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS ix_vera_research_stats_research_id_fk
+        ON vera_research_stats (research_id_fk)
+    """)
+
+    # When the view was last refreshed, shared by all replicas so only one
+    # of them refreshes it per interval
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS vera_stats_refresh (
+            id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+            refreshed_at TIMESTAMP WITH TIME ZONE
+        )
+    """)
+    op.execute("INSERT INTO vera_stats_refresh (id) VALUES (1) ON CONFLICT DO NOTHING")
+
+    # Rolling 24h active-session window
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_vera_user_sessions_last_active
+        ON vera_user_sessions (last_active)
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_vera_user_sessions_last_active")
+    op.execute("DROP TABLE IF EXISTS vera_stats_refresh")
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS vera_research_stats")
@@ -0,0 +1,85 @@
+"""Unique index on ElevenLabs conversation and message IDs
+
+Revision ID: 8b4e1c7d2a90
+Revises: 5d2f8a91c4e7
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b4e1c7d2a90'
+down_revision = '5d2f8a91c4e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Move duplicate synced messages out of the table, keeping the earliest
+    # row. The copies are kept in vera_conversations_duplicates for review
+    # and downgrade() puts them back.
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS vera_conversations_duplicates
+        (LIKE vera_conversations)
+    """)
+    op.execute("""
+        WITH duplicates AS (
+            DELETE FROM vera_conversations a
+            USING vera_conversations b
+            WHERE a.elevenlabs_message_id IS NOT NULL
+              AND a.elevenlabs_conversation_id = b.elevenlabs_conversation_id
+              AND a.elevenlabs_message_id = b.elevenlabs_message_id
+              AND a.id > b.id
+            RETURNING a.*
+        )
+        INSERT INTO vera_conversations_duplicates
+        SELECT * FROM duplicates
+    """)
+    moved = op.get_bind().execute(
+        sa.text("SELECT COUNT(*) FROM vera_conversations_duplicates")
+    ).scalar()
+    if moved:
+        print(f"Moved {moved} duplicate ElevenLabs messages to vera_conversations_duplicates")
+
+    # Give messages synced without an ElevenLabs message ID the positional
+    # ID (turn_<n>) the sync now assigns, so re-syncing them conflicts with
+    # the existing rows instead of inserting a second copy. n counts every
+    # remaining message of the conversation in transcript order, so this
+    # runs after the duplicates are moved out.
+    op.execute("""
+        UPDATE vera_conversations c
+        SET elevenlabs_message_id = 'turn_' || (n.position - 1)
+        FROM (
+            SELECT
+                id,
+                row_number() OVER (
+                    PARTITION BY elevenlabs_conversation_id
+                    ORDER BY timestamp, id
+                ) AS position
+            FROM vera_conversations
+            WHERE elevenlabs_conversation_id IS NOT NULL
+        ) n
+        WHERE c.id = n.id
+          AND c.elevenlabs_message_id IS NULL
+    """)
+
+    # Enables INSERT ... ON CONFLICT DO NOTHING for transcript sync
+    op.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_elevenlabs_conversation_message
+        ON vera_conversations (elevenlabs_conversation_id, elevenlabs_message_id)
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS uq_elevenlabs_conversation_message")
+
+    # Restore the duplicates upgrade() moved aside. Backfilled turn_<n> IDs
+    # are left in place; the older sync code handles rows with an ID.
+    op.execute("""
+        INSERT INTO vera_conversations
+        SELECT * FROM vera_conversations_duplicates
+        ON CONFLICT (id) DO NOTHING
+    """)
+    op.execute("DROP TABLE IF EXISTS vera_conversations_duplicates")
@@ -0,0 +1,45 @@
+"""Add LLM usage table
+
+Revision ID: c3a7e5f1b2d4
+Revises: 8b4e1c7d2a90
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3a7e5f1b2d4'
+down_revision = '8b4e1c7d2a90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS vera_llm_usage (
+            id SERIAL PRIMARY KEY,
+            research_id_fk INTEGER NOT NULL REFERENCES vera_research_ids(id),
+            conversation_id VARCHAR(255),
+            model VARCHAR(100) NOT NULL,
+            provider VARCHAR(20) NOT NULL,
+            prompt_tokens INTEGER,
+            completion_tokens INTEGER,
+            cached_tokens INTEGER,
+            first_token_ms INTEGER,
+            duration_ms INTEGER,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+        )
+    """)
+
+    op.execute("CREATE INDEX IF NOT EXISTS ix_vera_llm_usage_id ON vera_llm_usage (id)")
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_llm_usage_research_created
+        ON vera_llm_usage (research_id_fk, created_at)
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_llm_usage_created ON vera_llm_usage (created_at)")
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS vera_llm_usage")
@@ -1,24 +1,31 @@
 """
 Admin endpoints for managing research IDs and viewing statistics
 """
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
-from typing import List
+from typing import List, Literal, Optional
 import os
 
-from app.db.base import get_db
-from app.models.database import ResearchID, UserSession, Conversation, DisclaimerAcknowledgment
+from app.db.base import get_async_db
+from app.models.database import ResearchID, UserSession, Conversation, DisclaimerAcknowledgment, LLMUsage
 from app.schemas.admin import (
     AdminAuth,
     ResearchIDCreate,
     ResearchIDUpdate,
     ResearchIDDetail,
-    AdminStatsResponse
+    AdminStatsResponse,
+    UsageAggregate,
+    UsageReportResponse
 )
-from app.core.security import verify_admin_password
+from app.core.security import verify_admin_password, identity_cache
 from app.core.config import get_settings
+from app.services.tts_service import tts_service
+from app.services.stats_service import stats_service
+from app.services.message_writer import message_writer
+from app.services.llm_service import llm_service
+from app.services.response_cache import response_cache
 
 router = APIRouter()
 
@@ -37,15 +44,16 @@ def verify_admin(auth: AdminAuth):
 async def create_research_id(
     data: ResearchIDCreate,
     auth: AdminAuth,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new research ID (admin only)"""
     verify_admin(auth)
 
     # Check if research ID already exists
-    existing = db.query(ResearchID).filter(
-        ResearchID.research_id == data.research_id
-    ).first()
+    result = await db.execute(
+        select(ResearchID).where(ResearchID.research_id == data.research_id)
+    )
+    existing = result.scalars().first()
 
     if existing:
         raise HTTPException(
@@ -61,8 +69,8 @@ async def create_research_id(
     )
 
     db.add(research_id)
-    db.commit()
-    db.refresh(research_id)
+    await db.commit()
+    await db.refresh(research_id)
 
     return ResearchIDDetail(
         id=research_id.id,
@@ -76,48 +84,93 @@ async def create_research_id(
     )
 
 
+def research_id_detail_query():
+    """
+    Select each research ID with its session count, message count and last
+    activity in one statement, using grouped subqueries instead of three
+    follow-up queries per row.
+    """
+    session_counts = select(
+        UserSession.research_id_fk,
+        func.count(UserSession.id).label("total_sessions")
+    ).group_by(UserSession.research_id_fk).subquery()
+
+    message_stats = select(
+        Conversation.research_id_fk,
+        func.count(Conversation.id).label("total_messages"),
+        func.max(Conversation.timestamp).label("last_activity")
+    ).group_by(Conversation.research_id_fk).subquery()
+
+    total_sessions = func.coalesce(session_counts.c.total_sessions, 0).label("total_sessions")
+    total_messages = func.coalesce(message_stats.c.total_messages, 0).label("total_messages")
+    last_activity = message_stats.c.last_activity.label("last_activity")
+
+    query = select(
+        ResearchID, total_sessions, total_messages, last_activity
+    ).outerjoin(
+        session_counts, session_counts.c.research_id_fk == ResearchID.id
+    ).outerjoin(
+        message_stats, message_stats.c.research_id_fk == ResearchID.id
+    )
+
+    sort_columns = {
+        "research_id": ResearchID.research_id,
+        "created_at": ResearchID.created_at,
+        "total_sessions": total_sessions,
+        "total_messages": total_messages,
+        "last_activity": last_activity,
+    }
+    return query, sort_columns
+
+
+def research_id_detail(row) -> ResearchIDDetail:
+    """Build a ResearchIDDetail from a research_id_detail_query() row"""
+    rid = row.ResearchID
+    return ResearchIDDetail(
+        id=rid.id,
+        research_id=rid.research_id,
+        created_at=rid.created_at,
+        is_active=rid.is_active,
+        notes=rid.notes,
+        total_sessions=row.total_sessions,
+        total_messages=row.total_messages,
+        last_activity=row.last_activity
+    )
+
+
 @router.get("/research-ids", response_model=List[ResearchIDDetail])
 async def list_research_ids(
     auth: AdminAuth,
-    db: Session = Depends(get_db),
-    include_inactive: bool = False
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    include_inactive: bool = False,
+    limit: Optional[int] = Query(default=None, ge=1, le=1000),
+    offset: int = Query(default=0, ge=0),
+    sort_by: Literal[
+        "research_id", "created_at", "total_sessions", "total_messages", "last_activity"
+    ] = "research_id",
+    sort_order: Literal["asc", "desc"] = "asc"
 ):
-    """List all research IDs (admin only)"""
+    """
+    List research IDs with usage statistics, sorted and optionally paginated (admin only).
+    The total number of matching research IDs is returned in the X-Total-Count header.
+    """
     verify_admin(auth)
 
-    query = db.query(ResearchID)
+    query, sort_columns = research_id_detail_query()
+    count_query = select(func.count(ResearchID.id))
     if not include_inactive:
-        query = query.filter(ResearchID.is_active == True)
-
-    research_ids = query.all()
-
-    result = []
-    for rid in research_ids:
-        # Get statistics
-        total_sessions = db.query(UserSession).filter(
-            UserSession.research_id_fk == rid.id
-        ).count()
+        query = query.where(ResearchID.is_active == True)
+        count_query = count_query.where(ResearchID.is_active == True)
 
-        total_messages = db.query(Conversation).filter(
-            Conversation.research_id_fk == rid.id
-        ).count()
+    sort_column = sort_columns[sort_by]
+    sort_column = sort_column.desc().nulls_last() if sort_order == "desc" else sort_column.asc().nulls_first()
+    query = query.order_by(sort_column, ResearchID.id).offset(offset).limit(limit)
 
-        last_activity = db.query(func.max(Conversation.timestamp)).filter(
-            Conversation.research_id_fk == rid.id
-        ).scalar()
+    rows = (await db.execute(query)).all()
+    response.headers["X-Total-Count"] = str(await db.scalar(count_query))
 
-        result.append(ResearchIDDetail(
-            id=rid.id,
-            research_id=rid.research_id,
-            created_at=rid.created_at,
-            is_active=rid.is_active,
-            notes=rid.notes,
-            total_sessions=total_sessions,
-            total_messages=total_messages,
-            last_activity=last_activity
-        ))
-
-    return result
+    return [research_id_detail(row) for row in rows]
 
 
 @router.patch("/research-ids/{research_id_str}", response_model=ResearchIDDetail)
@@ -125,14 +178,15 @@ async def update_research_id(
     research_id_str: str,
     data: ResearchIDUpdate,
     auth: AdminAuth,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update a research ID (admin only)"""
     verify_admin(auth)
 
-    research_id = db.query(ResearchID).filter(
-        ResearchID.research_id == research_id_str
-    ).first()
+    result = await db.execute(
+        select(ResearchID).where(ResearchID.research_id == research_id_str)
+    )
+    research_id = result.scalars().first()
 
     if not research_id:
         raise HTTPException(
@@ -145,46 +199,29 @@ async def update_research_id(
     if data.notes is not None:
         research_id.notes = data.notes
 
-    db.commit()
-    db.refresh(research_id)
+    await db.commit()
+    identity_cache.invalidate_research_id(research_id.research_id)
 
-    # Get statistics
-    total_sessions = db.query(UserSession).filter(
-        UserSession.research_id_fk == research_id.id
-    ).count()
+    # Reload with statistics in a single query
+    query, _ = research_id_detail_query()
+    row = (await db.execute(query.where(ResearchID.id == research_id.id))).one()
 
-    total_messages = db.query(Conversation).filter(
-        Conversation.research_id_fk == research_id.id
-    ).count()
-
-    last_activity = db.query(func.max(Conversation.timestamp)).filter(
-        Conversation.research_id_fk == research_id.id
-    ).scalar()
-
-    return ResearchIDDetail(
-        id=research_id.id,
-        research_id=research_id.research_id,
-        created_at=research_id.created_at,
-        is_active=research_id.is_active,
-        notes=research_id.notes,
-        total_sessions=total_sessions,
-        total_messages=total_messages,
-        last_activity=last_activity
-    )
+    return research_id_detail(row)
 
 
 @router.delete("/research-ids/{research_id_str}")
 async def delete_research_id(
     research_id_str: str,
     auth: AdminAuth,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete a research ID (admin only) - sets to inactive instead of deleting"""
     verify_admin(auth)
 
-    research_id = db.query(ResearchID).filter(
-        ResearchID.research_id == research_id_str
-    ).first()
+    result = await db.execute(
+        select(ResearchID).where(ResearchID.research_id == research_id_str)
+    )
+    research_id = result.scalars().first()
 
     if not research_id:
         raise HTTPException(
@@ -194,7 +231,8 @@ async def delete_research_id(
 
     # Set to inactive instead of deleting
     research_id.is_active = False
-    db.commit()
+    await db.commit()
+    identity_cache.invalidate_research_id(research_id_str)
 
     return {"message": f"Research ID {research_id_str} deactivated"}
 
@@ -202,35 +240,138 @@ async def delete_research_id(
 @router.post("/stats", response_model=AdminStatsResponse)
 async def get_system_stats(
     auth: AdminAuth,
-    db: Session = Depends(get_db)
+    refresh: bool = False
+):
+    """
+    Get overall system statistics (admin only)
+    Served from a periodically refreshed snapshot; pass refresh=true to recompute now.
+    """
+    verify_admin(auth)
+
+    try:
+        if refresh:
+            return await stats_service.refresh(force=True)
+        return await stats_service.get_stats()
+    except Exception as e:
+        print(f"Failed to compute admin stats: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Statistics are not available yet"
+        )
+
+
+@router.post("/usage", response_model=UsageReportResponse)
+async def get_llm_usage(
+    auth: AdminAuth,
+    db: AsyncSession = Depends(get_async_db),
+    days: int = Query(default=7, ge=1, le=365),
+    research_id: Optional[str] = None,
+    model: Optional[str] = None
 ):
-    """Get overall system statistics (admin only)"""
+    """Get LLM token usage and latency per research ID, model and day (admin only)"""
     verify_admin(auth)
 
-    now = datetime.utcnow()
-    twenty_four_hours_ago = now - timedelta(hours=24)
-
-    stats = AdminStatsResponse(
-        total_research_ids=db.query(ResearchID).count(),
-        active_research_ids=db.query(ResearchID).filter(ResearchID.is_active == True).count(),
-        total_sessions=db.query(UserSession).count(),
-        active_sessions_24h=db.query(UserSession).filter(
-            UserSession.last_active >= twenty_four_hours_ago
-        ).count(),
-        total_conversations=db.query(Conversation.conversation_id).distinct().count(),
-        total_messages=db.query(Conversation).count(),
-        messages_last_24h=db.query(Conversation).filter(
-            Conversation.timestamp >= twenty_four_hours_ago
-        ).count()
+    since = datetime.utcnow() - timedelta(days=days)
+    day = func.date_trunc('day', LLMUsage.created_at).label("day")
+
+    query = select(
+        ResearchID.research_id,
+        LLMUsage.model,
+        day,
+        func.count(LLMUsage.id).label("requests"),
+        func.coalesce(func.sum(LLMUsage.prompt_tokens), 0).label("prompt_tokens"),
+        func.coalesce(func.sum(LLMUsage.completion_tokens), 0).label("completion_tokens"),
+        func.coalesce(func.sum(LLMUsage.cached_tokens), 0).label("cached_tokens"),
+        func.avg(LLMUsage.first_token_ms).label("avg_first_token_ms"),
+        func.avg(LLMUsage.duration_ms).label("avg_duration_ms")
+    ).join(
+        ResearchID, ResearchID.id == LLMUsage.research_id_fk
+    ).where(
+        LLMUsage.created_at >= since
+    )
+
+    if research_id:
+        query = query.where(ResearchID.research_id == research_id)
+    if model:
+        query = query.where(LLMUsage.model == model)
+
+    result = await db.execute(
+        query.group_by(
+            ResearchID.research_id, LLMUsage.model, day
+        ).order_by(
+            day.desc(), ResearchID.research_id, LLMUsage.model
+        )
+    )
+
+    return UsageReportResponse(
+        since=since,
+        items=[
+            UsageAggregate(
+                research_id=row.research_id,
+                model=row.model,
+                day=row.day,
+                requests=row.requests,
+                prompt_tokens=row.prompt_tokens,
+                completion_tokens=row.completion_tokens,
+                cached_tokens=row.cached_tokens,
+                avg_first_token_ms=float(row.avg_first_token_ms) if row.avg_first_token_ms is not None else None,
+                avg_duration_ms=float(row.avg_duration_ms) if row.avg_duration_ms is not None else None
+            )
+            for row in result
+        ]
     )
 
-    return stats
+
+@router.post("/tts-cache")
+async def get_tts_cache_stats(auth: AdminAuth):
+    """Get TTS audio cache hit/miss counters (admin only)"""
+    verify_admin(auth)
+
+    return tts_service.cache.stats()
+
+
+@router.post("/message-queue")
+async def get_message_queue_stats(auth: AdminAuth):
+    """Get write-behind message queue depth and failure counters (admin only)"""
+    verify_admin(auth)
+
+    return message_writer.stats()
+
+
+@router.post("/llm-providers")
+async def get_llm_provider_health(auth: AdminAuth):
+    """Get LLM provider circuit breaker state, error counters and prompt-cache usage (admin only)"""
+    verify_admin(auth)
+
+    return {
+        "providers": llm_service.health.stats(),
+        "prompt_cache": llm_service.prompt_cache_stats()
+    }
+
+
+@router.post("/provider-queues")
+async def get_provider_queue_stats(auth: AdminAuth):
+    """Get outbound concurrency slots, queue depth and rate-limit pauses per provider (admin only)"""
+    verify_admin(auth)
+
+    return {
+        **llm_service.scheduler_stats(),
+        "elevenlabs": tts_service.scheduler.stats()
+    }
+
+
+@router.post("/response-cache")
+async def get_response_cache_stats(auth: AdminAuth):
+    """Get first-turn response cache hit/miss counters (admin only)"""
+    verify_admin(auth)
+
+    return response_cache.stats()
 
 
 @router.post("/seed-research-ids")
 async def seed_research_ids(
     auth: AdminAuth,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Seed research IDs from RESEARCH_IDS environment variable (admin only)"""
     verify_admin(auth)
@@ -262,9 +403,10 @@ async def seed_research_ids(
 
     for research_id in ids_to_add:
         # Check if already exists
-        existing = db.query(ResearchID).filter(
-            ResearchID.research_id == research_id
-        ).first()
+        result = await db.execute(
+            select(ResearchID).where(ResearchID.research_id == research_id)
+        )
+        existing = result.scalars().first()
 
         if existing:
             skipped.append(research_id)
@@ -279,7 +421,7 @@ async def seed_research_ids(
         db.add(new_rid)
         created.append(research_id)
 
-    db.commit()
+    await db.commit()
 
     return {
         "message": "Research IDs seeded successfully",
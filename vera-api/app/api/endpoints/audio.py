@@ -0,0 +1,129 @@
+"""
+Audio delivery endpoint for cached TTS clips
+
+Clips are served from the TTS cache directory through short-lived signed
+URLs (see sign_audio_url). Responses carry a strong ETag derived from the
+file contents and a long-lived Cache-Control header, and honour single
+`Range` requests so browsers can seek and resume playback.
+"""
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from functools import lru_cache
+from typing import Optional, Tuple
+import asyncio
+import hashlib
+import re
+
+from app.core.config import get_settings
+from app.core.security import CLIP_FILENAME, verify_audio_signature
+from app.services.audio_cache import audio_media_type
+from app.services.tts_service import tts_service
+
+settings = get_settings()
+router = APIRouter()
+
+BYTE_RANGE = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+@lru_cache(maxsize=1024)
+def content_etag(path: str, mtime_ns: int, size: int) -> str:
+    """Strong ETag from the clip's bytes (cached per file version)"""
+    with open(path, "rb") as f:
+        return f'"{hashlib.sha256(f.read()).hexdigest()[:32]}"'
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single `bytes=` range into inclusive (start, end).
+    Returns None for ranges we don't handle (multi-range), meaning the whole
+    file is served. Raises ValueError when the range can't be satisfied.
+    """
+    match = BYTE_RANGE.fullmatch(header.strip())
+    if not match:
+        return None
+
+    start, end = match.groups()
+    if not start:
+        # Suffix range: the last N bytes
+        if not end or int(end) == 0:
+            raise ValueError("Unsatisfiable range")
+        return max(size - int(end), 0), size - 1
+
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or end < start:
+        raise ValueError("Unsatisfiable range")
+    return start, end
+
+
+def read_range(path: str, start: int, length: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(length)
+
+
+@router.api_route("/{filename}", methods=["GET", "HEAD"])
+async def get_audio(
+    filename: str,
+    request: Request,
+    rid: str = Query(...),
+    exp: int = Query(...),
+    sig: str = Query(...)
+):
+    """
+    Serve a cached TTS clip from a signed URL.
+    Supports conditional requests (If-None-Match) and byte ranges (Range, If-Range).
+    """
+    if not CLIP_FILENAME.fullmatch(filename):
+        raise HTTPException(status_code=404, detail="Audio not found")
+    if not verify_audio_signature(filename, rid, exp, sig):
+        raise HTTPException(status_code=403, detail="Invalid or expired audio URL")
+
+    path = tts_service.audio_dir / filename
+    try:
+        stat = await asyncio.to_thread(path.stat)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Audio not found")
+
+    size = stat.st_size
+    etag = await asyncio.to_thread(content_etag, str(path), stat.st_mtime_ns, size)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={settings.AUDIO_CACHE_MAX_AGE_SECONDS}",
+        "Accept-Ranges": "bytes",
+    }
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    # A Range is only honoured if the client's copy (If-Range) is still current
+    byte_range = None
+    range_header = request.headers.get("range")
+    if range_header and request.headers.get("if-range", etag) == etag:
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            raise HTTPException(
+                status_code=416,
+                detail="Requested range not satisfiable",
+                headers={"Content-Range": f"bytes */{size}"}
+            )
+
+    status_code = 200
+    start, end = 0, size - 1
+    if byte_range is not None:
+        status_code = 206
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    length = end - start + 1
+    if request.method == "HEAD":
+        headers["Content-Length"] = str(length)
+        return Response(status_code=status_code, headers=headers, media_type=audio_media_type(filename))
+
+    content = await asyncio.to_thread(read_range, str(path), start, length)
+    return Response(
+        content=content,
+        status_code=status_code,
+        headers=headers,
+        media_type=audio_media_type(filename)
+    )
@@ -3,9 +3,10 @@ Authentication and authorization endpoints
 """
 from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.base import get_db
+from app.db.base import get_async_db
 from app.models.database import ResearchID, UserSession, DisclaimerAcknowledgment
 from app.schemas.auth import (
     ResearchIDValidate,
@@ -15,7 +16,7 @@ from app.schemas.auth import (
     Token,
     SessionCreate
 )
-from app.core.security import create_access_token, get_current_user
+from app.core.security import create_access_token, get_current_user, CurrentUser
 from app.core.config import get_settings
 
 router = APIRouter()
@@ -25,13 +26,16 @@ settings = get_settings()
 @router.post("/validate-research-id", response_model=ResearchIDResponse)
 async def validate_research_id(
     data: ResearchIDValidate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Validate if a research ID exists and is active"""
-    research_user = db.query(ResearchID).filter(
-        ResearchID.research_id == data.research_id,
-        ResearchID.is_active == True
-    ).first()
+    result = await db.execute(
+        select(ResearchID).where(
+            ResearchID.research_id == data.research_id,
+            ResearchID.is_active == True
+        )
+    )
+    research_user = result.scalars().first()
 
     if research_user:
         return ResearchIDResponse(
@@ -51,14 +55,17 @@ async def validate_research_id(
 async def acknowledge_disclaimer(
     data: DisclaimerAcknowledge,
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Record that user has acknowledged the disclaimer"""
     # Verify research ID exists
-    research_user = db.query(ResearchID).filter(
-        ResearchID.research_id == data.research_id,
-        ResearchID.is_active == True
-    ).first()
+    result = await db.execute(
+        select(ResearchID).where(
+            ResearchID.research_id == data.research_id,
+            ResearchID.is_active == True
+        )
+    )
+    research_user = result.scalars().first()
 
     if not research_user:
         raise HTTPException(
@@ -76,8 +83,8 @@ async def acknowledge_disclaimer(
     )
 
     db.add(disclaimer)
-    db.commit()
-    db.refresh(disclaimer)
+    await db.commit()
+    await db.refresh(disclaimer)
 
     return DisclaimerResponse(
         success=True,
@@ -90,17 +97,20 @@ async def acknowledge_disclaimer(
 async def login(
     data: SessionCreate,
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Create session and return JWT token
     Should be called after research ID validation and disclaimer acknowledgment
     """
     # Verify research ID exists and is active
-    research_user = db.query(ResearchID).filter(
-        ResearchID.research_id == data.research_id,
-        ResearchID.is_active == True
-    ).first()
+    result = await db.execute(
+        select(ResearchID).where(
+            ResearchID.research_id == data.research_id,
+            ResearchID.is_active == True
+        )
+    )
+    research_user = result.scalars().first()
 
     if not research_user:
         raise HTTPException(
@@ -109,9 +119,12 @@ async def login(
         )
 
     # Check if disclaimer has been acknowledged
-    disclaimer = db.query(DisclaimerAcknowledgment).filter(
-        DisclaimerAcknowledgment.research_id_fk == research_user.id
-    ).first()
+    result = await db.execute(
+        select(DisclaimerAcknowledgment).where(
+            DisclaimerAcknowledgment.research_id_fk == research_user.id
+        ).limit(1)
+    )
+    disclaimer = result.scalars().first()
 
     if not disclaimer:
         raise HTTPException(
@@ -131,8 +144,8 @@ async def login(
     )
 
     db.add(session)
-    db.commit()
-    db.refresh(session)
+    await db.commit()
+    await db.refresh(session)
 
     # Create JWT token
     token_data = {
@@ -148,7 +161,7 @@ async def login(
 
     # Update session with token
     session.session_token = access_token
-    db.commit()
+    await db.commit()
 
     expires_at = datetime.utcnow() + access_token_expires
 
@@ -162,7 +175,7 @@ async def login(
 
 @router.get("/me")
 async def get_current_user_info(
-    current_user: ResearchID = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """Get information about currently authenticated user"""
     return {
@@ -2,12 +2,18 @@
 Chat and conversation endpoints
 """
 from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
+import asyncio
 import json
+import httpx
 
-from app.db.base import get_db
-from app.models.database import ResearchID
+from app.core.config import get_settings
+from app.core.metrics import WEBSOCKET_CONNECTIONS
+from app.core.tracing import tracer
+from app.db.base import get_async_db, AsyncSessionLocal
 from app.schemas.conversation import (
     MessageCreate,
     MessageResponse,
@@ -16,25 +22,42 @@ from app.schemas.conversation import (
     StreamChatRequest,
     MessageSaveRequest,
     MessageSaveResponse,
+    MessageBatchSaveRequest,
+    MessageBatchSaveResponse,
     ElevenLabsConversationSyncRequest,
-    ElevenLabsConversationSyncResponse
+    ElevenLabsConversationSyncResponse,
+    ElevenLabsConversationBatchSyncRequest,
+    ElevenLabsConversationBatchSyncResponse,
+    ElevenLabsConversationSyncResult
 )
-from app.core.security import get_current_user, verify_token
-from app.services.llm_service import llm_service
+from app.core.security import get_current_user, CurrentUser, sign_audio_url
+from app.services.llm_service import llm_service, CompletionStats, LLMProviderError
 from app.services.conversation_service import conversation_service
 from app.services.tts_service import tts_service
+from app.services.speech_pipeline import SpeechPipeline
+from app.services.audio_cache import concatenable
+from app.services.chat_context import ChatConnectionContext
+from app.services.message_writer import message_writer
+from app.services.provider_scheduler import fairness_key
+from app.services.response_cache import response_cache
+from app.services.elevenlabs_service import elevenlabs_service, ElevenLabsAPIError
 
 # Import Vera's system prompt
 from app.prompts import master_prompt, vera_first_message
 
+settings = get_settings()
+
 router = APIRouter()
 
+# Shown to participants when no LLM provider could answer
+LLM_UNAVAILABLE_MESSAGE = "Vera is temporarily unavailable. Please try again in a moment."
+
 
 @router.post("/message", response_model=MessageResponse)
 async def send_message(
     data: MessageCreate,
-    current_user: ResearchID = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Send a message and get response (non-streaming)
@@ -43,54 +66,71 @@ async def send_message(
     if current_user.research_id != data.research_id:
         raise HTTPException(status_code=403, detail="Research ID mismatch")
 
+    try:
+        audio_format = tts_service.resolve_format(data.audio_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Outbound LLM/TTS calls for this request queue fairly under this research ID
+    fairness_key.set(current_user.research_id)
+
     # Save user message
-    conversation_service.save_message(
+    await conversation_service.save_message(
         db=db,
         research_id=data.research_id,
         conversation_id=data.conversation_id,
         role="user",
-        content=data.content
+        content=data.content,
+        research_id_fk=current_user.id
     )
 
-    # Get conversation history for context
-    messages, _ = conversation_service.get_conversation_history(
+    # Get the most recent turns for context
+    messages = await conversation_service.get_recent_messages(
         db=db,
         research_id=data.research_id,
         conversation_id=data.conversation_id,
-        limit=50
+        limit=settings.LLM_CONTEXT_MAX_MESSAGES,
+        research_id_fk=current_user.id
     )
 
-    # Build message list for LLM
-    llm_messages = [
-        {"role": "system", "content": master_prompt}
-    ]
-
-    for msg in messages:
-        if msg.role in ["user", "assistant"]:
-            llm_messages.append({"role": msg.role, "content": msg.content})
-
-    # Get LLM response
-    response_text = await llm_service.get_chat_completion(
+    # Build message list for LLM, trimmed to the token budget
+    llm_messages = llm_service.build_messages(
         model=data.model,
-        messages=llm_messages
+        system_prompt=master_prompt,
+        history=[{"role": msg.role, "content": msg.content} for msg in messages]
     )
 
+    # Get LLM response
+    completion = CompletionStats()
+    try:
+        response_text = await response_cache.complete(
+            model=data.model,
+            messages=llm_messages,
+            stats=completion
+        )
+    except LLMProviderError as e:
+        print(f"LLM request failed: {e}")
+        raise HTTPException(status_code=503, detail=LLM_UNAVAILABLE_MESSAGE)
+    if completion.provider:
+        message_writer.enqueue_usage(current_user.id, data.conversation_id, completion)
+
     # Generate TTS audio
     audio_path = None
     try:
-        audio_path, _ = tts_service.generate_speech(response_text)
+        audio_path, _ = await tts_service.generate_speech_async(response_text, output_format=audio_format)
     except Exception as e:
         print(f"TTS generation failed: {e}")
 
     # Save assistant message
-    assistant_message = conversation_service.save_message(
+    assistant_message = await conversation_service.save_message(
         db=db,
         research_id=data.research_id,
         conversation_id=data.conversation_id,
         role="assistant",
         content=response_text,
         model_used=data.model,
-        audio_url=audio_path
+        audio_url=audio_path,
+        research_id_fk=current_user.id
     )
 
     return MessageResponse(
@@ -100,15 +140,15 @@ async def send_message(
         content=assistant_message.content,
         timestamp=assistant_message.timestamp,
         model_used=assistant_message.model_used,
-        audio_url=assistant_message.audio_url
+        audio_url=sign_audio_url(assistant_message.audio_url, current_user.research_id)
     )
 
 
 @router.post("/save-message", response_model=MessageSaveResponse)
 async def save_message_from_frontend(
     data: MessageSaveRequest,
-    current_user: ResearchID = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Save a single message from the frontend (ElevenLabs or OpenAI).
@@ -131,30 +171,9 @@ async def save_message_from_frontend(
     # ElevenLabs has its own conversation_id, but we still need our internal format
     conversation_id = data.elevenlabs_conversation_id or f"conv_{datetime.now().strftime('%Y%m%d%H%M%S')}_{data.research_id}"
 
-    # Get the research_id_fk
-    research_user = db.query(ResearchID).filter(ResearchID.research_id == data.research_id).first()
-    if not research_user:
-        raise HTTPException(status_code=404, detail="Research ID not found")
-
-    # Check for duplicate message (for ElevenLabs messages)
     from app.models.database import Conversation
-    if data.elevenlabs_message_id and data.elevenlabs_conversation_id:
-        existing = db.query(Conversation).filter(
-            Conversation.elevenlabs_message_id == data.elevenlabs_message_id,
-            Conversation.elevenlabs_conversation_id == data.elevenlabs_conversation_id
-        ).first()
-
-        if existing:
-            # Message already exists, return success without creating duplicate
-            return MessageSaveResponse(
-                success=True,
-                message_id=existing.id,
-                timestamp=existing.timestamp
-            )
-
-    # Create conversation record
-    message = Conversation(
-        research_id_fk=research_user.id,
+    values = dict(
+        research_id_fk=current_user.id,
         conversation_id=conversation_id,
         role=data.role,
         content=data.content,
@@ -164,9 +183,35 @@ async def save_message_from_frontend(
         elevenlabs_message_id=data.elevenlabs_message_id
     )
 
+    if data.elevenlabs_message_id and data.elevenlabs_conversation_id:
+        # Insert unless the ElevenLabs message is already stored (including by a
+        # concurrent save); duplicates return the existing row
+        row = (await db.execute(
+            pg_insert(Conversation).values(**values).on_conflict_do_nothing(
+                index_elements=["elevenlabs_conversation_id", "elevenlabs_message_id"]
+            ).returning(Conversation.id, Conversation.timestamp)
+        )).first()
+        if row is None:
+            row = (await db.execute(
+                select(Conversation.id, Conversation.timestamp).where(
+                    Conversation.elevenlabs_conversation_id == data.elevenlabs_conversation_id,
+                    Conversation.elevenlabs_message_id == data.elevenlabs_message_id
+                )
+            )).one()
+        await db.commit()
+
+        return MessageSaveResponse(
+            success=True,
+            message_id=row.id,
+            timestamp=row.timestamp
+        )
+
+    # Create conversation record
+    message = Conversation(**values)
+
     db.add(message)
-    db.commit()
-    db.refresh(message)
+    await db.commit()
+    await db.refresh(message)
 
     return MessageSaveResponse(
         success=True,
@@ -175,24 +220,62 @@ async def save_message_from_frontend(
     )
 
 
+@router.post("/save-messages", response_model=MessageBatchSaveResponse)
+async def save_messages_from_frontend(
+    data: MessageBatchSaveRequest,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Save a batch of messages from the frontend in one transaction.
+
+    Same semantics as /save-message per item, but the user is resolved once,
+    duplicates are checked with a single query and all rows are committed
+    together. Results are returned per item, in request order.
+    """
+    # Verify user matches research_id in request
+    if current_user.research_id != data.research_id:
+        raise HTTPException(status_code=403, detail="Research ID mismatch")
+
+    results = await conversation_service.save_frontend_messages(
+        db=db,
+        research_id=current_user.research_id,
+        research_id_fk=current_user.id,
+        items=data.messages
+    )
+
+    return MessageBatchSaveResponse(
+        success=all(result.success for result in results),
+        saved=sum(1 for result in results if result.success and not result.duplicate),
+        duplicates=sum(1 for result in results if result.duplicate),
+        results=results
+    )
+
+
 @router.post("/history", response_model=ConversationHistoryResponse)
 async def get_conversation_history(
     data: ConversationHistoryRequest,
-    current_user: ResearchID = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get conversation history for a research ID"""
     # Verify user matches research_id in request
     if current_user.research_id != data.research_id:
         raise HTTPException(status_code=403, detail="Research ID mismatch")
 
-    messages, total = conversation_service.get_conversation_history(
-        db=db,
-        research_id=data.research_id,
-        conversation_id=data.conversation_id,
-        limit=data.limit,
-        offset=data.offset
-    )
+    try:
+        messages, total, next_cursor = await conversation_service.get_conversation_history(
+            db=db,
+            research_id=data.research_id,
+            conversation_id=data.conversation_id,
+            limit=data.limit,
+            offset=data.offset,
+            research_id_fk=current_user.id,
+            cursor=data.cursor,
+            include_total=data.include_total
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     message_responses = [
         MessageResponse(
@@ -202,7 +285,7 @@ async def get_conversation_history(
             content=msg.content,
             timestamp=msg.timestamp,
             model_used=msg.model_used,
-            audio_url=msg.audio_url
+            audio_url=sign_audio_url(msg.audio_url, current_user.research_id)
         )
         for msg in messages
     ]
@@ -210,21 +293,23 @@ async def get_conversation_history(
     return ConversationHistoryResponse(
         messages=message_responses,
         total=total,
-        research_id=data.research_id
+        research_id=data.research_id,
+        next_cursor=next_cursor
     )
 
 
 @router.get("/conversations")
 async def get_recent_conversations(
-    current_user: ResearchID = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
     limit: int = 10
 ):
     """Get list of recent conversation IDs for current user"""
-    conversations = conversation_service.get_recent_conversations(
+    conversations = await conversation_service.get_recent_conversations(
         db=db,
         research_id=current_user.research_id,
-        limit=limit
+        limit=limit,
+        research_id_fk=current_user.id
     )
 
     return {
@@ -235,13 +320,14 @@ async def get_recent_conversations(
 
 @router.get("/conversations/elevenlabs")
 async def get_elevenlabs_conversations(
-    current_user: ResearchID = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get list of existing ElevenLabs conversation IDs for current user"""
-    elevenlabs_conv_ids = conversation_service.get_existing_elevenlabs_conversations(
+    elevenlabs_conv_ids = await conversation_service.get_existing_elevenlabs_conversations(
         db=db,
-        research_id=current_user.research_id
+        research_id=current_user.research_id,
+        research_id_fk=current_user.id
     )
 
     return {
@@ -251,235 +337,378 @@ async def get_elevenlabs_conversations(
 
 
 @router.websocket("/ws/chat")
-async def websocket_chat_endpoint(websocket: WebSocket, db: Session = Depends(get_db)):
+async def websocket_chat_endpoint(websocket: WebSocket):
     """
     WebSocket endpoint for real-time streaming chat
+
+    Clients that send `"stream_audio": true` receive sentence-level
+    `audio_chunk` frames while the response is still streaming, followed by
+    an `audio_complete` frame. Other clients receive a single `audio` frame.
+
+    Audio is embedded as `audio_base64` by default. Clients that connect with
+    `?audio=binary` instead get each audio frame as a JSON header
+    (`"encoding": "binary"`, `"bytes": <length>`) immediately followed by
+    one binary WebSocket frame holding the raw audio bytes.
+
+    `user_message_saved` acknowledges that the message was accepted and
+    queued for persistence (`"status": "accepted"`), not that it has been
+    written to the database yet.
+
+    Audio frames carry their `format`. It defaults to TTS_OUTPUT_FORMAT and
+    can be chosen per connection (`?audio_format=opus_48000_32`) or per
+    message (`"audio_format": "pcm_16000"`) from TTS_OUTPUT_FORMATS.
+    Streamed Opus turns have no joined clip, so their `audio_complete`
+    frame carries `"audio_url": null`.
+
+    If no LLM provider can answer (or the stream breaks off) the turn ends
+    with an `{"type": "error", "error": ...}` frame instead of `complete`;
+    nothing is saved or synthesized for the assistant.
     """
     await websocket.accept()
 
+    binary_audio = websocket.query_params.get("audio") == "binary"
+    try:
+        connection_format = tts_service.resolve_format(websocket.query_params.get("audio_format"))
+    except ValueError as e:
+        await websocket.send_json({"error": str(e)})
+        await websocket.close(code=1008)
+        return
+
+    WEBSOCKET_CONNECTIONS.inc()
+
+    # Text chunks and audio frames are sent from concurrent tasks
+    send_lock = asyncio.Lock()
+
+    async def send_json(payload: dict):
+        async with send_lock:
+            await websocket.send_json(payload)
+
+    async def send_audio(header: dict, audio_bytes: bytes):
+        if not binary_audio:
+            await send_json({**header, "audio_base64": tts_service.encode_audio_base64(audio_bytes)})
+            return
+        # Header and payload go out back to back so frames from other tasks can't interleave
+        async with send_lock:
+            await websocket.send_json({**header, "encoding": "binary", "bytes": len(audio_bytes)})
+            await websocket.send_bytes(audio_bytes)
+
+    # Identity and recent turns are kept for the lifetime of the socket. It
+    # reads through short-lived sessions, so an idle socket holds no pooled
+    # connection.
+    context = ChatConnectionContext(
+        AsyncSessionLocal,
+        max_messages=settings.LLM_CONTEXT_MAX_MESSAGES,
+        revalidate_seconds=settings.AUTH_CACHE_TTL_SECONDS
+    )
+
     try:
         while True:
             # Receive message
             data = await websocket.receive_text()
             message_data = json.loads(data)
 
-            # Validate token
-            token = message_data.get("token")
-            if not token:
-                await websocket.send_json({"error": "No token provided"})
-                continue
-
-            try:
-                token_data = verify_token(token)
-            except Exception as e:
-                await websocket.send_json({"error": "Invalid token"})
-                continue
-
-            # Verify research ID matches
-            if token_data.research_id != message_data.get("research_id"):
-                await websocket.send_json({"error": "Research ID mismatch"})
-                continue
-
-            # Extract message details
-            research_id = message_data.get("research_id")
-            conversation_id = message_data.get("conversation_id")
-            user_message = message_data.get("message")
-            model = message_data.get("model", "gpt-4.1")
-
-            # Save user message
-            conversation_service.save_message(
-                db=db,
-                research_id=research_id,
-                conversation_id=conversation_id,
-                role="user",
-                content=user_message
-            )
-
-            # Send acknowledgment
-            await websocket.send_json({
-                "type": "user_message_saved",
-                "conversation_id": conversation_id
-            })
-
-            # Get conversation history
-            messages, _ = conversation_service.get_conversation_history(
-                db=db,
-                research_id=research_id,
-                conversation_id=conversation_id,
-                limit=50
-            )
-
-            # Build LLM messages
-            llm_messages = [
-                {"role": "system", "content": master_prompt}
-            ]
-
-            for msg in messages:
-                if msg.role in ["user", "assistant"]:
-                    llm_messages.append({"role": msg.role, "content": msg.content})
-
-            # Stream LLM response
-            full_response = ""
-            async for chunk in llm_service.stream_chat_completion(model, llm_messages):
-                full_response += chunk
-                await websocket.send_json({
-                    "type": "chunk",
-                    "content": chunk
+            with tracer.start_as_current_span("chat.turn") as turn_span:
+                # Validate token
+                token = message_data.get("token")
+                if not token:
+                    await send_json({"error": "No token provided"})
+                    continue
+
+                try:
+                    with tracer.start_as_current_span("chat.authenticate"):
+                        current_user = await context.authenticate(token)
+                except Exception as e:
+                    await send_json({"error": "Invalid token"})
+                    continue
+
+                # Verify research ID matches
+                if current_user.research_id != message_data.get("research_id"):
+                    await send_json({"error": "Research ID mismatch"})
+                    continue
+
+                # Extract message details
+                research_id = message_data.get("research_id")
+                conversation_id = message_data.get("conversation_id")
+                user_message = message_data.get("message")
+                model = message_data.get("model", "gpt-4.1")
+                stream_audio = bool(message_data.get("stream_audio", False))
+                try:
+                    audio_format = tts_service.resolve_format(
+                        message_data.get("audio_format") or connection_format
+                    )
+                except ValueError as e:
+                    await send_json({"error": str(e)})
+                    continue
+
+                # Outbound LLM/TTS calls for this turn queue fairly under this research ID
+                fairness_key.set(research_id)
+
+                turn_span.set_attribute("conversation.id", conversation_id or "")
+                turn_span.set_attribute("research_id_fk", current_user.id)
+                turn_span.set_attribute("llm.model", model)
+                turn_span.set_attribute("audio.streaming", stream_audio)
+                turn_span.set_attribute("audio.format", audio_format)
+
+                # Load recent turns from the database only on conversation switch
+                with tracer.start_as_current_span("chat.load_history"):
+                    await context.load_conversation(conversation_id)
+
+                # Queue user message for persistence (written in the background)
+                with tracer.start_as_current_span("chat.save_user_message"):
+                    message_writer.enqueue(
+                        research_id_fk=current_user.id,
+                        conversation_id=conversation_id,
+                        role="user",
+                        content=user_message
+                    )
+                context.append("user", user_message)
+
+                # Acknowledge receipt; the row is written in the background, so
+                # this is not a durable-save confirmation
+                await send_json({
+                    "type": "user_message_saved",
+                    "status": "accepted",
+                    "conversation_id": conversation_id
                 })
 
-            # Send completion signal
-            await websocket.send_json({
-                "type": "complete",
-                "full_response": full_response
-            })
-
-            # Generate TTS audio
-            try:
-                print(f"Generating TTS for response (length: {len(full_response)})")
-                audio_path, audio_bytes = tts_service.generate_speech(full_response)
-                audio_base64 = tts_service.get_audio_base64(audio_path)
-                print(f"TTS generated successfully. Base64 length: {len(audio_base64)}")
-
-                await websocket.send_json({
-                    "type": "audio",
-                    "audio_base64": audio_base64,
-                    "audio_url": audio_path
+                # Build LLM messages, trimmed to the token budget
+                llm_messages = llm_service.build_messages(
+                    model=model,
+                    system_prompt=master_prompt,
+                    history=context.history()
+                )
+
+                # Sentence-level TTS runs alongside the LLM stream
+                pipeline = None
+                audio_sender = None
+                if stream_audio:
+                    pipeline = SpeechPipeline(tts_service, output_format=audio_format)
+                    audio_sender = asyncio.create_task(pipeline.send_to(send_audio))
+
+                # Stream LLM response
+                full_response = ""
+                completion = CompletionStats()
+                try:
+                    async for chunk in response_cache.stream(model, llm_messages, stats=completion):
+                        full_response += chunk
+                        await send_json({
+                            "type": "chunk",
+                            "content": chunk
+                        })
+                        if pipeline:
+                            pipeline.feed(chunk)
+                except LLMProviderError as e:
+                    print(f"LLM request failed: {e}")
+                    if pipeline:
+                        pipeline.cancel()
+                        audio_sender.cancel()
+                        await asyncio.gather(audio_sender, return_exceptions=True)
+                    await send_json({
+                        "type": "error",
+                        "error": LLM_UNAVAILABLE_MESSAGE,
+                        "conversation_id": conversation_id
+                    })
+                    continue
+                except BaseException:
+                    if pipeline:
+                        pipeline.cancel()
+                        audio_sender.cancel()
+                    raise
+
+                if completion.provider:
+                    message_writer.enqueue_usage(current_user.id, conversation_id, completion)
+
+                # Send completion signal
+                await send_json({
+                    "type": "complete",
+                    "full_response": full_response
                 })
-                print("Audio message sent to client")
-            except Exception as e:
-                print(f"TTS generation failed: {e}")
-                import traceback
-                traceback.print_exc()
-                audio_path = None
 
-            # Save assistant message
-            conversation_service.save_message(
-                db=db,
-                research_id=research_id,
-                conversation_id=conversation_id,
-                role="assistant",
-                content=full_response,
-                model_used=model,
-                audio_url=audio_path
-            )
+                audio_path = None
+                if pipeline:
+                    # Wait for the remaining sentences, then store the joined clip.
+                    # A clip with a failed sentence is not cached: it would be
+                    # served for every later identical response. Ogg/Opus
+                    # sentence clips can't be joined into one playable file, and
+                    # synthesizing the whole response again would bill it twice,
+                    # so those turns are stored without a replay clip.
+                    pipeline.close()
+                    chunks_sent = await audio_sender
+                    if pipeline.audio_parts and pipeline.complete and concatenable(audio_format):
+                        with tracer.start_as_current_span("chat.save_audio"):
+                            audio_path = await asyncio.to_thread(
+                                tts_service.save_audio,
+                                full_response,
+                                b"".join(pipeline.audio_parts),
+                                audio_format
+                            )
+                    await send_json({
+                        "type": "audio_complete",
+                        "chunks": chunks_sent,
+                        "format": audio_format,
+                        "audio_url": sign_audio_url(audio_path, research_id)
+                    })
+                else:
+                    # Generate TTS audio
+                    try:
+                        print(f"Generating TTS for response (length: {len(full_response)})")
+                        with tracer.start_as_current_span("chat.tts"):
+                            audio_path, audio_bytes = await tts_service.generate_speech_async(
+                                full_response, output_format=audio_format
+                            )
+                        print(f"TTS generated successfully. Audio bytes: {len(audio_bytes)}")
+
+                        with tracer.start_as_current_span("chat.send_audio") as send_span:
+                            send_span.set_attribute("audio.bytes", len(audio_bytes))
+                            send_span.set_attribute("audio.binary", binary_audio)
+                            await send_audio({
+                                "type": "audio",
+                                "format": audio_format,
+                                "audio_url": sign_audio_url(audio_path, research_id)
+                            }, audio_bytes)
+                        print("Audio message sent to client")
+                    except Exception as e:
+                        print(f"TTS generation failed: {e}")
+                        import traceback
+                        traceback.print_exc()
+                        audio_path = None
+
+                # Queue assistant message for persistence
+                with tracer.start_as_current_span("chat.save_assistant_message"):
+                    message_writer.enqueue(
+                        research_id_fk=current_user.id,
+                        conversation_id=conversation_id,
+                        role="assistant",
+                        content=full_response,
+                        model_used=model,
+                        audio_url=audio_path
+                    )
+                context.append("assistant", full_response)
 
     except WebSocketDisconnect:
         print("WebSocket disconnected")
     except Exception as e:
         print(f"WebSocket error: {e}")
-        await websocket.send_json({"error": str(e)})
+        await send_json({"error": str(e)})
+    finally:
+        WEBSOCKET_CONNECTIONS.dec()
 
 
 @router.post("/sync-elevenlabs-conversation", response_model=ElevenLabsConversationSyncResponse)
 async def sync_elevenlabs_conversation(
     data: ElevenLabsConversationSyncRequest,
-    current_user: ResearchID = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Fetch an ElevenLabs conversation transcript and sync it to the database.
 
     This endpoint retrieves a conversation from the ElevenLabs API using the
     conversation ID and saves all messages to the PostgreSQL database for research purposes.
+    Messages are written with one INSERT ... ON CONFLICT DO NOTHING, so
+    re-syncing a conversation is idempotent.
     """
     # Verify user matches research_id in request
     if current_user.research_id != data.research_id:
         raise HTTPException(status_code=403, detail="Research ID mismatch")
 
-    # Import here to avoid circular imports
-    import httpx
-    from datetime import datetime
-    from app.core.config import get_settings
-    from app.models.database import Conversation
-
-    settings = get_settings()
-
     try:
         # Fetch conversation from ElevenLabs API
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"https://api.elevenlabs.io/v1/convai/conversations/{data.elevenlabs_conversation_id}",
-                headers={
-                    "xi-api-key": settings.ELEVENLABS_API_KEY
-                }
-            )
-
-            if response.status_code != 200:
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"Failed to fetch conversation from ElevenLabs: {response.text}"
-                )
-
-            conversation_data = response.json()
-
-        # Get the research_id_fk
-        research_user = db.query(ResearchID).filter(
-            ResearchID.research_id == data.research_id
-        ).first()
-
-        if not research_user:
-            raise HTTPException(status_code=404, detail="Research ID not found")
+        conversation_data = await elevenlabs_service.get_conversation(
+            data.elevenlabs_conversation_id
+        )
 
         # Use ElevenLabs conversation_id as our conversation_id
-        conversation_id = data.elevenlabs_conversation_id
+        rows = conversation_service.parse_elevenlabs_transcript(
+            conversation_data,
+            research_id_fk=current_user.id,
+            elevenlabs_conversation_id=data.elevenlabs_conversation_id
+        )
+        messages_synced = await conversation_service.upsert_elevenlabs_messages(db, rows)
+        await db.commit()
+
+        return ElevenLabsConversationSyncResponse(
+            success=True,
+            messages_synced=messages_synced,
+            conversation_id=data.elevenlabs_conversation_id
+        )
 
-        # Process and save messages
-        messages_synced = 0
+    except ElevenLabsAPIError as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=f"Failed to fetch conversation from ElevenLabs: {e.detail}"
+        )
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=500, detail=f"Failed to connect to ElevenLabs API: {str(e)}")
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Failed to sync conversation: {str(e)}")
 
-        if conversation_data.get("transcript") and isinstance(conversation_data["transcript"], list):
-            for message in conversation_data["transcript"]:
-                # Parse message fields (ElevenLabs format may vary)
-                role = "user" if message.get("role") == "user" else "assistant"
-                content = message.get("message") or message.get("text") or ""
 
-                # Skip empty messages
-                if not content.strip():
-                    continue
+@router.post("/sync-elevenlabs-conversations", response_model=ElevenLabsConversationBatchSyncResponse)
+async def sync_elevenlabs_conversations(
+    data: ElevenLabsConversationBatchSyncRequest,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Sync many ElevenLabs conversations in one call (e.g. backfilling a study).
 
-                # Parse timestamp
-                timestamp_str = message.get("timestamp")
-                if timestamp_str:
-                    try:
-                        timestamp = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-                    except (ValueError, AttributeError):
-                        timestamp = datetime.now()
-                else:
-                    timestamp = datetime.now()
+    Transcripts are fetched concurrently; each conversation is inserted in
+    its own savepoint so one failure does not discard the others.
+    """
+    # Verify user matches research_id in request
+    if current_user.research_id != data.research_id:
+        raise HTTPException(status_code=403, detail="Research ID mismatch")
 
-                # Check if message already exists (avoid duplicates)
-                elevenlabs_message_id = message.get("id")
-                existing_message = None
+    conversation_ids = list(dict.fromkeys(data.elevenlabs_conversation_ids))
+    fetch_limit = asyncio.Semaphore(5)
 
-                if elevenlabs_message_id:
-                    existing_message = db.query(Conversation).filter(
-                        Conversation.elevenlabs_message_id == elevenlabs_message_id
-                    ).first()
+    async def fetch(conversation_id: str):
+        async with fetch_limit:
+            return await elevenlabs_service.get_conversation(conversation_id)
 
-                # Only save if not already in database
-                if not existing_message:
-                    db_message = Conversation(
-                        research_id_fk=research_user.id,
-                        conversation_id=conversation_id,
-                        role=role,
-                        content=content,
-                        timestamp=timestamp,
-                        provider="elevenlabs",
-                        elevenlabs_conversation_id=data.elevenlabs_conversation_id,
-                        elevenlabs_message_id=elevenlabs_message_id
-                    )
-                    db.add(db_message)
-                    messages_synced += 1
+    fetched = await asyncio.gather(
+        *(fetch(conversation_id) for conversation_id in conversation_ids),
+        return_exceptions=True
+    )
 
-        db.commit()
+    results = []
+    for conversation_id, conversation_data in zip(conversation_ids, fetched):
+        if isinstance(conversation_data, Exception):
+            results.append(ElevenLabsConversationSyncResult(
+                conversation_id=conversation_id,
+                success=False,
+                error=str(conversation_data)
+            ))
+            continue
+
+        rows = conversation_service.parse_elevenlabs_transcript(
+            conversation_data,
+            research_id_fk=current_user.id,
+            elevenlabs_conversation_id=conversation_id
+        )
+        try:
+            async with db.begin_nested():
+                messages_synced = await conversation_service.upsert_elevenlabs_messages(db, rows)
+        except Exception as e:
+            results.append(ElevenLabsConversationSyncResult(
+                conversation_id=conversation_id,
+                success=False,
+                error=f"Failed to save transcript: {str(e)}"
+            ))
+            continue
 
-        return ElevenLabsConversationSyncResponse(
+        results.append(ElevenLabsConversationSyncResult(
+            conversation_id=conversation_id,
             success=True,
-            messages_synced=messages_synced,
-            conversation_id=conversation_id
-        )
+            messages_synced=messages_synced
+        ))
 
-    except httpx.HTTPError as e:
-        raise HTTPException(status_code=500, detail=f"Failed to connect to ElevenLabs API: {str(e)}")
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Failed to sync conversation: {str(e)}")
+    await db.commit()
+
+    return ElevenLabsConversationBatchSyncResponse(
+        success=all(result.success for result in results),
+        total_messages_synced=sum(result.messages_synced for result in results),
+        results=results
+    )
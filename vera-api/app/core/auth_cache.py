@@ -0,0 +1,130 @@
+"""
+In-process caches for authentication
+
+- IdentityCache: short-TTL map of verified token -> resolved research user,
+  so authenticated requests skip the ResearchID lookup
+- SessionActivityTracker: collects UserSession.last_active updates and
+  writes them in one batched UPDATE per flush interval instead of a
+  commit per request
+"""
+import asyncio
+import hashlib
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import update
+
+from app.models.database import UserSession
+
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """Authenticated research user resolved from a JWT"""
+    id: int
+    research_id: str
+    is_active: bool
+    created_at: Optional[datetime]
+    session_id: int
+
+
+class IdentityCache:
+    """TTL cache of verified token -> CurrentUser"""
+
+    def __init__(self, ttl_seconds: int = 30, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: Dict[str, Tuple[float, CurrentUser]] = {}
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[CurrentUser]:
+        """Return the cached user for a token, or None if absent/expired"""
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if time.monotonic() > expires_at:
+            self._entries.pop(key, None)
+            return None
+        return user
+
+    def set(self, token: str, user: CurrentUser):
+        """Cache a verified user for ttl_seconds"""
+        if len(self._entries) >= self.max_entries:
+            now = time.monotonic()
+            for key in [k for k, (exp, _) in self._entries.items() if exp < now]:
+                del self._entries[key]
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+        self._entries[self._key(token)] = (time.monotonic() + self.ttl_seconds, user)
+
+    def invalidate_research_id(self, research_id: str):
+        """Drop cached entries for a research ID (e.g. after deactivation)"""
+        for key in [k for k, (_, u) in self._entries.items() if u.research_id == research_id]:
+            del self._entries[key]
+
+
+class SessionActivityTracker:
+    """Debounced, batched writer for UserSession.last_active"""
+
+    def __init__(self, session_factory, flush_interval_seconds: int = 30):
+        self.session_factory = session_factory
+        self.flush_interval_seconds = flush_interval_seconds
+        self._pending: Dict[int, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def touch(self, session_id: int):
+        """Record activity for a session; written on the next flush"""
+        self._pending[session_id] = datetime.utcnow()
+
+    def pending_count(self) -> int:
+        """Number of sessions waiting for the next flush"""
+        return len(self._pending)
+
+    async def flush(self) -> int:
+        """Write all pending last_active values in one UPDATE, returns row count"""
+        if not self._pending:
+            return 0
+
+        pending, self._pending = self._pending, {}
+        try:
+            async with self.session_factory() as db:
+                await db.execute(
+                    update(UserSession),
+                    [{"id": sid, "last_active": ts} for sid, ts in pending.items()]
+                )
+                await db.commit()
+        except Exception as e:
+            print(f"Failed to flush session activity: {e}")
+            # Keep the newest timestamp for retry on the next flush
+            for sid, ts in pending.items():
+                if sid not in self._pending:
+                    self._pending[sid] = ts
+            return 0
+        return len(pending)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval_seconds)
+            await self.flush()
+
+    def start(self):
+        """Start the periodic flusher on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher and write any remaining updates"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
@@ -19,6 +19,8 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24  # 24 hours
+    AUTH_CACHE_TTL_SECONDS: int = 30  # How long a verified token skips the DB
+    SESSION_ACTIVITY_FLUSH_SECONDS: int = 30  # Batch interval for last_active writes
 
     # Database
     DATABASE_URL: str
@@ -28,16 +30,73 @@ class Settings(BaseSettings):
     GROQ_API_KEY: str
     OPENROUTER_API_KEY: str = ""
 
+    # LLM routing (retries, circuit breakers, hedged requests)
+    LLM_MAX_RETRIES: int = 1  # Retries per provider before failing over
+    LLM_FIRST_TOKEN_TIMEOUT_SECONDS: float = 20.0
+    LLM_HEDGE_AFTER_SECONDS: float = 0.0  # Start a backup provider after this delay (0 disables)
+    LLM_BREAKER_FAILURE_THRESHOLD: int = 5  # Consecutive failures before skipping a provider
+    LLM_BREAKER_RESET_SECONDS: int = 30
+
+    # Outbound concurrency (per provider, queued fairly across research IDs)
+    LLM_MAX_CONCURRENCY: int = 20  # In-flight streams per LLM provider
+    TTS_MAX_CONCURRENCY: int = 5  # In-flight ElevenLabs requests (match the plan's concurrency limit)
+    PROVIDER_QUEUE_TIMEOUT_SECONDS: float = 30.0  # Give up waiting for a slot after this
+    PROVIDER_MAX_BACKOFF_SECONDS: float = 60.0  # Longest pause after a 429
+
+    # LLM context window
+    LLM_CONTEXT_MAX_MESSAGES: int = 50  # Most recent turns loaded as history
+    LLM_CONTEXT_MAX_TOKENS: int = 8000  # History token budget (system prompt excluded)
+
+    # First-turn response cache
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_TTL_SECONDS: int = 24 * 60 * 60
+    RESPONSE_CACHE_MAX_ENTRIES: int = 500
+    RESPONSE_CACHE_SEMANTIC: bool = False  # Also match paraphrases via embeddings
+    RESPONSE_CACHE_SIMILARITY: float = 0.92
+    RESPONSE_CACHE_EMBEDDING_MODEL: str = "text-embedding-3-small"
+    RESPONSE_CACHE_SEMANTIC_MAX_ENTRIES: int = 200  # Embeddings kept per model for paraphrase lookup
+
+    # Write-behind message persistence (WebSocket chat)
+    MESSAGE_WRITER_BATCH_SIZE: int = 100
+    MESSAGE_WRITER_FLUSH_MS: int = 200
+    MESSAGE_WRITER_MAX_RETRIES: int = 5
+    MESSAGE_WRITER_DEADLETTER_PATH: str = "failed_messages.jsonl"  # Unstored rows, replayed on startup (keep on a persistent volume)
+
+    # Tracing
+    TRACING_EXPORTER: str = "none"  # none, console or file
+    TRACING_FILE: str = "traces.jsonl"  # JSON span per line (TRACING_EXPORTER=file)
+
     # ElevenLabs
     ELEVENLABS_API_KEY: str
     ELEVENLABS_VOICE_ID: str = "9BWtsMINqrJLrRacOk9x"  # Aria voice
     ELEVENLABS_MODEL_ID: str = "eleven_multilingual_v2"
+    TTS_OUTPUT_FORMAT: str = "mp3_22050_32"  # Default ElevenLabs output format
+    # Formats clients may request (comma-separated): low-bitrate MP3/Opus for mobile, PCM for streaming playback
+    TTS_OUTPUT_FORMATS: Union[str, List[str]] = (
+        "mp3_22050_32,mp3_44100_64,mp3_44100_128,opus_48000_32,opus_48000_64,pcm_16000,pcm_22050,pcm_24000"
+    )
+
+    # Outbound HTTP (ElevenLabs API)
+    HTTP_MAX_CONNECTIONS: int = 50
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_TIMEOUT_SECONDS: float = 30.0
+    HTTP_MAX_RETRIES: int = 3
+
+    # TTS audio cache
+    TTS_CACHE_MAX_MB: int = 500
+    TTS_CACHE_MAX_AGE_HOURS: int = 24 * 7
+    TTS_CACHE_MEMORY_ITEMS: int = 128
+
+    # Audio delivery (signed /audio URLs)
+    AUDIO_URL_TTL_SECONDS: int = 900  # Signed URLs stay valid for 1-2x this
+    AUDIO_CACHE_MAX_AGE_SECONDS: int = 24 * 3600  # Browser/CDN Cache-Control max-age
 
     # CORS - accepts comma-separated string or list
     CORS_ORIGINS: Union[str, List[str]] = "http://localhost:3000,http://localhost:5173,https://vera-pad.vercel.app"
 
     # Admin
     ADMIN_PASSWORD: str = ""
+    ADMIN_STATS_REFRESH_SECONDS: int = 60  # Refresh interval for /admin/stats snapshot
 
     # Research IDs (used by seed script only)
     RESEARCH_IDS: str = ""
@@ -50,6 +109,14 @@ class Settings(BaseSettings):
             return [origin.strip() for origin in v.split(',') if origin.strip()]
         return v
 
+    @field_validator('TTS_OUTPUT_FORMATS', mode='before')
+    @classmethod
+    def parse_tts_output_formats(cls, v):
+        """Parse TTS_OUTPUT_FORMATS from comma-separated string to list"""
+        if isinstance(v, str):
+            return [output_format.strip() for output_format in v.split(',') if output_format.strip()]
+        return v
+
     class Config:
         env_file = ".env"
         case_sensitive = True
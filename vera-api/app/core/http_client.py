@@ -0,0 +1,100 @@
+"""
+Shared outbound HTTP client configuration
+
+Clients are long-lived and pooled (HTTP/2, keep-alive, bounded connection
+limits) so concurrent calls reuse connections instead of paying a TLS
+handshake each time.
+"""
+import asyncio
+import random
+from typing import Optional
+
+import httpx
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+# Status codes worth retrying: rate limiting and transient upstream errors
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def default_limits() -> httpx.Limits:
+    """Connection pool bounds for outbound API clients"""
+    return httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=30.0
+    )
+
+
+def default_timeout() -> httpx.Timeout:
+    """Timeouts for outbound API clients (short connect, longer read)"""
+    return httpx.Timeout(settings.HTTP_TIMEOUT_SECONDS, connect=5.0)
+
+
+def create_async_client(**kwargs) -> httpx.AsyncClient:
+    """Pooled HTTP/2 async client"""
+    return httpx.AsyncClient(
+        http2=True,
+        limits=default_limits(),
+        timeout=default_timeout(),
+        **kwargs
+    )
+
+
+def create_sync_client(**kwargs) -> httpx.Client:
+    """Pooled HTTP/2 sync client (for SDKs that run in worker threads)"""
+    return httpx.Client(
+        http2=True,
+        limits=default_limits(),
+        timeout=default_timeout(),
+        **kwargs
+    )
+
+
+def retry_delay(attempt: int, response: Optional[httpx.Response] = None, base: float = 0.5) -> float:
+    """
+    Seconds to wait before retry number `attempt` (0-based).
+    Honors a numeric Retry-After header, otherwise exponential backoff with jitter.
+    """
+    if response is not None:
+        retry_after = response.headers.get("retry-after")
+        if retry_after:
+            try:
+                return min(float(retry_after), 30.0)
+            except ValueError:
+                pass
+    return min(base * (2 ** attempt), 10.0) * (0.5 + random.random() / 2)
+
+
+async def request_with_retry(
+    client: httpx.AsyncClient,
+    method: str,
+    url: str,
+    max_retries: Optional[int] = None,
+    **kwargs
+) -> httpx.Response:
+    """
+    Send a request, retrying transport errors and retryable status codes
+    with backoff. The final response (or exception) is returned/raised as-is.
+    """
+    if max_retries is None:
+        max_retries = settings.HTTP_MAX_RETRIES
+
+    attempt = 0
+    while True:
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.TransportError:
+            if attempt >= max_retries:
+                raise
+            await asyncio.sleep(retry_delay(attempt))
+            attempt += 1
+            continue
+
+        if response.status_code not in RETRYABLE_STATUS_CODES or attempt >= max_retries:
+            return response
+
+        await asyncio.sleep(retry_delay(attempt, response))
+        attempt += 1
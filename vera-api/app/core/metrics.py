@@ -0,0 +1,137 @@
+"""
+Prometheus metrics
+
+Metrics are defined here and recorded from the hot paths (HTTP routes,
+WebSocket chat, LLM streaming, TTS, database pool, background queues).
+Each replica serves its own registry at GET /metrics.
+"""
+import time
+
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "vera_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"]
+)
+
+WEBSOCKET_CONNECTIONS = Gauge(
+    "vera_websocket_connections",
+    "Open chat WebSocket connections"
+)
+
+LLM_TIME_TO_FIRST_TOKEN_SECONDS = Histogram(
+    "vera_llm_time_to_first_token_seconds",
+    "Time from request to first streamed token",
+    ["model", "provider"],
+    buckets=(0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0, 20.0)
+)
+
+LLM_TOKENS_PER_SECOND = Histogram(
+    "vera_llm_tokens_per_second",
+    "Completion tokens per second after the first token",
+    ["model", "provider"],
+    buckets=(5, 10, 20, 40, 60, 80, 100, 150, 200, 400, 800)
+)
+
+LLM_TOKENS = Counter(
+    "vera_llm_tokens_total",
+    "LLM tokens reported by providers",
+    ["model", "provider", "type"]  # type: prompt, completion, cached
+)
+
+TTS_SYNTHESIS_SECONDS = Histogram(
+    "vera_tts_synthesis_seconds",
+    "Text-to-speech latency (cache hits included)",
+    ["cache"],  # hit, miss
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0)
+)
+
+TTS_AUDIO_BYTES = Counter(
+    "vera_tts_audio_bytes_total",
+    "Audio bytes synthesized by ElevenLabs",
+    ["format"]
+)
+
+PROVIDER_QUEUE_SECONDS = Histogram(
+    "vera_provider_queue_seconds",
+    "Time spent waiting for an outbound provider slot",
+    ["provider"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+)
+
+PROVIDER_IN_FLIGHT = Gauge(
+    "vera_provider_in_flight",
+    "Outbound requests holding a provider slot",
+    ["provider"]
+)
+
+PROVIDER_QUEUED = Gauge(
+    "vera_provider_queued_requests",
+    "Outbound requests waiting for a provider slot",
+    ["provider"]
+)
+
+PROVIDER_RATE_LIMITED = Counter(
+    "vera_provider_rate_limited_total",
+    "Rate-limit (429) responses that paused a provider",
+    ["provider"]
+)
+
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "vera_db_pool_checkout_seconds",
+    "Time spent waiting for an async database connection",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+DB_POOL_CONNECTIONS_IN_USE = Gauge(
+    "vera_db_pool_connections_in_use",
+    "Async database connections currently checked out"
+)
+
+MESSAGE_QUEUE_DEPTH = Gauge(
+    "vera_message_queue_depth",
+    "Rows waiting in the write-behind message queue"
+)
+
+SESSION_ACTIVITY_PENDING = Gauge(
+    "vera_session_activity_pending",
+    "Session last_active updates waiting for the next flush"
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording HTTP latency by route template (e.g. /research-ids/{research_id_str})"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # FastAPI stores the matched route in the scope; avoid raw paths (unbounded labels)
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status_code)
+            ).observe(time.perf_counter() - started)
+
+
+def render_metrics() -> tuple:
+    """Current metrics in Prometheus text format, with its content type"""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -3,21 +3,41 @@ Security utilities for JWT tokens and password hashing
 """
 from datetime import datetime, timedelta
 from typing import Optional
+from urllib.parse import quote
+import hashlib
+import hmac
+import os
+import re
+import time
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.auth_cache import CurrentUser, IdentityCache, SessionActivityTracker
 from app.core.config import get_settings
-from app.db.base import get_db
-from app.models.database import ResearchID, UserSession
+from app.core.metrics import SESSION_ACTIVITY_PENDING
+from app.db.base import get_async_db, AsyncSessionLocal
+from app.models.database import ResearchID
 from app.schemas.auth import TokenData
 
 settings = get_settings()
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
+identity_cache = IdentityCache(ttl_seconds=settings.AUTH_CACHE_TTL_SECONDS)
+session_activity = SessionActivityTracker(
+    AsyncSessionLocal,
+    flush_interval_seconds=settings.SESSION_ACTIVITY_FLUSH_SECONDS
+)
+SESSION_ACTIVITY_PENDING.set_function(session_activity.pending_count)
+
+# Name of a cached TTS clip on disk (tts_<content hash>.<ext>); only these
+# are signed and served by the audio endpoint
+CLIP_FILENAME = re.compile(r"tts_[0-9a-f]{32}\.[a-z0-9]+")
+
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token"""
@@ -53,19 +73,26 @@ def verify_token(token: str) -> TokenData:
         raise credentials_exception
 
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> ResearchID:
-    """Get current authenticated user from JWT token"""
-    token = credentials.credentials
+async def authenticate_token(token: str, db: AsyncSession) -> CurrentUser:
+    """
+    Resolve a JWT to an active research user.
+    Verified identities are cached briefly so repeat requests skip the DB.
+    """
+    cached = identity_cache.get(token)
+    if cached is not None:
+        session_activity.touch(cached.session_id)
+        return cached
+
     token_data = verify_token(token)
 
     # Verify research ID exists and is active
-    research_user = db.query(ResearchID).filter(
-        ResearchID.research_id == token_data.research_id,
-        ResearchID.is_active == True
-    ).first()
+    result = await db.execute(
+        select(ResearchID).where(
+            ResearchID.research_id == token_data.research_id,
+            ResearchID.is_active == True
+        )
+    )
+    research_user = result.scalars().first()
 
     if research_user is None:
         raise HTTPException(
@@ -73,16 +100,63 @@ async def get_current_user(
             detail="Research ID not found or inactive"
         )
 
-    # Update session last_active time
-    session = db.query(UserSession).filter(
-        UserSession.id == token_data.session_id
-    ).first()
+    user = CurrentUser(
+        id=research_user.id,
+        research_id=research_user.research_id,
+        is_active=research_user.is_active,
+        created_at=research_user.created_at,
+        session_id=token_data.session_id
+    )
+    identity_cache.set(token, user)
+
+    # Update session last_active time (batched in the background)
+    session_activity.touch(token_data.session_id)
+
+    return user
 
-    if session:
-        session.last_active = datetime.utcnow()
-        db.commit()
 
-    return research_user
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db)
+) -> CurrentUser:
+    """Get current authenticated user from JWT token"""
+    return await authenticate_token(credentials.credentials, db)
+
+
+def audio_signature(filename: str, research_id: str, expires: int) -> str:
+    """HMAC binding an audio file to a research ID until `expires` (unix time)"""
+    message = f"{filename}|{research_id}|{expires}".encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()[:32]
+
+
+def sign_audio_url(audio_path: Optional[str], research_id: str) -> Optional[str]:
+    """
+    Short-lived URL for a cached TTS clip, e.g.
+    /api/v1/audio/tts_<hash>.mp3?rid=...&exp=...&sig=...
+    Anything that isn't a cached clip (None, external URLs) is returned as is.
+    """
+    if not audio_path:
+        return audio_path
+    filename = os.path.basename(audio_path)
+    if not CLIP_FILENAME.fullmatch(filename):
+        return audio_path
+
+    # Expiry is rounded up to the next TTL window so repeat requests for a
+    # clip get the same URL (and hit the browser cache)
+    ttl = settings.AUDIO_URL_TTL_SECONDS
+    expires = (int(time.time()) // ttl + 2) * ttl
+    signature = audio_signature(filename, research_id, expires)
+    return (
+        f"{settings.API_V1_PREFIX}/audio/{filename}"
+        f"?rid={quote(research_id)}&exp={expires}&sig={signature}"
+    )
+
+
+def verify_audio_signature(filename: str, research_id: str, expires: int, signature: str) -> bool:
+    """Check a signed audio URL (signature and expiry)"""
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(audio_signature(filename, research_id, expires), signature)
 
 
 def verify_admin_password(password: str) -> bool:
@@ -0,0 +1,105 @@
+"""
+Span-based tracing (OpenTelemetry)
+
+Each chat turn is a trace whose spans cover token verification, history
+load, LLM streaming, TTS and persistence, tagged with the conversation ID.
+Spans are exported locally, so tracing works without a collector:
+- TRACING_EXPORTER=console: one JSON span per line on stdout
+- TRACING_EXPORTER=file: one JSON span per line appended to TRACING_FILE
+- TRACING_EXPORTER=none (default): spans are not recorded
+"""
+import functools
+import inspect
+import os
+from typing import Dict, Optional
+
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+tracer = trace.get_tracer("vera-api")
+current_span = trace.get_current_span
+use_span = trace.use_span
+
+_provider: Optional[TracerProvider] = None
+_output = None
+
+
+def setup_tracing():
+    """Install the tracer provider and local exporter selected in settings"""
+    global _provider, _output
+
+    exporter_name = settings.TRACING_EXPORTER.lower()
+    if _provider is not None or exporter_name == "none":
+        return
+
+    if exporter_name == "file":
+        directory = os.path.dirname(settings.TRACING_FILE)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        _output = open(settings.TRACING_FILE, "a", buffering=1)
+        exporter = ConsoleSpanExporter(out=_output, formatter=lambda span: span.to_json(indent=None) + "\n")
+    elif exporter_name == "console":
+        exporter = ConsoleSpanExporter(formatter=lambda span: span.to_json(indent=None) + "\n")
+    else:
+        print(f"Unknown TRACING_EXPORTER '{settings.TRACING_EXPORTER}', tracing disabled")
+        return
+
+    _provider = TracerProvider(resource=Resource.create({
+        "service.name": "vera-api",
+        "service.version": settings.VERSION,
+    }))
+    _provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(_provider)
+
+
+def shutdown_tracing():
+    """Flush pending spans and close the exporter"""
+    global _provider, _output
+    if _provider is not None:
+        _provider.shutdown()
+        _provider = None
+    if _output is not None:
+        _output.close()
+        _output = None
+
+
+def traced(span_name: str, attributes: Optional[Dict[str, str]] = None):
+    """
+    Run a function (sync or async) inside a span.
+    `attributes` maps span attribute names to parameter names, e.g.
+    @traced("db.save_message", {"conversation.id": "conversation_id"})
+    """
+    attributes = attributes or {}
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        def start_span(args, kwargs):
+            bound = signature.bind_partial(*args, **kwargs).arguments
+            span_attributes = {
+                attribute: bound[parameter]
+                for attribute, parameter in attributes.items()
+                if bound.get(parameter) is not None
+            }
+            return tracer.start_as_current_span(span_name, attributes=span_attributes)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with start_span(args, kwargs):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with start_span(args, kwargs):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
@@ -1,14 +1,62 @@
 """
 Database connection and session management
+
+Two engines share the same DATABASE_URL:
+- a sync engine (psycopg2) used by alembic, scripts and seeding
+- an async engine (asyncpg) used by the FastAPI request handlers so that
+  database round-trips never block the event loop
 """
+import time
+from typing import AsyncGenerator
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.core.config import get_settings
+from app.core.metrics import DB_POOL_CHECKOUT_SECONDS, DB_POOL_CONNECTIONS_IN_USE
 
 settings = get_settings()
 
-# Create database engine
+
+def get_async_database_url(url: str) -> str:
+    """
+    Convert a sync PostgreSQL URL to its asyncpg equivalent.
+
+    asyncpg does not understand libpq-only query parameters, so `sslmode`
+    is translated to `ssl` and `channel_binding` (used by Neon) is dropped.
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme
+    if scheme in ("postgres", "postgresql", "postgresql+psycopg2"):
+        scheme = "postgresql+asyncpg"
+
+    query = []
+    for key, value in parse_qsl(parts.query):
+        if key == "sslmode":
+            query.append(("ssl", value))
+        elif key == "channel_binding":
+            continue
+        else:
+            query.append((key, value))
+
+    return urlunsplit((scheme, parts.netloc, parts.path, urlencode(query), parts.fragment))
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Async queue pool that records how long each connection checkout waits"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - started)
+
+
+# Create database engine (sync - alembic, scripts)
 engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,  # Verify connections before using
@@ -16,17 +64,43 @@ engine = create_engine(
     max_overflow=20
 )
 
-# Session factory
+# Session factory (sync)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Create async database engine (API request handlers)
+async_engine = create_async_engine(
+    get_async_database_url(settings.DATABASE_URL),
+    poolclass=TimedAsyncQueuePool,
+    pool_pre_ping=True,
+    pool_size=10,
+    max_overflow=20
+)
+DB_POOL_CONNECTIONS_IN_USE.set_function(lambda: async_engine.pool.checkedout())
+
+# Session factory (async)
+# expire_on_commit=False keeps loaded attributes usable after commit,
+# since lazy refreshes are not allowed on an AsyncSession.
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 # Base class for models
 Base = declarative_base()
 
 
 def get_db():
-    """Dependency for database sessions"""
+    """Dependency for sync database sessions (scripts and tooling)"""
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Dependency for async database sessions"""
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -3,13 +3,20 @@ Main FastAPI application
 """
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
-import os
+from fastapi.responses import JSONResponse, Response
+from contextlib import asynccontextmanager
 import traceback
 
 from app.core.config import get_settings
-from app.api.endpoints import auth, chat, admin
+from app.core.security import session_activity
+from app.core.metrics import MetricsMiddleware, render_metrics
+from app.core.tracing import setup_tracing, shutdown_tracing
+from app.services.stats_service import stats_service
+from app.services.message_writer import message_writer
+from app.services.elevenlabs_service import elevenlabs_service
+from app.services.tts_service import tts_service
+from app.api.endpoints import auth, chat, admin, audio
+from app.prompts import MASTER_PROMPT_VERSION
 
 settings = get_settings()
 
@@ -17,10 +24,29 @@ settings = get_settings()
 print(f"🔧 CORS_ORIGINS configured: {settings.CORS_ORIGINS}")
 print(f"🔧 CORS_ORIGINS type: {type(settings.CORS_ORIGINS)}")
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background workers on startup and drain them on shutdown"""
+    setup_tracing()
+    await elevenlabs_service.start()
+    session_activity.start()
+    stats_service.start()
+    message_writer.start()
+    yield
+    await message_writer.stop()
+    await stats_service.stop()
+    await session_activity.stop()
+    await elevenlabs_service.close()
+    tts_service.close()
+    shutdown_tracing()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
-    description="Multi-user FastAPI backend for Vera - P.A.D. Educational Chatbot"
+    description="Multi-user FastAPI backend for Vera - P.A.D. Educational Chatbot",
+    lifespan=lifespan
 )
 
 # CORS middleware - must be before routes
@@ -30,12 +56,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
     allow_headers=["Content-Type", "Authorization", "Accept", "Origin", "X-Requested-With"],
-    expose_headers=["*"],
+    expose_headers=["*", "X-Total-Count"],
     max_age=3600,  # Cache preflight requests for 1 hour
 )
 
 print(f"✅ CORS middleware added with origins: {settings.CORS_ORIGINS}")
 
+# Request latency metrics (outermost, so CORS and error handling are timed too)
+app.add_middleware(MetricsMiddleware)
+
 # Global exception handler to ensure CORS headers on errors
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -66,10 +95,8 @@ async def preflight_handler(rest_of_path: str):
 app.include_router(auth.router, prefix=f"{settings.API_V1_PREFIX}/auth", tags=["auth"])
 app.include_router(chat.router, prefix=f"{settings.API_V1_PREFIX}/chat", tags=["chat"])
 app.include_router(admin.router, prefix=f"{settings.API_V1_PREFIX}/admin", tags=["admin"])
-
-# Mount audio files directory
-if os.path.exists("audio_files"):
-    app.mount("/audio", StaticFiles(directory="audio_files"), name="audio")
+# Cached TTS clips (signed URLs), served from the TTS cache directory
+app.include_router(audio.router, prefix=f"{settings.API_V1_PREFIX}/audio", tags=["audio"])
 
 
 @app.get("/")
@@ -85,7 +112,14 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy"}
+    return {"status": "healthy", "prompt_version": MASTER_PROMPT_VERSION}
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics for this replica"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
 
 
 if __name__ == "__main__":
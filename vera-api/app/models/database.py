@@ -31,7 +31,7 @@ class UserSession(Base):
     research_id_fk = Column(Integer, ForeignKey("vera_research_ids.id"), nullable=False)
     session_token = Column(String(500), unique=True, nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    last_active = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    last_active = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), index=True)
     ip_address = Column(String(50), nullable=True)
     user_agent = Column(Text, nullable=True)
 
@@ -80,4 +80,32 @@ class Conversation(Base):
     __table_args__ = (
         Index('ix_conversation_research_timestamp', 'conversation_id', 'timestamp'),
         Index('ix_research_timestamp', 'research_id_fk', 'timestamp'),
+        Index(
+            'uq_elevenlabs_conversation_message',
+            'elevenlabs_conversation_id',
+            'elevenlabs_message_id',
+            unique=True
+        ),
+    )
+
+
+class LLMUsage(Base):
+    """Token usage and latency of each LLM completion"""
+    __tablename__ = "vera_llm_usage"
+
+    id = Column(Integer, primary_key=True, index=True)
+    research_id_fk = Column(Integer, ForeignKey("vera_research_ids.id"), nullable=False)
+    conversation_id = Column(String(255), nullable=True)
+    model = Column(String(100), nullable=False)  # Model requested by the client
+    provider = Column(String(20), nullable=False)  # Provider that served it ('openai', 'groq', 'openrouter')
+    prompt_tokens = Column(Integer, nullable=True)  # None when the provider reported no usage
+    completion_tokens = Column(Integer, nullable=True)
+    cached_tokens = Column(Integer, nullable=True)  # Prompt tokens served from the provider's cache
+    first_token_ms = Column(Integer, nullable=True)
+    duration_ms = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index('ix_llm_usage_research_created', 'research_id_fk', 'created_at'),
+        Index('ix_llm_usage_created', 'created_at'),
     )
@@ -1,3 +1,5 @@
+import hashlib
+
 master_prompt_old = """Master System Prompt for Vera
 
 Role and Purpose
@@ -320,6 +322,13 @@ If a specialist is needed, a vascular surgeon may be involved in care.
 """
 
 
+# The system prompt is sent byte-for-byte identical as the first message of
+# every request, so providers can serve it from their prompt cache. Its
+# version (a content hash) changes with any edit and is logged with the
+# cache statistics.
+MASTER_PROMPT_VERSION = hashlib.sha256(master_prompt.encode()).hexdigest()[:12]
+
+
 vera_first_message = """# Hi, I am VERA  
 Your knowledgeable guide about **Peripheral Artery Disease (P.A.D.)**. My mission is to answer your questions about P.A.D.  
 
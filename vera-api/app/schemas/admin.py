@@ -48,3 +48,23 @@ class AdminStatsResponse(BaseModel):
     total_conversations: int
     total_messages: int
     messages_last_24h: int
+    refreshed_at: Optional[datetime] = None
+
+
+class UsageAggregate(BaseModel):
+    """LLM usage of one research ID with one model on one day"""
+    research_id: str
+    model: str
+    day: datetime
+    requests: int
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int
+    avg_first_token_ms: Optional[float] = None
+    avg_duration_ms: Optional[float] = None
+
+
+class UsageReportResponse(BaseModel):
+    """LLM usage aggregated per research ID, model and day"""
+    since: datetime
+    items: List[UsageAggregate]
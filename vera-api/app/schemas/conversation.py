@@ -12,6 +12,7 @@ class MessageCreate(BaseModel):
     conversation_id: str
     content: str = Field(..., min_length=1, max_length=10000)
     model: str = "gpt-4o"
+    audio_format: Optional[str] = None  # ElevenLabs output format, e.g. opus_48000_32
 
 
 class MessageResponse(BaseModel):
@@ -32,15 +33,18 @@ class ConversationHistoryRequest(BaseModel):
     """Request conversation history"""
     research_id: str
     conversation_id: Optional[str] = None
-    limit: int = Field(default=50, le=500)
+    limit: int = Field(default=50, ge=1, le=500)
     offset: int = Field(default=0, ge=0)
+    cursor: Optional[str] = None  # next_cursor from the previous page; offset is ignored when set
+    include_total: bool = True
 
 
 class ConversationHistoryResponse(BaseModel):
     """List of messages in conversation"""
     messages: List[MessageResponse]
-    total: int
+    total: Optional[int] = None  # None when include_total is False
     research_id: str
+    next_cursor: Optional[str] = None  # None on the last page
 
 
 class StreamChatRequest(BaseModel):
@@ -83,6 +87,30 @@ class MessageSaveResponse(BaseModel):
     timestamp: datetime
 
 
+class MessageBatchSaveRequest(BaseModel):
+    """Request to save several frontend messages in one call"""
+    research_id: str
+    messages: List[MessageSaveRequest] = Field(..., min_length=1, max_length=200)
+
+
+class MessageSaveResult(BaseModel):
+    """Outcome of saving one message in a batch"""
+    index: int
+    success: bool
+    message_id: Optional[int] = None
+    timestamp: Optional[datetime] = None
+    duplicate: bool = False
+    error: Optional[str] = None
+
+
+class MessageBatchSaveResponse(BaseModel):
+    """Response after saving a batch of messages"""
+    success: bool
+    saved: int
+    duplicates: int
+    results: List[MessageSaveResult]
+
+
 class ElevenLabsConversationSyncRequest(BaseModel):
     """Request to sync an ElevenLabs conversation"""
     research_id: str
@@ -94,3 +122,24 @@ class ElevenLabsConversationSyncResponse(BaseModel):
     success: bool
     messages_synced: int
     conversation_id: str
+
+
+class ElevenLabsConversationBatchSyncRequest(BaseModel):
+    """Request to sync several ElevenLabs conversations at once"""
+    research_id: str
+    elevenlabs_conversation_ids: List[str] = Field(..., min_length=1, max_length=100)
+
+
+class ElevenLabsConversationSyncResult(BaseModel):
+    """Outcome of syncing one conversation in a batch"""
+    conversation_id: str
+    success: bool
+    messages_synced: int = 0
+    error: Optional[str] = None
+
+
+class ElevenLabsConversationBatchSyncResponse(BaseModel):
+    """Response after syncing a batch of ElevenLabs conversations"""
+    success: bool
+    total_messages_synced: int
+    results: List[ElevenLabsConversationSyncResult]
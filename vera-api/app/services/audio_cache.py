@@ -0,0 +1,258 @@
+"""
+Content-addressed cache for synthesized TTS audio
+
+Clips are keyed by (text, voice_id, model_id, output_format) and stored on
+disk as `tts_<hash>.<ext>`, with a small in-memory LRU in front for hot
+clips (greetings, common answers). Disk entries are evicted by age and
+total size. Clips in memory are `bytes` or read-only memoryviews (from
+put_stream); both support len(), slicing, base64 and socket sends.
+
+ElevenLabs PCM (16-bit little-endian mono) is stored on disk as a WAV file
+so the audio URL is playable; callers still get the raw PCM samples.
+"""
+import hashlib
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+AudioBytes = Union[bytes, memoryview]
+
+AUDIO_MEDIA_TYPES = {
+    "mp3": "audio/mpeg",
+    "opus": "audio/ogg",
+    "wav": "audio/wav",
+    "ulaw": "audio/basic",
+}
+
+# Codecs whose per-sentence clips can be byte-concatenated into one playable
+# clip. Separately encoded Ogg/Opus streams can't: the result is a chained
+# Ogg that many players stop playing after the first sentence.
+CONCATENABLE_CODECS = {"mp3", "pcm", "ulaw"}
+
+WAV_HEADER_BYTES = 44
+
+
+def audio_codec(output_format: str) -> str:
+    """Codec of an ElevenLabs output format, e.g. mp3_22050_32 -> mp3"""
+    return output_format.split("_", 1)[0]
+
+
+def audio_extension(output_format: str) -> str:
+    """File extension for an ElevenLabs output format, e.g. mp3_22050_32 -> mp3, pcm_16000 -> wav"""
+    codec = audio_codec(output_format)
+    return "wav" if codec == "pcm" else codec
+
+
+def concatenable(output_format: str) -> bool:
+    """Whether clips in this format can be joined by concatenating their bytes"""
+    return audio_codec(output_format) in CONCATENABLE_CODECS
+
+
+def wav_header(output_format: str, data_bytes: int) -> bytes:
+    """RIFF/WAVE header for ElevenLabs PCM (16-bit little-endian mono) at the format's sample rate"""
+    sample_rate = int(output_format.split("_")[1])
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_bytes, b"WAVE",
+        b"fmt ", 16, 1, 1, sample_rate, sample_rate * 2, 2, 16,
+        b"data", data_bytes
+    )
+
+
+def audio_media_type(filename: str) -> str:
+    """Content type for a cached clip, by extension"""
+    return AUDIO_MEDIA_TYPES.get(filename.rsplit(".", 1)[-1], "application/octet-stream")
+
+
+class AudioCache:
+    """Two-tier (memory + disk) cache of TTS audio clips"""
+
+    def __init__(
+        self,
+        directory: Path,
+        max_disk_bytes: int,
+        max_age_seconds: int,
+        max_memory_items: int = 128,
+        eviction_interval_seconds: int = 300
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_disk_bytes = max_disk_bytes
+        self.max_age_seconds = max_age_seconds
+        self.max_memory_items = max_memory_items
+        self.eviction_interval_seconds = eviction_interval_seconds
+
+        self._memory: "OrderedDict[str, Tuple[str, AudioBytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_eviction = 0.0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(text: str, voice_id: str, model_id: str, output_format: str) -> str:
+        """Content hash identifying a clip"""
+        material = "\x1f".join([voice_id, model_id, output_format, text])
+        return hashlib.sha256(material.encode()).hexdigest()[:32]
+
+    def path_for(self, key: str, output_format: str) -> Path:
+        """Disk location for a cache key (named to match app.core.security.CLIP_FILENAME)"""
+        return self.directory / f"tts_{key}.{audio_extension(output_format)}"
+
+    def _remember(self, key: str, file_path: str, audio_bytes: AudioBytes):
+        """Insert into the in-memory LRU (caller holds the lock)"""
+        self._memory[key] = (file_path, audio_bytes)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def contains(self, key: str, output_format: str) -> bool:
+        """Whether a clip is cached (in memory or on disk), without loading it"""
+        with self._lock:
+            if key in self._memory:
+                return True
+        return self.path_for(key, output_format).exists()
+
+    def get(self, key: str, output_format: str) -> Optional[Tuple[str, AudioBytes]]:
+        """Return (file_path, audio_bytes) for a cached clip, or None"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry
+
+        file_path = self.path_for(key, output_format)
+        try:
+            stat = file_path.stat()
+            if time.time() - stat.st_mtime > self.max_age_seconds:
+                raise FileNotFoundError
+            audio_bytes = file_path.read_bytes()
+            if audio_codec(output_format) == "pcm":
+                audio_bytes = memoryview(audio_bytes)[WAV_HEADER_BYTES:]
+            # Touch so size-based eviction treats it as recently used
+            os.utime(file_path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(key, str(file_path), audio_bytes)
+        return str(file_path), audio_bytes
+
+    @staticmethod
+    def _tmp_path(file_path: Path) -> Path:
+        # Clips are written to a temp file and renamed so readers never see partial audio
+        return file_path.with_name(f"{file_path.name}.{threading.get_ident()}.tmp")
+
+    def put(self, key: str, output_format: str, audio_bytes: AudioBytes) -> str:
+        """Store a clip on disk and in memory, returns the file path"""
+        file_path = self.path_for(key, output_format)
+        tmp_path = self._tmp_path(file_path)
+        with open(tmp_path, "wb") as f:
+            if audio_codec(output_format) == "pcm":
+                f.write(wav_header(output_format, len(audio_bytes)))
+            f.write(audio_bytes)
+        os.replace(tmp_path, file_path)
+
+        self._stored(key, str(file_path), audio_bytes)
+        return str(file_path)
+
+    def put_stream(self, key: str, output_format: str, chunks: Iterable[bytes]) -> Tuple[str, memoryview]:
+        """
+        Store a clip as it is produced. Each chunk is written to disk and
+        appended to a single growing buffer (no chunk list, no final join),
+        so peak memory stays close to one copy of the clip. Returns the file
+        path and a read-only view of the buffer.
+        """
+        file_path = self.path_for(key, output_format)
+        tmp_path = self._tmp_path(file_path)
+        pcm = audio_codec(output_format) == "pcm"
+        buffer = bytearray()
+        try:
+            with open(tmp_path, "wb") as f:
+                if pcm:
+                    # Placeholder until the data length is known
+                    f.write(wav_header(output_format, 0))
+                for chunk in chunks:
+                    f.write(chunk)
+                    buffer += chunk
+                if pcm:
+                    f.seek(0)
+                    f.write(wav_header(output_format, len(buffer)))
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+        audio_bytes = memoryview(buffer).toreadonly()
+        self._stored(key, str(file_path), audio_bytes)
+        return str(file_path), audio_bytes
+
+    def _stored(self, key: str, file_path: str, audio_bytes: AudioBytes):
+        """Remember a newly written clip and run eviction when due"""
+        with self._lock:
+            self._remember(key, file_path, audio_bytes)
+            evict_due = time.time() - self._last_eviction > self.eviction_interval_seconds
+            if evict_due:
+                self._last_eviction = time.time()
+
+        if evict_due:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        Remove expired clips, then the least recently used clips until the
+        cache fits in max_disk_bytes. Returns the number of files removed.
+        """
+        now = time.time()
+        entries = []
+        removed = 0
+
+        for file_path in self.directory.glob("tts_*"):
+            try:
+                stat = file_path.stat()
+            except FileNotFoundError:
+                continue
+            if now - stat.st_mtime > self.max_age_seconds:
+                file_path.unlink(missing_ok=True)
+                removed += 1
+            elif file_path.suffix != ".tmp":
+                # In-flight writes are left alone
+                entries.append((stat.st_mtime, stat.st_size, file_path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, file_path in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_disk_bytes:
+                break
+            file_path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+
+        if removed:
+            with self._lock:
+                # Drop memory entries whose backing file is gone
+                for key in [k for k, (path, _) in self._memory.items() if not os.path.exists(path)]:
+                    del self._memory[key]
+                self.evictions += removed
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters and current memory tier size"""
+        with self._lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "memory_items": len(self._memory),
+                "memory_bytes": sum(len(audio) for _, audio in self._memory.values()),
+            }
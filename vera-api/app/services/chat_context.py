@@ -0,0 +1,87 @@
+"""
+Per-connection conversation context for the chat WebSocket
+
+A socket is long-lived and the server writes every message it needs for
+context itself, so each connection keeps its validated identity and a
+rolling window of recent turns in memory. The window is loaded from the
+database only when the connection starts a conversation (first message or
+conversation switch) and is appended to as messages are saved.
+
+The connection holds no database session: messages are persisted by the
+write-behind queue, and the occasional identity or history read opens a
+short-lived session that returns its connection to the pool right away.
+"""
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from app.core.auth_cache import CurrentUser
+from app.core.security import authenticate_token, session_activity
+from app.services.conversation_service import conversation_service
+
+
+class ChatConnectionContext:
+    """Identity and rolling message history for one WebSocket connection"""
+
+    def __init__(self, session_factory, max_messages: int = 50, revalidate_seconds: int = 30):
+        self.session_factory = session_factory
+        self.max_messages = max_messages
+        self.revalidate_seconds = revalidate_seconds
+        self.user: Optional[CurrentUser] = None
+        self.conversation_id: Optional[str] = None
+        self.messages: Deque[Dict[str, Any]] = deque(maxlen=max_messages)
+        self._token: Optional[str] = None
+        self._validated_at = 0.0
+
+    async def authenticate(self, token: str) -> CurrentUser:
+        """
+        Resolve the token, reusing this connection's identity while it is fresh.
+        The token is re-validated every revalidate_seconds (or when it
+        changes) so expiry and deactivation still take effect.
+        """
+        if (
+            self.user is not None
+            and token == self._token
+            and time.monotonic() - self._validated_at < self.revalidate_seconds
+        ):
+            session_activity.touch(self.user.session_id)
+            return self.user
+
+        async with self.session_factory() as db:
+            user = await authenticate_token(token, db)
+        if self.user is not None and user.id != self.user.id:
+            # Different participant on the same socket: drop their context
+            self.conversation_id = None
+            self.messages.clear()
+
+        self.user = user
+        self._token = token
+        self._validated_at = time.monotonic()
+        return user
+
+    async def load_conversation(self, conversation_id: str):
+        """Hydrate the history window from the database on conversation switch"""
+        if conversation_id == self.conversation_id:
+            return
+
+        async with self.session_factory() as db:
+            messages = await conversation_service.get_recent_messages(
+                db=db,
+                research_id=self.user.research_id,
+                conversation_id=conversation_id,
+                limit=self.max_messages,
+                research_id_fk=self.user.id
+            )
+        self.conversation_id = conversation_id
+        self.messages.clear()
+        self.messages.extend(
+            {"role": msg.role, "content": msg.content} for msg in messages
+        )
+
+    def append(self, role: str, content: str):
+        """Record a message saved on this connection"""
+        self.messages.append({"role": role, "content": content})
+
+    def history(self) -> List[Dict[str, Any]]:
+        """Chronological history for building the LLM prompt"""
+        return list(self.messages)
@@ -1,13 +1,18 @@
 """
 Conversation management service
 """
+import base64
+import binascii
 from datetime import datetime
-from typing import List, Optional
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 
+from app.core.tracing import traced
 from app.models.database import Conversation, ResearchID
-from app.schemas.conversation import MessageResponse
+from app.schemas.conversation import MessageResponse, MessageSaveRequest, MessageSaveResult
 
 
 class ConversationService:
@@ -20,26 +25,51 @@ class ConversationService:
         return f"conv_{timestamp}_{research_id}"
 
     @staticmethod
-    def save_message(
-        db: Session,
+    async def resolve_research_id_fk(
+        db: AsyncSession,
+        research_id: str,
+        research_id_fk: Optional[int] = None
+    ) -> Optional[int]:
+        """Return the ResearchID primary key, skipping the lookup when already known"""
+        if research_id_fk is not None:
+            return research_id_fk
+        research_user = await ConversationService.get_research_user(db, research_id)
+        return research_user.id if research_user else None
+
+    @staticmethod
+    async def get_research_user(
+        db: AsyncSession,
+        research_id: str
+    ) -> Optional[ResearchID]:
+        """Look up a ResearchID row by its string identifier"""
+        result = await db.execute(
+            select(ResearchID).where(ResearchID.research_id == research_id)
+        )
+        return result.scalars().first()
+
+    @staticmethod
+    @traced("db.save_message", {"conversation.id": "conversation_id", "message.role": "role"})
+    async def save_message(
+        db: AsyncSession,
         research_id: str,
         conversation_id: str,
         role: str,
         content: str,
         model_used: Optional[str] = None,
-        audio_url: Optional[str] = None
+        audio_url: Optional[str] = None,
+        research_id_fk: Optional[int] = None
     ) -> Conversation:
         """Save a message to the database"""
         # Get research ID foreign key
-        research_user = db.query(ResearchID).filter(
-            ResearchID.research_id == research_id
-        ).first()
+        research_id_fk = await ConversationService.resolve_research_id_fk(
+            db, research_id, research_id_fk
+        )
 
-        if not research_user:
+        if research_id_fk is None:
             raise ValueError(f"Research ID {research_id} not found")
 
         message = Conversation(
-            research_id_fk=research_user.id,
+            research_id_fk=research_id_fk,
             conversation_id=conversation_id,
             role=role,
             content=content,
@@ -48,86 +78,371 @@ class ConversationService:
         )
 
         db.add(message)
-        db.commit()
-        db.refresh(message)
+        await db.commit()
+        await db.refresh(message)
         return message
 
     @staticmethod
-    def get_conversation_history(
-        db: Session,
+    def encode_history_cursor(message: Conversation) -> str:
+        """Opaque cursor pointing just after a message in (timestamp, id) order"""
+        raw = f"{message.timestamp.isoformat()}|{message.id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    @staticmethod
+    def decode_history_cursor(cursor: str) -> Tuple[datetime, int]:
+        """Parse a history cursor, raising ValueError if it is malformed"""
+        try:
+            timestamp, message_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+            return datetime.fromisoformat(timestamp), int(message_id)
+        except (ValueError, UnicodeDecodeError, binascii.Error) as e:
+            raise ValueError("Invalid cursor") from e
+
+    @staticmethod
+    @traced("db.get_conversation_history", {"conversation.id": "conversation_id", "history.limit": "limit"})
+    async def get_conversation_history(
+        db: AsyncSession,
         research_id: str,
         conversation_id: Optional[str] = None,
         limit: int = 50,
-        offset: int = 0
-    ) -> tuple[List[Conversation], int]:
+        offset: int = 0,
+        research_id_fk: Optional[int] = None,
+        cursor: Optional[str] = None,
+        include_total: bool = True
+    ) -> Tuple[List[Conversation], Optional[int], Optional[str]]:
         """
-        Get conversation history for a research ID
-        Returns (messages, total_count)
+        Get conversation history for a research ID, oldest first.
+        Returns (messages, total_count, next_cursor)
+
+        With a cursor the page starts after the cursor's (timestamp, id)
+        using the research/conversation timestamp indexes, so deep pages
+        cost the same as the first one; offset is ignored. next_cursor is
+        None on the last page. The total is a separate COUNT and is
+        skipped (None) when include_total is False.
         """
         # Get research ID foreign key
-        research_user = db.query(ResearchID).filter(
-            ResearchID.research_id == research_id
-        ).first()
+        research_id_fk = await ConversationService.resolve_research_id_fk(
+            db, research_id, research_id_fk
+        )
 
-        if not research_user:
-            return [], 0
+        if research_id_fk is None:
+            return [], 0, None
 
-        query = db.query(Conversation).filter(
-            Conversation.research_id_fk == research_user.id
-        )
+        filters = [Conversation.research_id_fk == research_id_fk]
 
         if conversation_id:
-            query = query.filter(Conversation.conversation_id == conversation_id)
+            filters.append(Conversation.conversation_id == conversation_id)
+
+        total = None
+        if include_total:
+            total = await db.scalar(
+                select(func.count()).select_from(Conversation).where(*filters)
+            )
+
+        query = select(Conversation).where(*filters)
+        if cursor:
+            after_timestamp, after_id = ConversationService.decode_history_cursor(cursor)
+            query = query.where(
+                tuple_(Conversation.timestamp, Conversation.id) > (after_timestamp, after_id)
+            )
+        else:
+            query = query.offset(offset)
+
+        # Fetch one extra row to know whether another page exists
+        result = await db.execute(
+            query.order_by(
+                Conversation.timestamp.asc(),
+                Conversation.id.asc()
+            ).limit(limit + 1)
+        )
+        messages = list(result.scalars().all())
+
+        next_cursor = None
+        if len(messages) > limit:
+            messages = messages[:limit]
+            next_cursor = ConversationService.encode_history_cursor(messages[-1])
+
+        return messages, total, next_cursor
 
-        total = query.count()
+    @staticmethod
+    @traced("db.get_recent_messages", {"conversation.id": "conversation_id", "history.limit": "limit"})
+    async def get_recent_messages(
+        db: AsyncSession,
+        research_id: str,
+        conversation_id: str,
+        limit: int = 50,
+        research_id_fk: Optional[int] = None
+    ) -> List[Conversation]:
+        """
+        Get the newest `limit` user/assistant messages of a conversation,
+        returned oldest first (for LLM context)
+        """
+        research_id_fk = await ConversationService.resolve_research_id_fk(
+            db, research_id, research_id_fk
+        )
 
-        messages = query.order_by(
-            Conversation.timestamp.asc()
-        ).offset(offset).limit(limit).all()
+        if research_id_fk is None:
+            return []
 
-        return messages, total
+        result = await db.execute(
+            select(Conversation).where(
+                Conversation.research_id_fk == research_id_fk,
+                Conversation.conversation_id == conversation_id,
+                Conversation.role.in_(["user", "assistant"])
+            ).order_by(
+                Conversation.timestamp.desc(),
+                Conversation.id.desc()
+            ).limit(limit)
+        )
+        messages = list(result.scalars().all())
+        messages.reverse()
+        return messages
 
     @staticmethod
-    def get_recent_conversations(
-        db: Session,
+    @traced("db.get_recent_conversations")
+    async def get_recent_conversations(
+        db: AsyncSession,
         research_id: str,
-        limit: int = 10
+        limit: int = 10,
+        research_id_fk: Optional[int] = None
     ) -> List[str]:
         """Get list of recent conversation IDs for a research ID"""
-        research_user = db.query(ResearchID).filter(
-            ResearchID.research_id == research_id
-        ).first()
+        research_id_fk = await ConversationService.resolve_research_id_fk(
+            db, research_id, research_id_fk
+        )
 
-        if not research_user:
+        if research_id_fk is None:
             return []
 
-        conversations = db.query(Conversation.conversation_id).filter(
-            Conversation.research_id_fk == research_user.id
-        ).distinct().order_by(
-            desc(Conversation.timestamp)
-        ).limit(limit).all()
+        # Order conversations by their most recent message
+        result = await db.execute(
+            select(Conversation.conversation_id).where(
+                Conversation.research_id_fk == research_id_fk
+            ).group_by(
+                Conversation.conversation_id
+            ).order_by(
+                func.max(Conversation.timestamp).desc()
+            ).limit(limit)
+        )
 
-        return [conv[0] for conv in conversations]
+        return [conv[0] for conv in result.all()]
 
-    def get_existing_elevenlabs_conversations(
-        db: Session,
-        research_id: str
+    @staticmethod
+    async def get_existing_elevenlabs_conversations(
+        db: AsyncSession,
+        research_id: str,
+        research_id_fk: Optional[int] = None
     ) -> List[str]:
         """Get list of existing ElevenLabs conversation IDs for a research ID"""
-        research_user = db.query(ResearchID).filter(
-            ResearchID.research_id == research_id
-        ).first()
+        research_id_fk = await ConversationService.resolve_research_id_fk(
+            db, research_id, research_id_fk
+        )
 
-        if not research_user:
+        if research_id_fk is None:
             return []
 
         # Get distinct elevenlabs_conversation_id values that are not null
-        conversations = db.query(Conversation.elevenlabs_conversation_id).filter(
-            Conversation.research_id_fk == research_user.id,
-            Conversation.elevenlabs_conversation_id.isnot(None)
-        ).distinct().all()
+        result = await db.execute(
+            select(Conversation.elevenlabs_conversation_id).where(
+                Conversation.research_id_fk == research_id_fk,
+                Conversation.elevenlabs_conversation_id.isnot(None)
+            ).distinct()
+        )
+
+        return [conv[0] for conv in result.all() if conv[0]]
+
+    @staticmethod
+    @traced("db.save_frontend_messages")
+    async def save_frontend_messages(
+        db: AsyncSession,
+        research_id: str,
+        research_id_fk: int,
+        items: List[MessageSaveRequest]
+    ) -> List[MessageSaveResult]:
+        """
+        Save a batch of frontend messages in one transaction.
+
+        ElevenLabs messages already in the database (or repeated within the
+        batch) are reported as duplicates instead of being inserted again.
+        Returns one result per item, in request order.
+        """
+        results: List[Optional[MessageSaveResult]] = [None] * len(items)
+        valid = []
+
+        for index, item in enumerate(items):
+            if item.research_id != research_id:
+                results[index] = MessageSaveResult(index=index, success=False, error="Research ID mismatch")
+                continue
+            try:
+                timestamp = datetime.fromisoformat(item.timestamp.replace('Z', '+00:00'))
+            except ValueError:
+                results[index] = MessageSaveResult(index=index, success=False, error="Invalid timestamp format")
+                continue
+            valid.append((index, item, timestamp))
+
+        # A concurrent request may insert the same ElevenLabs message between
+        # our duplicate check and commit; retry once so it is seen as a duplicate
+        for attempt in range(2):
+            try:
+                saved = await ConversationService._insert_frontend_messages(
+                    db, research_id, research_id_fk, valid
+                )
+                break
+            except IntegrityError:
+                await db.rollback()
+                if attempt:
+                    raise
+
+        for index, result in saved.items():
+            results[index] = result
+        return results
+
+    @staticmethod
+    async def _insert_frontend_messages(
+        db: AsyncSession,
+        research_id: str,
+        research_id_fk: int,
+        valid: List[tuple]
+    ) -> Dict[int, MessageSaveResult]:
+        """Dedupe and insert validated (index, item, timestamp) entries, then commit"""
+        def message_key(item: MessageSaveRequest) -> Optional[tuple]:
+            if item.elevenlabs_conversation_id and item.elevenlabs_message_id:
+                return item.elevenlabs_conversation_id, item.elevenlabs_message_id
+            return None
+
+        # Find already-stored ElevenLabs messages in one query
+        keys = {message_key(item) for _, item, _ in valid} - {None}
+        existing = {}
+        if keys:
+            rows = await db.execute(
+                select(
+                    Conversation.id,
+                    Conversation.timestamp,
+                    Conversation.elevenlabs_conversation_id,
+                    Conversation.elevenlabs_message_id
+                ).where(
+                    tuple_(
+                        Conversation.elevenlabs_conversation_id,
+                        Conversation.elevenlabs_message_id
+                    ).in_(list(keys))
+                )
+            )
+            existing = {
+                (row.elevenlabs_conversation_id, row.elevenlabs_message_id): row
+                for row in rows
+            }
+
+        results = {}
+        added = {}
+        inserted = []
+        for index, item, timestamp in valid:
+            key = message_key(item)
+            if key in existing:
+                row = existing[key]
+                results[index] = MessageSaveResult(
+                    index=index, success=True, message_id=row.id,
+                    timestamp=row.timestamp, duplicate=True
+                )
+                continue
+            if key in added:
+                inserted.append((index, added[key], True))
+                continue
+
+            message = Conversation(
+                research_id_fk=research_id_fk,
+                conversation_id=item.elevenlabs_conversation_id
+                or ConversationService.create_conversation_id(research_id),
+                role=item.role,
+                content=item.content,
+                timestamp=timestamp,
+                provider=item.provider,
+                elevenlabs_conversation_id=item.elevenlabs_conversation_id,
+                elevenlabs_message_id=item.elevenlabs_message_id
+            )
+            db.add(message)
+            inserted.append((index, message, False))
+            if key:
+                added[key] = message
+
+        await db.commit()
+
+        for index, message, duplicate in inserted:
+            results[index] = MessageSaveResult(
+                index=index, success=True, message_id=message.id,
+                timestamp=message.timestamp, duplicate=duplicate
+            )
+        return results
+
+    @staticmethod
+    def parse_elevenlabs_transcript(
+        conversation_data: Dict[str, Any],
+        research_id_fk: int,
+        elevenlabs_conversation_id: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Convert an ElevenLabs conversation payload into Conversation row dicts.
+
+        Transcript entries without an `id` get a positional ID (`turn_<n>`,
+        n counting stored, non-empty entries) so that re-syncing the same
+        transcript is idempotent. Rows synced before positional IDs existed
+        were backfilled the same way by migration 8b4e1c7d2a90.
+        """
+        transcript = conversation_data.get("transcript")
+        if not transcript or not isinstance(transcript, list):
+            return []
+
+        rows = []
+        for message in transcript:
+            # Parse message fields (ElevenLabs format may vary)
+            role = "user" if message.get("role") == "user" else "assistant"
+            content = message.get("message") or message.get("text") or ""
+
+            # Skip empty messages
+            if not content.strip():
+                continue
+
+            # Parse timestamp
+            timestamp_str = message.get("timestamp")
+            if timestamp_str:
+                try:
+                    timestamp = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
+                except (ValueError, AttributeError):
+                    timestamp = datetime.now()
+            else:
+                timestamp = datetime.now()
+
+            rows.append({
+                "research_id_fk": research_id_fk,
+                "conversation_id": elevenlabs_conversation_id,
+                "role": role,
+                "content": content,
+                "timestamp": timestamp,
+                "provider": "elevenlabs",
+                "elevenlabs_conversation_id": elevenlabs_conversation_id,
+                "elevenlabs_message_id": message.get("id") or f"turn_{len(rows)}",
+            })
+
+        return rows
+
+    @staticmethod
+    @traced("db.upsert_elevenlabs_messages")
+    async def upsert_elevenlabs_messages(
+        db: AsyncSession,
+        rows: List[Dict[str, Any]]
+    ) -> int:
+        """
+        Insert transcript rows in a single statement, skipping messages that
+        already exist (unique on elevenlabs_conversation_id + elevenlabs_message_id).
+        Returns the number of rows actually inserted. Does not commit.
+        """
+        if not rows:
+            return 0
+
+        stmt = pg_insert(Conversation).values(rows).on_conflict_do_nothing(
+            index_elements=["elevenlabs_conversation_id", "elevenlabs_message_id"]
+        ).returning(Conversation.id)
 
-        return [conv[0] for conv in conversations if conv[0]]
+        result = await db.execute(stmt)
+        return len(result.all())
 
 
 # Singleton instance
@@ -0,0 +1,68 @@
+"""
+ElevenLabs Conversational AI API client
+"""
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.core.config import get_settings
+from app.core.http_client import create_async_client, request_with_retry
+
+settings = get_settings()
+
+ELEVENLABS_API_BASE = "https://api.elevenlabs.io/v1"
+
+
+class ElevenLabsAPIError(Exception):
+    """Non-success response from the ElevenLabs API"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(f"ElevenLabs API returned {status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+
+class ElevenLabsService:
+    """
+    Fetches conversation data from the ElevenLabs API.
+    Uses one pooled client for the application lifetime (see start/close).
+    """
+
+    def __init__(self):
+        self.api_key = settings.ELEVENLABS_API_KEY
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared client, created on first use if start() was not called"""
+        if self._client is None or self._client.is_closed:
+            self._client = create_async_client(
+                base_url=ELEVENLABS_API_BASE,
+                headers={"xi-api-key": self.api_key}
+            )
+        return self._client
+
+    async def start(self):
+        """Create the pooled client (called from the app lifespan)"""
+        _ = self.client
+
+    async def close(self):
+        """Close pooled connections (called from the app lifespan)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get_conversation(self, conversation_id: str) -> Dict[str, Any]:
+        """Fetch a conversation (including its transcript) by ID"""
+        response = await request_with_retry(
+            self.client, "GET", f"/convai/conversations/{conversation_id}"
+        )
+
+        if response.status_code != 200:
+            raise ElevenLabsAPIError(response.status_code, response.text)
+
+        return response.json()
+
+
+# Singleton instance
+elevenlabs_service = ElevenLabsService()
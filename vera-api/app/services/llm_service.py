@@ -1,22 +1,148 @@
 """
 LLM integration service - supports multiple providers
+
+Each model has an ordered list of routes (primary provider, then OpenRouter
+when OPENROUTER_API_KEY is set). A stream is opened on the first healthy
+route, with retry and jitter. Failing providers are skipped while their
+circuit breaker is open; a breaker is only consulted when its route is
+about to be tried. Optionally the request is hedged on the next route
+if the first token hasn't arrived within LLM_HEDGE_AFTER_SECONDS. Each
+provider has a limited number of concurrent streams (LLM_MAX_CONCURRENCY),
+queued fairly across research IDs; a 429 pauses that provider's queue.
+When no provider can complete a request, LLMProviderError is raised.
 """
-from typing import List, Dict, Any, AsyncGenerator
-from openai import OpenAI, AsyncOpenAI
-from groq import Groq
 import asyncio
+import time
+from dataclasses import dataclass
+from typing import List, Dict, Any, AsyncGenerator, AsyncIterator, Optional
+from openai import AsyncOpenAI
+from groq import AsyncGroq
 
 from app.core.config import get_settings
+from app.core.http_client import retry_delay
+from app.core.metrics import LLM_TIME_TO_FIRST_TOKEN_SECONDS, LLM_TOKENS_PER_SECOND, LLM_TOKENS
+from app.core.tracing import tracer, current_span, use_span
+from app.services.provider_health import ProviderHealth
+from app.services.provider_scheduler import FairScheduler, ProviderSlot, rate_limit_delay
+from app.prompts import MASTER_PROMPT_VERSION
 
 settings = get_settings()
 
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+
+# OpenRouter names for models served by other providers (OpenAI models are "openai/<model>")
+OPENROUTER_MODELS = {
+    "llama-3.3-70b-versatile": "meta-llama/llama-3.3-70b-instruct",
+    "gemma2-9b-it": "google/gemma-2-9b-it",
+}
+
+# Context window sizes (tokens) of supported models
+MODEL_CONTEXT_TOKENS = {
+    "gpt-4.1": 1047576,
+    "gpt-4.1-mini": 1047576,
+    "gpt-4.1-nano": 1047576,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+    "o3-mini": 200000,
+    "llama-3.3-70b-versatile": 128000,
+    "gemma2-9b-it": 8192,
+}
+DEFAULT_CONTEXT_TOKENS = 8192
+
+# History budget floor, so a small context window never leaves room for
+# only the newest message
+MIN_HISTORY_TOKENS = 1024
+
+
+class LLMProviderError(Exception):
+    """No provider could serve the request, or the stream failed part way"""
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for a message (~4 characters per token plus overhead)"""
+    return len(text) // 4 + 4
+
+
+def is_retryable(error: Exception) -> bool:
+    """Transient errors (timeouts, connection errors, 429, 5xx) are worth retrying"""
+    status_code = getattr(error, "status_code", None)
+    return status_code is None or status_code == 429 or status_code >= 500
+
+
+@dataclass(frozen=True)
+class LLMRoute:
+    """One way of serving a model: provider, client, provider-side model name, params"""
+    provider: str
+    client: Any
+    model: str
+    config: Dict[str, Any]
+
+
+@dataclass
+class OpenStream:
+    """A provider stream that has produced its first text chunk"""
+    route: LLMRoute
+    first_text: str
+    stream: Any
+    iterator: AsyncIterator
+    slot: Optional[ProviderSlot] = None
+
+    async def close(self):
+        """Close the stream and free its provider slot"""
+        try:
+            await self.stream.close()
+        finally:
+            if self.slot is not None:
+                self.slot.release()
+
+
+@dataclass
+class CompletionStats:
+    """Usage and latency of one completion, filled in by stream_chat_completion"""
+    provider: Optional[str] = None
+    model: Optional[str] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None
+    first_token_seconds: Optional[float] = None
+    duration_seconds: Optional[float] = None
+
 
 class LLMService:
     """Service for interacting with various LLM providers"""
 
     def __init__(self):
-        self.openai_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-        self.groq_client = Groq(api_key=settings.GROQ_API_KEY)
+        # Retries are handled per route below so failover isn't delayed by SDK retries
+        self.openai_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, max_retries=0)
+        self.groq_client = AsyncGroq(api_key=settings.GROQ_API_KEY, max_retries=0)
+        self.openrouter_client = None
+        if settings.OPENROUTER_API_KEY:
+            self.openrouter_client = AsyncOpenAI(
+                api_key=settings.OPENROUTER_API_KEY,
+                base_url=OPENROUTER_BASE_URL,
+                max_retries=0
+            )
+        self.prompt_cache: Dict[str, Dict[str, int]] = {}
+        self.health = ProviderHealth(
+            failure_threshold=settings.LLM_BREAKER_FAILURE_THRESHOLD,
+            reset_seconds=settings.LLM_BREAKER_RESET_SECONDS
+        )
+        self.schedulers: Dict[str, FairScheduler] = {}
+
+    def _scheduler(self, provider: str) -> FairScheduler:
+        """Concurrency limiter for a provider (created on first use)"""
+        if provider not in self.schedulers:
+            self.schedulers[provider] = FairScheduler(
+                provider,
+                max_concurrency=settings.LLM_MAX_CONCURRENCY,
+                queue_timeout_seconds=settings.PROVIDER_QUEUE_TIMEOUT_SECONDS,
+                max_backoff_seconds=settings.PROVIDER_MAX_BACKOFF_SECONDS
+            )
+        return self.schedulers[provider]
+
+    def scheduler_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Slot usage and queue depth per provider"""
+        return {provider: scheduler.stats() for provider, scheduler in self.schedulers.items()}
 
     def _get_client_and_config(self, model: str) -> tuple:
         """Get appropriate client and configuration for model"""
@@ -31,64 +157,347 @@ class LLMService:
             # Default to OpenAI (gpt-4o, gpt-4o-mini, etc.)
             return "openai", self.openai_client, {"temperature": 0.5}
 
+    def _get_routes(self, model: str) -> List[LLMRoute]:
+        """Ordered routes for a model: primary provider, then OpenRouter fallback"""
+        provider, client, config = self._get_client_and_config(model)
+        routes = [LLMRoute(provider, client, model, self._with_usage(provider, config))]
+
+        if self.openrouter_client is not None:
+            routes.append(LLMRoute(
+                "openrouter",
+                self.openrouter_client,
+                OPENROUTER_MODELS.get(model, f"openai/{model}"),
+                self._with_usage("openrouter", config)
+            ))
+
+        return routes
+
+    @staticmethod
+    def _with_usage(provider: str, config: Dict[str, Any]) -> Dict[str, Any]:
+        """Ask OpenAI-compatible providers for a final usage chunk on streams"""
+        if provider in ("openai", "openrouter"):
+            return {**config, "stream_options": {"include_usage": True}}
+        return config
+
+    def _record_usage(self, route: LLMRoute, usage: Any, stats: Optional[CompletionStats] = None):
+        """Log token usage, including prompt tokens served from the provider's cache"""
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = (getattr(details, "cached_tokens", None) or 0) if details else 0
+        prompt_tokens = usage.prompt_tokens or 0
+
+        if stats is not None:
+            stats.prompt_tokens = prompt_tokens
+            stats.completion_tokens = usage.completion_tokens
+            stats.cached_tokens = cached_tokens
+
+        totals = self.prompt_cache.setdefault(route.provider, {
+            "requests": 0,
+            "prompt_tokens": 0,
+            "cached_tokens": 0,
+        })
+        totals["requests"] += 1
+        totals["prompt_tokens"] += prompt_tokens
+        totals["cached_tokens"] += cached_tokens
+
+        LLM_TOKENS.labels(route.model, route.provider, "prompt").inc(prompt_tokens)
+        LLM_TOKENS.labels(route.model, route.provider, "completion").inc(usage.completion_tokens or 0)
+        LLM_TOKENS.labels(route.model, route.provider, "cached").inc(cached_tokens)
+
+        print(
+            f"LLM usage {route.provider}/{route.model} (prompt {MASTER_PROMPT_VERSION}): "
+            f"prompt_tokens={prompt_tokens} cached_tokens={cached_tokens} "
+            f"completion_tokens={usage.completion_tokens}"
+        )
+
+    def prompt_cache_stats(self) -> Dict[str, Any]:
+        """Prompt-cache hit ratio per provider"""
+        return {
+            "prompt_version": MASTER_PROMPT_VERSION,
+            "providers": {
+                provider: {
+                    **stats,
+                    "cached_ratio": round(stats["cached_tokens"] / stats["prompt_tokens"], 3)
+                    if stats["prompt_tokens"] else 0.0,
+                }
+                for provider, stats in self.prompt_cache.items()
+            },
+        }
+
+    def build_messages(
+        self,
+        model: str,
+        system_prompt: str,
+        history: List[Dict[str, Any]],
+        max_tokens: int = 5000,
+        history_budget: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Build the LLM message list from the system prompt and chronological
+        history, dropping the oldest turns that don't fit the token budget.
+        The budget is the model's context minus the system prompt and the
+        completion reserve (at least MIN_HISTORY_TOKENS), capped at
+        history_budget. The newest message is always kept.
+        """
+        if history_budget is None:
+            history_budget = settings.LLM_CONTEXT_MAX_TOKENS
+
+        budget = (
+            MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS)
+            - max_tokens
+            - estimate_tokens(system_prompt)
+        )
+        budget = min(max(budget, MIN_HISTORY_TOKENS), history_budget)
+
+        kept = []
+        used = 0
+        for message in reversed(history):
+            cost = estimate_tokens(message["content"])
+            if kept and used + cost > budget:
+                break
+            kept.append(message)
+            used += cost
+
+        return [{"role": "system", "content": system_prompt}] + kept[::-1]
+
+    async def _open_stream(
+        self,
+        route: LLMRoute,
+        messages: List[Dict[str, Any]],
+        max_tokens: int
+    ) -> OpenStream:
+        """
+        Open a stream on one route and wait for its first text chunk.
+        The returned iterator is positioned after that chunk.
+        """
+        started = time.monotonic()
+        stream = await route.client.chat.completions.create(
+            model=route.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            stream=True,
+            **route.config
+        )
+        iterator = stream.__aiter__()
+        try:
+            first_text = ""
+            async for chunk in iterator:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    first_text = chunk.choices[0].delta.content
+                    break
+        except BaseException:
+            await stream.close()
+            raise
+
+        self.health.record_success(route.provider, time.monotonic() - started)
+        return OpenStream(route, first_text, stream, iterator)
+
+    async def _open_with_retry(
+        self,
+        route: LLMRoute,
+        messages: List[Dict[str, Any]],
+        max_tokens: int
+    ) -> OpenStream:
+        """
+        Open a stream on a route, retrying transient failures with jittered
+        backoff. The stream holds one of the provider's slots until closed;
+        waiting for the slot doesn't count towards the first-token timeout.
+        """
+        scheduler = self._scheduler(route.provider)
+        attempt = 0
+        while True:
+            slot = await scheduler.acquire()
+            try:
+                opened = await asyncio.wait_for(
+                    self._open_stream(route, messages, max_tokens),
+                    settings.LLM_FIRST_TOKEN_TIMEOUT_SECONDS
+                )
+                opened.slot = slot
+                return opened
+            except asyncio.CancelledError:
+                slot.release()
+                raise
+            except Exception as e:
+                slot.release()
+                response = getattr(e, "response", None)
+                if getattr(e, "status_code", None) == 429:
+                    # Hold back everyone's requests to this provider, not just this one
+                    scheduler.backoff(rate_limit_delay(response.headers) if response is not None else None)
+                if is_retryable(e):
+                    self.health.record_failure(route.provider, e)
+                print(f"LLM request to {route.provider} failed: {e}")
+                current_span().add_event("llm.attempt_failed", {
+                    "llm.provider": route.provider,
+                    "error": str(e),
+                })
+                if attempt >= settings.LLM_MAX_RETRIES or not is_retryable(e):
+                    raise
+                await asyncio.sleep(retry_delay(attempt, response))
+                attempt += 1
+
+    async def _start_stream(
+        self,
+        routes: List[LLMRoute],
+        messages: List[Dict[str, Any]],
+        max_tokens: int
+    ) -> OpenStream:
+        """
+        Open a stream on the first route that answers, failing over in order.
+        With hedging enabled, the next route is started as well if the
+        current one hasn't produced a first token in time; the first to
+        answer wins and the other is cancelled.
+        """
+        pending = list(routes)
+
+        def next_route() -> Optional[LLMRoute]:
+            # Breakers are checked only right before a route is tried:
+            # allow() spends a half-open breaker's single trial request
+            while pending:
+                route = pending.pop(0)
+                if self.health.available(route.provider):
+                    return route
+            return None
+
+        last_error: Optional[Exception] = None
+        tasks = set()
+        started = False
+        try:
+            while True:
+                if not tasks:
+                    route = next_route()
+                    if route is None:
+                        if started:
+                            break
+                        # Every breaker is open: try the primary anyway rather than fail outright
+                        route = routes[0]
+                    started = True
+                    tasks.add(asyncio.create_task(
+                        self._open_with_retry(route, messages, max_tokens)
+                    ))
+
+                hedge = settings.LLM_HEDGE_AFTER_SECONDS
+                timeout = hedge if hedge > 0 and pending and len(tasks) == 1 else None
+                done, tasks = await asyncio.wait(
+                    tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if not done:
+                    # First token is late: hedge on the next available route
+                    route = next_route()
+                    if route is None:
+                        continue
+                    print(f"Hedging LLM request on {route.provider}")
+                    current_span().add_event("llm.hedge", {"llm.provider": route.provider})
+                    tasks.add(asyncio.create_task(
+                        self._open_with_retry(route, messages, max_tokens)
+                    ))
+                    continue
+
+                winner = None
+                for task in done:
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                    elif winner is None:
+                        winner = task.result()
+                    else:
+                        await task.result().close()
+                if winner is not None:
+                    return winner
+        finally:
+            for task in tasks:
+                if task.done() and not task.cancelled() and task.exception() is None:
+                    # Opened after the winner was picked: free its slot
+                    await task.result().close()
+                else:
+                    task.cancel()
+
+        raise last_error or RuntimeError("No LLM provider available")
+
     async def stream_chat_completion(
         self,
         model: str,
         messages: List[Dict[str, Any]],
-        max_tokens: int = 5000
+        max_tokens: int = 5000,
+        stats: Optional[CompletionStats] = None
     ) -> AsyncGenerator[str, None]:
         """
         Stream chat completion from LLM
-        Yields text chunks as they arrive
+        Yields text chunks as they arrive. If `stats` is given it is filled
+        with the serving provider, token usage and latency. Raises
+        LLMProviderError if no provider answers or the stream breaks off.
         """
-        provider, client, config = self._get_client_and_config(model)
+        if stats is None:
+            stats = CompletionStats()
+        started = time.monotonic()
 
+        # Started explicitly (not as the current span) because a generator's
+        # context can't be held open across yields
+        span = tracer.start_span("llm.stream", attributes={
+            "llm.model": model,
+            "llm.messages": len(messages),
+        })
         try:
-            if provider == "openai":
-                stream = await client.chat.completions.create(
-                    model=model,
-                    messages=messages,
-                    max_tokens=max_tokens,
-                    stream=True,
-                    **config
+            # Current only while opening, so retry and hedge events land on it
+            with use_span(span, end_on_exit=False):
+                opened = await self._start_stream(
+                    self._get_routes(model), messages, max_tokens
                 )
+        except Exception as e:
+            # use_span has already recorded the exception on the span
+            span.end()
+            raise LLMProviderError(str(e)) from e
 
-                async for chunk in stream:
-                    if chunk.choices[0].delta.content:
-                        yield chunk.choices[0].delta.content
-
-            elif provider == "groq":
-                # Groq client is sync, run in executor
-                loop = asyncio.get_event_loop()
-                stream = await loop.run_in_executor(
-                    None,
-                    lambda: client.chat.completions.create(
-                        model=model,
-                        messages=messages,
-                        max_tokens=max_tokens,
-                        stream=True,
-                        **config
-                    )
-                )
+        route = opened.route
+        stats.provider = route.provider
+        stats.model = model
+        stats.first_token_seconds = time.monotonic() - started
+        LLM_TIME_TO_FIRST_TOKEN_SECONDS.labels(model, route.provider).observe(stats.first_token_seconds)
+
+        try:
+            if opened.first_text:
+                yield opened.first_text
 
-                for chunk in stream:
-                    if chunk.choices[0].delta.content:
-                        yield chunk.choices[0].delta.content
+            # Once text has been sent the response can't move to another provider
+            async for chunk in opened.iterator:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+                # OpenAI-compatible final usage chunk, or Groq's x_groq.usage
+                usage = getattr(chunk, "usage", None) or getattr(getattr(chunk, "x_groq", None), "usage", None)
+                if usage:
+                    self._record_usage(route, usage, stats)
 
         except Exception as e:
-            yield f"Error: {str(e)}"
+            self.health.record_failure(route.provider, e)
+            span.record_exception(e)
+            raise LLMProviderError(str(e)) from e
+        finally:
+            await opened.close()
+            stats.duration_seconds = time.monotonic() - started
+            span.set_attributes({
+                "llm.provider": route.provider,
+                "llm.first_token_ms": round(stats.first_token_seconds * 1000),
+                "llm.prompt_tokens": stats.prompt_tokens or 0,
+                "llm.completion_tokens": stats.completion_tokens or 0,
+                "llm.cached_tokens": stats.cached_tokens or 0,
+            })
+            span.end()
+            generation_seconds = stats.duration_seconds - stats.first_token_seconds
+            if stats.completion_tokens and generation_seconds > 0:
+                LLM_TOKENS_PER_SECOND.labels(model, route.provider).observe(
+                    stats.completion_tokens / generation_seconds
+                )
 
     async def get_chat_completion(
         self,
         model: str,
         messages: List[Dict[str, Any]],
-        max_tokens: int = 5000
+        max_tokens: int = 5000,
+        stats: Optional[CompletionStats] = None
     ) -> str:
         """
         Get complete chat response (non-streaming)
         """
         full_response = ""
-        async for chunk in self.stream_chat_completion(model, messages, max_tokens):
+        async for chunk in self.stream_chat_completion(model, messages, max_tokens, stats):
             full_response += chunk
         return full_response
 
@@ -0,0 +1,324 @@
+"""
+Write-behind persistence for chat messages and LLM usage
+
+The chat endpoints enqueue rows instead of saving them inline. A
+background task batches queued rows (every flush interval or batch_size
+rows) into one multi-row INSERT per table. Failed batches are retried
+with backoff, then written row by row; integrity and data errors are not
+retried, since the same rows would fail again. Rows that still cannot be
+stored are appended to a JSONL dead-letter file, which is replayed when
+the writer next starts. Shutdown drains the queue.
+
+Queued rows live in memory only. For dead-lettered rows to survive a
+redeploy, MESSAGE_WRITER_DEADLETTER_PATH must be on a persistent volume.
+"""
+import asyncio
+import json
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import DateTime, insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app.core.config import get_settings
+from app.core.http_client import retry_delay
+from app.core.metrics import MESSAGE_QUEUE_DEPTH
+from app.core.tracing import traced, current_span
+from app.db.base import AsyncSessionLocal
+from app.models.database import Conversation, LLMUsage
+from app.services.llm_service import CompletionStats
+
+settings = get_settings()
+
+# Tables the writer can insert into, by table name
+TABLES = {model.__tablename__: model for model in (Conversation, LLMUsage)}
+
+QueuedRow = Tuple[str, Dict[str, Any]]
+
+# Failures caused by the rows themselves (constraint violations, values the
+# column can't hold); retrying the same rows can't succeed
+NON_RETRYABLE_ERRORS = (IntegrityError, DataError)
+
+
+class MessageWriter:
+    """Batched, retrying background writer for Conversation and LLMUsage rows"""
+
+    def __init__(
+        self,
+        session_factory,
+        batch_size: int = 100,
+        flush_interval_seconds: float = 0.2,
+        max_retries: int = 5,
+        dead_letter_path: str = "failed_messages.jsonl",
+        drain_timeout_seconds: float = 30.0
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_retries = max_retries
+        self.dead_letter_path = dead_letter_path
+        self.drain_timeout_seconds = drain_timeout_seconds
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: List[QueuedRow] = []
+
+        # Counters
+        self.enqueued = 0
+        self.written = 0
+        self.retries = 0
+        self.failed_batches = 0
+        self.dead_lettered = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        return self._queue
+
+    def enqueue(
+        self,
+        research_id_fk: int,
+        conversation_id: str,
+        role: str,
+        content: str,
+        model_used: Optional[str] = None,
+        audio_url: Optional[str] = None
+    ):
+        """
+        Queue a message for insertion. The timestamp is taken now, so message
+        order is preserved regardless of when the batch is written.
+        """
+        self.queue.put_nowait((Conversation.__tablename__, {
+            "research_id_fk": research_id_fk,
+            "conversation_id": conversation_id,
+            "role": role,
+            "content": content,
+            "model_used": model_used,
+            "audio_url": audio_url,
+            "timestamp": datetime.now(timezone.utc),
+        }))
+        self.enqueued += 1
+
+    def enqueue_usage(
+        self,
+        research_id_fk: int,
+        conversation_id: Optional[str],
+        stats: CompletionStats
+    ):
+        """Queue the token usage and latency of a completion"""
+        def to_ms(seconds: Optional[float]) -> Optional[int]:
+            return round(seconds * 1000) if seconds is not None else None
+
+        self.queue.put_nowait((LLMUsage.__tablename__, {
+            "research_id_fk": research_id_fk,
+            "conversation_id": conversation_id,
+            "model": stats.model,
+            "provider": stats.provider,
+            "prompt_tokens": stats.prompt_tokens,
+            "completion_tokens": stats.completion_tokens,
+            "cached_tokens": stats.cached_tokens,
+            "first_token_ms": to_ms(stats.first_token_seconds),
+            "duration_ms": to_ms(stats.duration_seconds),
+            "created_at": datetime.now(timezone.utc),
+        }))
+        self.enqueued += 1
+
+    async def _insert(self, rows: List[QueuedRow]):
+        """
+        Insert rows in one transaction, one multi-row INSERT per table.
+        Committed rows are settled right away, so stop() never dead-letters
+        rows that were stored.
+        """
+        by_table: Dict[str, List[Dict[str, Any]]] = {}
+        for table, row in rows:
+            by_table.setdefault(table, []).append(row)
+
+        async with self.session_factory() as db:
+            for table, table_rows in by_table.items():
+                await db.execute(insert(TABLES[table]), table_rows)
+            await db.commit()
+            self._settle(rows)
+
+    def _settle(self, rows: List[QueuedRow]):
+        """Drop rows that were stored or dead-lettered from the in-flight batch"""
+        settled = {id(row) for row in rows}
+        self._inflight = [row for row in self._inflight if id(row) not in settled]
+
+    @traced("db.write_batch")
+    async def _write(self, rows: List[QueuedRow]):
+        """
+        Insert a batch, retrying with backoff, then falling back to single
+        rows. Integrity and data errors go straight to the fallback.
+        """
+        current_span().set_attribute("batch.rows", len(rows))
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self._insert(rows)
+                self.written += len(rows)
+                return
+            except NON_RETRYABLE_ERRORS as e:
+                self.last_error = str(e)
+                break
+            except Exception as e:
+                self.last_error = str(e)
+                if attempt >= self.max_retries:
+                    break
+                self.retries += 1
+                await asyncio.sleep(retry_delay(attempt))
+
+        self.failed_batches += 1
+        print(f"Message batch failed after {attempt} retries: {self.last_error}")
+
+        # Isolate bad rows so one of them can't take the whole batch down
+        for row in rows:
+            try:
+                await self._insert([row])
+                self.written += 1
+            except Exception as e:
+                self.last_error = str(e)
+                self._dead_letter([row])
+                self._settle([row])
+
+    def _dead_letter(self, rows: List[QueuedRow]):
+        """Append rows that could not be stored to the dead-letter file"""
+        try:
+            directory = os.path.dirname(self.dead_letter_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.dead_letter_path, "a") as f:
+                for table, row in rows:
+                    f.write(json.dumps({"table": table, **row}, default=str) + "\n")
+            self.dead_lettered += len(rows)
+        except Exception as e:
+            print(f"Failed to write {len(rows)} messages to dead-letter file: {e}")
+
+    @staticmethod
+    def _decode(line: str) -> QueuedRow:
+        """Parse a dead-letter line back into a queued row"""
+        row = json.loads(line)
+        table = row.pop("table")
+        columns = TABLES[table].__table__.columns
+        for key, value in row.items():
+            if isinstance(value, str) and isinstance(columns[key].type, DateTime):
+                row[key] = datetime.fromisoformat(value)
+        return table, row
+
+    async def replay_dead_letters(self) -> int:
+        """
+        Write rows from the dead-letter file, returns how many were stored.
+        The file is moved aside first, so rows that fail again are
+        dead-lettered to a fresh file. The moved file is rewritten after
+        each batch, so an interrupted replay resumes from the batch it
+        stopped in.
+        """
+        replay_path = f"{self.dead_letter_path}.replay"
+        if os.path.exists(self.dead_letter_path) and not os.path.exists(replay_path):
+            os.replace(self.dead_letter_path, replay_path)
+        if not os.path.exists(replay_path):
+            return 0
+
+        with open(replay_path) as f:
+            lines = [line for line in f if line.strip()]
+        print(f"Replaying {len(lines)} dead-lettered messages")
+
+        written = self.written
+        while lines:
+            batch, lines = lines[:self.batch_size], lines[self.batch_size:]
+            await self._write([self._decode(line) for line in batch])
+            with open(f"{replay_path}.tmp", "w") as f:
+                f.writelines(lines)
+            os.replace(f"{replay_path}.tmp", replay_path)
+
+        os.remove(replay_path)
+        return self.written - written
+
+    async def _next_batch(self) -> List[QueuedRow]:
+        """
+        Wait for one row, then collect more until the interval or batch size
+        is reached. Each row is added to _inflight as it is dequeued, so
+        stop() can dead-letter it even if the writer is cancelled mid-batch.
+        """
+        loop = asyncio.get_running_loop()
+        batch = self._inflight
+        batch.append(await self.queue.get())
+        deadline = loop.time() + self.flush_interval_seconds
+        while len(batch) < self.batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        try:
+            await self.replay_dead_letters()
+        except Exception as e:
+            print(f"Failed to replay dead-lettered messages: {e}")
+
+        while True:
+            batch = await self._next_batch()
+            await self._write(batch)
+            for _ in batch:
+                self.queue.task_done()
+            self._inflight = []
+
+    def start(self):
+        """Start the background writer on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Drain queued messages, then stop the writer. Rows still pending after
+        drain_timeout_seconds (e.g. database unavailable) are dead-lettered.
+        """
+        if self._task is None:
+            return
+
+        try:
+            await asyncio.wait_for(self.queue.join(), self.drain_timeout_seconds)
+        except asyncio.TimeoutError:
+            print("Timed out draining message queue")
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        remaining = self._inflight
+        self._inflight = []
+        while not self.queue.empty():
+            remaining.append(self.queue.get_nowait())
+            self.queue.task_done()
+        if remaining:
+            self._dead_letter(remaining)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and write/failure counters"""
+        return {
+            "queued": self.queue.qsize(),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "retries": self.retries,
+            "failed_batches": self.failed_batches,
+            "dead_lettered": self.dead_lettered,
+            "last_error": self.last_error,
+        }
+
+
+# Singleton instance
+message_writer = MessageWriter(
+    AsyncSessionLocal,
+    batch_size=settings.MESSAGE_WRITER_BATCH_SIZE,
+    flush_interval_seconds=settings.MESSAGE_WRITER_FLUSH_MS / 1000,
+    max_retries=settings.MESSAGE_WRITER_MAX_RETRIES,
+    dead_letter_path=settings.MESSAGE_WRITER_DEADLETTER_PATH
+)
+MESSAGE_QUEUE_DEPTH.set_function(lambda: message_writer.queue.qsize())
@@ -0,0 +1,104 @@
+"""
+Per-provider health tracking for LLM routing
+
+Each provider has a circuit breaker: after `failure_threshold` consecutive
+failures it opens and the provider is skipped for `reset_seconds`. Then a
+single trial request is let through (half-open); success closes the
+breaker, failure re-opens it.
+"""
+import time
+from typing import Any, Dict, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one provider"""
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now"""
+        if self.state == CLOSED:
+            return True
+        # While open, or while a trial is in flight, wait out the cool-down
+        if time.monotonic() - self.opened_at < self.reset_seconds:
+            return False
+        # Let one trial request through (another one if the last trial never reported back)
+        self.state = HALF_OPEN
+        self.opened_at = time.monotonic()
+        return True
+
+    def record_success(self):
+        self.state = CLOSED
+        self.consecutive_failures = 0
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+
+class ProviderHealth:
+    """Circuit breakers and latency/error counters for all LLM providers"""
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def _breaker(self, provider: str) -> CircuitBreaker:
+        if provider not in self._breakers:
+            self._breakers[provider] = CircuitBreaker(self.failure_threshold, self.reset_seconds)
+            self._stats[provider] = {
+                "successes": 0,
+                "failures": 0,
+                "first_token_seconds": None,
+                "last_error": None,
+            }
+        return self._breakers[provider]
+
+    def available(self, provider: str) -> bool:
+        """Whether the provider's breaker allows a request"""
+        return self._breaker(provider).allow()
+
+    def record_success(self, provider: str, first_token_seconds: Optional[float] = None):
+        """Record a request that produced its first token"""
+        self._breaker(provider).record_success()
+        stats = self._stats[provider]
+        stats["successes"] += 1
+        if first_token_seconds is not None:
+            # Exponentially weighted average time to first token
+            previous = stats["first_token_seconds"]
+            stats["first_token_seconds"] = (
+                first_token_seconds if previous is None
+                else 0.8 * previous + 0.2 * first_token_seconds
+            )
+
+    def record_failure(self, provider: str, error: Optional[Exception] = None):
+        """Record a failed request"""
+        self._breaker(provider).record_failure()
+        stats = self._stats[provider]
+        stats["failures"] += 1
+        if error is not None:
+            stats["last_error"] = str(error)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Breaker state and counters per provider"""
+        return {
+            provider: {
+                "state": breaker.state,
+                "consecutive_failures": breaker.consecutive_failures,
+                **self._stats[provider],
+            }
+            for provider, breaker in self._breakers.items()
+        }
@@ -0,0 +1,232 @@
+"""
+Concurrency limits and fair queuing for outbound provider calls
+
+Each provider (OpenAI, Groq, OpenRouter, ElevenLabs) gets a scheduler with
+a fixed number of in-flight slots. When all slots are busy, callers queue
+per research ID and slots are handed out round-robin across research IDs,
+so one participant's burst (e.g. several sentence clips at once) can't
+starve everyone else. A 429 pauses dispatch for that provider until the
+time given by its rate-limit headers, so a burst queues up instead of
+every session failing at once.
+"""
+import asyncio
+import email.utils
+import re
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Mapping, Optional
+
+from app.core.metrics import (
+    PROVIDER_QUEUE_SECONDS,
+    PROVIDER_IN_FLIGHT,
+    PROVIDER_QUEUED,
+    PROVIDER_RATE_LIMITED
+)
+
+# Research ID the current request is made for (set by the chat endpoints)
+fairness_key: ContextVar[Optional[str]] = ContextVar("fairness_key", default=None)
+
+# Pause used when a 429 carries no usable rate-limit headers
+DEFAULT_RATE_LIMIT_SECONDS = 1.0
+
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+class ProviderBusyError(Exception):
+    """No slot became free within the queue timeout"""
+
+
+def parse_duration(value: str) -> Optional[float]:
+    """Parse rate-limit reset durations such as "1s", "250ms", "6m0s" or "2.5" (seconds)"""
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def rate_limit_delay(headers: Mapping[str, str]) -> Optional[float]:
+    """
+    Seconds until a provider accepts requests again, from response headers:
+    retry-after-ms, retry-after (seconds or HTTP date), or the reset time of
+    an exhausted x-ratelimit-* budget (OpenAI, Groq, OpenRouter).
+    """
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        seconds = parse_duration(retry_after)
+        if seconds is not None:
+            return seconds
+        try:
+            return email.utils.parsedate_to_datetime(retry_after).timestamp() - time.time()
+        except (TypeError, ValueError):
+            pass
+
+    delays = []
+    for budget in ("requests", "tokens"):
+        if headers.get(f"x-ratelimit-remaining-{budget}") == "0":
+            reset = parse_duration(headers.get(f"x-ratelimit-reset-{budget}", ""))
+            if reset is not None:
+                delays.append(reset)
+    return max(delays) if delays else None
+
+
+class ProviderSlot:
+    """One in-flight request on a provider; release() is idempotent"""
+
+    def __init__(self, scheduler: "FairScheduler"):
+        self._scheduler = scheduler
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._scheduler._release()
+
+
+class FairScheduler:
+    """Concurrency limiter for one provider with round-robin queuing per research ID"""
+
+    def __init__(
+        self,
+        provider: str,
+        max_concurrency: int,
+        queue_timeout_seconds: Optional[float] = None,
+        max_backoff_seconds: float = 60.0
+    ):
+        self.provider = provider
+        self.max_concurrency = max_concurrency
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self._active = 0
+        self._queues: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self._paused_until = 0.0
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+
+        # Counters
+        self.granted = 0
+        self.timeouts = 0
+        self.rate_limited = 0
+
+        PROVIDER_IN_FLIGHT.labels(provider).set_function(lambda: self._active)
+        PROVIDER_QUEUED.labels(provider).set_function(self.queued)
+
+    def queued(self) -> int:
+        return sum(len(waiters) for waiters in self._queues.values())
+
+    def _dispatch(self):
+        """Hand free slots to queued callers, one research ID at a time"""
+        while self._active < self.max_concurrency and self._queues:
+            delay = self._paused_until - time.monotonic()
+            if delay > 0:
+                if self._wakeup is None:
+                    self._wakeup = asyncio.get_running_loop().call_later(delay, self._resume)
+                return
+
+            key, waiters = next(iter(self._queues.items()))
+            waiter = waiters.popleft()
+            if waiters:
+                self._queues.move_to_end(key)
+            else:
+                del self._queues[key]
+
+            if not waiter.done():
+                self._active += 1
+                waiter.set_result(None)
+
+    def _resume(self):
+        self._wakeup = None
+        self._dispatch()
+
+    def _release(self):
+        self._active -= 1
+        self._dispatch()
+
+    def _discard(self, key: str, waiter: asyncio.Future):
+        waiters = self._queues.get(key)
+        if waiters is not None and waiter in waiters:
+            waiters.remove(waiter)
+            if not waiters:
+                del self._queues[key]
+
+    async def acquire(self, key: Optional[str] = None) -> ProviderSlot:
+        """
+        Wait for a slot. `key` (default: the current research ID) is the
+        fairness group. Raises ProviderBusyError after queue_timeout_seconds.
+        """
+        key = key or fairness_key.get() or ""
+        started = time.monotonic()
+
+        if self._active < self.max_concurrency and not self._queues and self._paused_until <= started:
+            self._active += 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._queues.setdefault(key, deque()).append(waiter)
+            self._dispatch()
+            try:
+                await asyncio.wait_for(waiter, self.queue_timeout_seconds)
+            except BaseException as e:
+                if waiter.done() and not waiter.cancelled():
+                    # The slot was granted just as we gave up: hand it back
+                    self._release()
+                else:
+                    self._discard(key, waiter)
+                if isinstance(e, asyncio.TimeoutError):
+                    self.timeouts += 1
+                    raise ProviderBusyError(
+                        f"{self.provider} is busy (waited {self.queue_timeout_seconds:g}s for a slot)"
+                    )
+                raise
+
+        self.granted += 1
+        PROVIDER_QUEUE_SECONDS.labels(self.provider).observe(time.monotonic() - started)
+        return ProviderSlot(self)
+
+    @asynccontextmanager
+    async def slot(self, key: Optional[str] = None):
+        """Hold a slot for the duration of the block"""
+        slot = await self.acquire(key)
+        try:
+            yield slot
+        finally:
+            slot.release()
+
+    def backoff(self, seconds: Optional[float] = None):
+        """
+        Pause dispatch after a rate-limit response. Safe to call from worker
+        threads: it only moves the pause deadline; queued callers are woken
+        by the event loop.
+        """
+        if seconds is None or seconds <= 0:
+            seconds = DEFAULT_RATE_LIMIT_SECONDS
+        seconds = min(seconds, self.max_backoff_seconds)
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self.rate_limited += 1
+        PROVIDER_RATE_LIMITED.labels(self.provider).inc()
+        print(f"{self.provider} rate limited, pausing new requests for {seconds:.1f}s")
+
+    def stats(self) -> Dict[str, Any]:
+        """Slot usage, queue depth and rate-limit counters"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self._active,
+            "queued": self.queued(),
+            "queued_research_ids": len(self._queues),
+            "paused_seconds": round(max(self._paused_until - time.monotonic(), 0.0), 1),
+            "granted": self.granted,
+            "timeouts": self.timeouts,
+            "rate_limited": self.rate_limited,
+        }
@@ -0,0 +1,259 @@
+"""
+Response cache for first-turn questions
+
+Participants often open with the same questions ("what is PAD", "what are
+the symptoms"). When a conversation has no history yet, the answer only
+depends on the model, the system prompt and the question, so it can be
+reused. Entries are keyed on the normalized question + model + the
+MASTER_PROMPT_VERSION (a prompt change invalidates them), and expire after
+a TTL with LRU eviction. An optional semantic tier also matches paraphrases
+by embedding similarity, over a bounded per-scope index of unit vectors
+that is scanned in a worker thread. Cached answers are streamed in
+word-sized chunks, so callers see the same chunk protocol as a live
+completion.
+"""
+import asyncio
+import hashlib
+import math
+import operator
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+
+from app.core.config import get_settings
+from app.prompts import master_prompt, MASTER_PROMPT_VERSION
+from app.services.llm_service import llm_service, CompletionStats
+
+settings = get_settings()
+
+WORD_CHUNK = re.compile(r"\S+\s*|\s+")
+
+
+def normalize_question(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace ("What is P.A.D.?" -> "what is pad")"""
+    text = re.sub(r"[^\w\s]", "", text.lower())
+    return " ".join(text.split())
+
+
+def unit_vector(vector: List[float]) -> Optional[List[float]]:
+    """Normalize an embedding so cosine similarity is a plain dot product"""
+    norm = math.sqrt(sum(map(operator.mul, vector, vector)))
+    return [x / norm for x in vector] if norm else None
+
+
+def best_match(
+    query: List[float],
+    candidates: List[Tuple[str, List[float]]],
+    threshold: float
+) -> Optional[str]:
+    """Key of the most similar unit vector scoring at least threshold, or None"""
+    best, best_score = None, threshold
+    for key, vector in candidates:
+        score = sum(map(operator.mul, query, vector))
+        if score >= best_score:
+            best, best_score = key, score
+    return best
+
+
+@dataclass
+class CachedResponse:
+    scope: str
+    question: str
+    response: str
+    expires_at: float
+
+
+class ResponseCache:
+    """TTL + LRU cache of first-turn answers, with optional embedding lookup"""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        ttl_seconds: int = 86400,
+        max_entries: int = 500,
+        semantic: bool = False,
+        similarity_threshold: float = 0.92,
+        embedding_model: str = "text-embedding-3-small",
+        semantic_max_entries: int = 200
+    ):
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.semantic = semantic
+        self.similarity_threshold = similarity_threshold
+        self.embedding_model = embedding_model
+        self.semantic_max_entries = semantic_max_entries
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        # Unit embeddings per scope, most recently stored last
+        self._index: Dict[str, "OrderedDict[str, List[float]]"] = {}
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def cacheable(messages: List[Dict[str, Any]]) -> bool:
+        """Only first turns (Vera's system prompt + one user message) are cached"""
+        return (
+            len(messages) == 2
+            and messages[0]["role"] == "system"
+            and messages[0]["content"] == master_prompt
+            and messages[1]["role"] == "user"
+        )
+
+    @staticmethod
+    def scope(model: str) -> str:
+        """Model + prompt version that an answer is valid for"""
+        return f"{model}:{MASTER_PROMPT_VERSION}"
+
+    @staticmethod
+    def make_key(scope: str, question: str) -> str:
+        return hashlib.sha256(f"{scope}|{question}".encode()).hexdigest()
+
+    async def _embed(self, text: str) -> Optional[List[float]]:
+        try:
+            result = await llm_service.openai_client.embeddings.create(
+                model=self.embedding_model,
+                input=text
+            )
+            return result.data[0].embedding
+        except Exception as e:
+            print(f"Response cache embedding failed: {e}")
+            return None
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        index = self._index.get(entry.scope)
+        if index is not None:
+            index.pop(key, None)
+
+    def _evict(self):
+        now = time.monotonic()
+        for key in [k for k, entry in self._entries.items() if entry.expires_at < now]:
+            self._remove(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _get_exact(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    async def _get_similar(self, scope: str, embedding: List[float]) -> Optional[CachedResponse]:
+        """Closest cached paraphrase; the scan runs off the event loop"""
+        candidates = list(self._index.get(scope, {}).items())
+        if not candidates:
+            return None
+        key = await asyncio.to_thread(best_match, embedding, candidates, self.similarity_threshold)
+        return self._get_exact(key) if key is not None else None
+
+    def _index_embedding(self, scope: str, key: str, embedding: List[float]):
+        """Add a unit embedding to the scope's index, dropping the oldest beyond semantic_max_entries"""
+        index = self._index.setdefault(scope, OrderedDict())
+        index[key] = embedding
+        index.move_to_end(key)
+        while len(index) > self.semantic_max_entries:
+            index.popitem(last=False)
+
+    def put(self, scope: str, question: str, response: str, embedding: Optional[List[float]] = None):
+        """Store an answer for a normalized question (embedding: unit vector for the semantic tier)"""
+        key = self.make_key(scope, question)
+        self._entries[key] = CachedResponse(
+            scope=scope,
+            question=question,
+            response=response,
+            expires_at=time.monotonic() + self.ttl_seconds
+        )
+        self._entries.move_to_end(key)
+        if embedding is not None:
+            self._index_embedding(scope, key, embedding)
+        self._evict()
+
+    async def stream(
+        self,
+        model: str,
+        messages: List[Dict[str, Any]],
+        max_tokens: int = 5000,
+        stats: Optional[CompletionStats] = None
+    ) -> AsyncGenerator[str, None]:
+        """
+        Drop-in for llm_service.stream_chat_completion that serves cached
+        first-turn answers and caches new ones once they complete.
+        `stats` is left empty on a cache hit (no provider was called).
+        """
+        if not self.enabled or not self.cacheable(messages):
+            async for chunk in llm_service.stream_chat_completion(model, messages, max_tokens, stats):
+                yield chunk
+            return
+
+        scope = self.scope(model)
+        question = normalize_question(messages[1]["content"])
+
+        entry = self._get_exact(self.make_key(scope, question))
+        embedding = None
+        if entry is None and self.semantic:
+            embedding = await self._embed(question)
+            if embedding is not None:
+                embedding = unit_vector(embedding)
+            if embedding is not None:
+                entry = await self._get_similar(scope, embedding)
+                if entry is not None:
+                    self.semantic_hits += 1
+
+        if entry is not None:
+            self.hits += 1
+            for chunk in WORD_CHUNK.findall(entry.response):
+                yield chunk
+            return
+
+        self.misses += 1
+        response = ""
+        # A failed stream raises LLMProviderError, so only complete answers are cached
+        async for chunk in llm_service.stream_chat_completion(model, messages, max_tokens, stats):
+            response += chunk
+            yield chunk
+
+        if response.strip():
+            self.put(scope, question, response, embedding)
+
+    async def complete(
+        self,
+        model: str,
+        messages: List[Dict[str, Any]],
+        max_tokens: int = 5000,
+        stats: Optional[CompletionStats] = None
+    ) -> str:
+        """Non-streaming variant of stream()"""
+        return "".join([chunk async for chunk in self.stream(model, messages, max_tokens, stats)])
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry count and hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "semantic_entries": sum(len(index) for index in self._index.values()),
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "enabled": self.enabled,
+            "semantic": self.semantic,
+        }
+
+
+# Singleton instance
+response_cache = ResponseCache(
+    enabled=settings.RESPONSE_CACHE_ENABLED,
+    ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    semantic=settings.RESPONSE_CACHE_SEMANTIC,
+    similarity_threshold=settings.RESPONSE_CACHE_SIMILARITY,
+    embedding_model=settings.RESPONSE_CACHE_EMBEDDING_MODEL,
+    semantic_max_entries=settings.RESPONSE_CACHE_SEMANTIC_MAX_ENTRIES
+)
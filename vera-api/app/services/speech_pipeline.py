@@ -0,0 +1,131 @@
+"""
+Sentence-level streaming TTS for the WebSocket chat loop
+
+LLM text is fed in as it streams. Each completed sentence is sent to
+ElevenLabs immediately (off the event loop), and the resulting audio is
+pushed to the client as ordered `audio_chunk` frames, so the first audio
+plays while the model is still generating the rest of the answer. How a
+frame is encoded (base64 JSON or binary) is up to the caller's sender.
+"""
+import asyncio
+import re
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from app.services.tts_service import TTSService
+
+# Sentence boundary: terminal punctuation (optionally followed by closing
+# quotes/brackets) and whitespace, or a blank line / list break.
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])["\')\]]*\s+|\n+')
+
+
+def split_sentences(buffer: str, min_chars: int) -> Tuple[List[str], str]:
+    """
+    Split complete sentences off the front of buffer.
+    Returns (sentences, remainder). Short fragments are merged with the
+    following sentence so we don't pay a TTS round-trip for "Yes."
+    """
+    sentences = []
+    start = 0
+    pending = ""
+
+    for match in SENTENCE_BOUNDARY.finditer(buffer):
+        pending += buffer[start:match.end()]
+        start = match.end()
+        if len(pending.strip()) >= min_chars:
+            sentences.append(pending.strip())
+            pending = ""
+
+    return sentences, pending + buffer[start:]
+
+
+class SpeechPipeline:
+    """Turns a stream of LLM text chunks into ordered audio chunk frames"""
+
+    def __init__(
+        self,
+        tts: TTSService,
+        min_chars: int = 40,
+        max_concurrency: int = 3,
+        output_format: Optional[str] = None
+    ):
+        self.tts = tts
+        self.output_format = output_format or tts.output_format
+        self.min_chars = min_chars
+        self._buffer = ""
+        self._index = 0
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.audio_parts: List[bytes] = []
+        self.failed_sentences = 0
+
+    async def _synthesize(self, text: str) -> Optional[bytes]:
+        """Synthesize one sentence, returns None on failure"""
+        async with self._semaphore:
+            try:
+                _, audio_bytes = await self.tts.generate_speech_async(
+                    text, output_format=self.output_format
+                )
+                return audio_bytes
+            except Exception as e:
+                print(f"TTS generation failed for sentence: {e}")
+                self.failed_sentences += 1
+                return None
+
+    def _schedule(self, text: str):
+        """Start synthesis for a sentence and queue it for in-order delivery"""
+        task = asyncio.create_task(self._synthesize(text))
+        self._queue.put_nowait((self._index, text, task))
+        self._index += 1
+
+    def feed(self, chunk: str):
+        """Add streamed LLM text; schedules TTS for any completed sentences"""
+        self._buffer += chunk
+        sentences, self._buffer = split_sentences(self._buffer, self.min_chars)
+        for sentence in sentences:
+            self._schedule(sentence)
+
+    def close(self):
+        """Flush the trailing partial sentence and mark the stream finished"""
+        if self._buffer.strip():
+            self._schedule(self._buffer.strip())
+        self._buffer = ""
+        self._queue.put_nowait(None)
+
+    async def send_to(self, send_audio: Callable[[dict, bytes], Awaitable[None]]) -> int:
+        """
+        Deliver audio frames in sentence order as synthesis completes.
+        send_audio(header, audio_bytes) writes one frame to the client.
+        Runs until close() has been called and all sentences are sent.
+        Returns the number of audio chunks delivered.
+        """
+        sent = 0
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return sent
+
+            index, text, task = item
+            audio_bytes = await task
+            if not audio_bytes:
+                continue
+
+            self.audio_parts.append(audio_bytes)
+            await send_audio({
+                "type": "audio_chunk",
+                "index": index,
+                "text": text,
+                "format": self.output_format
+            }, audio_bytes)
+            sent += 1
+
+    @property
+    def complete(self) -> bool:
+        """Whether every sentence was synthesized, i.e. audio_parts is the whole response"""
+        return self.failed_sentences == 0 and len(self.audio_parts) == self._index
+
+    def cancel(self):
+        """Cancel any outstanding synthesis (e.g. client disconnected)"""
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not None:
+                item[2].cancel()
@@ -0,0 +1,141 @@
+"""
+System statistics service
+
+Whole-table totals come from the `vera_research_stats` materialized view,
+which a background task refreshes periodically. The last refresh time is
+kept in `vera_stats_refresh`, so across replicas the view is refreshed
+once per interval and the other replicas only re-read it. Rolling 24h
+windows are index range scans over recent rows only. The admin endpoint is served
+from the last computed snapshot, so its cost no longer grows with the
+size of vera_conversations.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import func, select, text
+
+from app.core.config import get_settings
+from app.db.base import AsyncSessionLocal
+from app.models.database import ResearchID, UserSession, Conversation
+from app.schemas.admin import AdminStatsResponse
+
+settings = get_settings()
+
+# Advisory lock key so only one replica refreshes the view at a time
+STATS_REFRESH_LOCK_KEY = 7_001_006
+
+
+class StatsService:
+    """Maintains a periodically refreshed snapshot of system statistics"""
+
+    def __init__(self, session_factory, refresh_interval_seconds: int = 60):
+        self.session_factory = session_factory
+        self.refresh_interval_seconds = refresh_interval_seconds
+        self._snapshot: Optional[AdminStatsResponse] = None
+        self._refresh_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def refresh(self, force: bool = False) -> AdminStatsResponse:
+        """
+        Recompute the snapshot, refreshing the materialized view first if no
+        replica has done so within the refresh interval (or if force is set)
+        """
+        async with self._refresh_lock:
+            now = datetime.utcnow()
+            twenty_four_hours_ago = now - timedelta(hours=24)
+
+            async with self.session_factory() as db:
+                locked = await db.scalar(
+                    text("SELECT pg_try_advisory_xact_lock(:key)"),
+                    {"key": STATS_REFRESH_LOCK_KEY}
+                )
+                if locked:
+                    # Claim the refresh unless another replica did it recently
+                    claimed = await db.scalar(
+                        text("""
+                            UPDATE vera_stats_refresh
+                            SET refreshed_at = now()
+                            WHERE id = 1
+                              AND (refreshed_at IS NULL OR refreshed_at <= now() - make_interval(secs => :interval))
+                            RETURNING refreshed_at
+                        """),
+                        {"interval": 0.0 if force else float(self.refresh_interval_seconds)}
+                    )
+                    if claimed is not None:
+                        await db.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY vera_research_stats"))
+                await db.commit()
+
+                totals = (await db.execute(text("""
+                    SELECT
+                        COALESCE(SUM(total_sessions), 0) AS total_sessions,
+                        COALESCE(SUM(total_messages), 0) AS total_messages,
+                        COALESCE(SUM(total_conversations), 0) AS total_conversations
+                    FROM vera_research_stats
+                """))).one()
+
+                research_ids = (await db.execute(
+                    select(
+                        func.count(ResearchID.id),
+                        func.count(ResearchID.id).filter(ResearchID.is_active == True)
+                    )
+                )).one()
+
+                active_sessions_24h = await db.scalar(
+                    select(func.count(UserSession.id)).where(
+                        UserSession.last_active >= twenty_four_hours_ago
+                    )
+                )
+                messages_last_24h = await db.scalar(
+                    select(func.count(Conversation.id)).where(
+                        Conversation.timestamp >= twenty_four_hours_ago
+                    )
+                )
+
+            self._snapshot = AdminStatsResponse(
+                total_research_ids=research_ids[0],
+                active_research_ids=research_ids[1],
+                total_sessions=totals.total_sessions,
+                active_sessions_24h=active_sessions_24h,
+                total_conversations=totals.total_conversations,
+                total_messages=totals.total_messages,
+                messages_last_24h=messages_last_24h,
+                refreshed_at=now
+            )
+            return self._snapshot
+
+    async def get_stats(self) -> AdminStatsResponse:
+        """Return the current snapshot, computing it on first use"""
+        if self._snapshot is None:
+            return await self.refresh()
+        return self._snapshot
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Failed to refresh admin stats: {e}")
+            await asyncio.sleep(self.refresh_interval_seconds)
+
+    def start(self):
+        """Start periodic refresh on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop periodic refresh"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Singleton instance
+stats_service = StatsService(
+    AsyncSessionLocal,
+    refresh_interval_seconds=settings.ADMIN_STATS_REFRESH_SECONDS
+)
@@ -3,11 +3,19 @@ Text-to-Speech service using ElevenLabs
 """
 import os
 import base64
+import asyncio
+import time
 from pathlib import Path
+from typing import Optional
 from elevenlabs.client import ElevenLabs
 from elevenlabs import VoiceSettings
 
 from app.core.config import get_settings
+from app.core.http_client import create_sync_client
+from app.core.metrics import TTS_SYNTHESIS_SECONDS, TTS_AUDIO_BYTES
+from app.core.tracing import traced, current_span
+from app.services.audio_cache import AudioCache, AudioBytes
+from app.services.provider_scheduler import FairScheduler, rate_limit_delay
 
 settings = get_settings()
 
@@ -16,33 +24,105 @@ class TTSService:
     """Service for text-to-speech generation"""
 
     def __init__(self):
-        self.client = ElevenLabs(api_key=settings.ELEVENLABS_API_KEY)
+        # Bounded, fair concurrency for ElevenLabs calls (see generate_speech_async)
+        self.scheduler = FairScheduler(
+            "elevenlabs",
+            max_concurrency=settings.TTS_MAX_CONCURRENCY,
+            queue_timeout_seconds=settings.PROVIDER_QUEUE_TIMEOUT_SECONDS,
+            max_backoff_seconds=settings.PROVIDER_MAX_BACKOFF_SECONDS
+        )
+        # Pooled keep-alive client shared by all synthesis threads
+        self.http_client = create_sync_client(event_hooks={"response": [self._on_response]})
+        self.client = ElevenLabs(
+            api_key=settings.ELEVENLABS_API_KEY,
+            httpx_client=self.http_client
+        )
         self.voice_id = settings.ELEVENLABS_VOICE_ID
         self.model_id = settings.ELEVENLABS_MODEL_ID
+        self.output_format = settings.TTS_OUTPUT_FORMAT
+        self.output_formats = set(settings.TTS_OUTPUT_FORMATS) | {self.output_format}
         # Use /tmp directory for cloud deployments (Railway, etc.)
         if os.environ.get("RAILWAY_ENVIRONMENT"):
             self.audio_dir = Path("/tmp/audio_files")
         else:
             self.audio_dir = Path("audio_files")
         self.audio_dir.mkdir(exist_ok=True)
+        self.cache = AudioCache(
+            directory=self.audio_dir,
+            max_disk_bytes=settings.TTS_CACHE_MAX_MB * 1024 * 1024,
+            max_age_seconds=settings.TTS_CACHE_MAX_AGE_HOURS * 3600,
+            max_memory_items=settings.TTS_CACHE_MEMORY_ITEMS
+        )
+
+    def _on_response(self, response):
+        """
+        Pause queued synthesis when ElevenLabs rate limits us. The SDK
+        retries 429s itself, so this hook is where the headers are visible.
+        """
+        if response.status_code == 429:
+            self.scheduler.backoff(rate_limit_delay(response.headers))
+
+    def resolve_format(self, output_format: Optional[str] = None) -> str:
+        """
+        Validate a client-requested output format (e.g. opus_48000_32),
+        falling back to the default. Raises ValueError if it isn't allowed.
+        """
+        if not output_format:
+            return self.output_format
+        if output_format not in self.output_formats:
+            raise ValueError(
+                f"Unsupported audio format '{output_format}'. "
+                f"Supported: {', '.join(sorted(self.output_formats))}"
+            )
+        return output_format
 
+    def cache_key(
+        self,
+        text: str,
+        voice_id: str = None,
+        model_id: str = None,
+        output_format: str = None
+    ) -> str:
+        """Cache key for text rendered with the given (or default) voice, model and format"""
+        return AudioCache.make_key(
+            text,
+            voice_id or self.voice_id,
+            model_id or self.model_id,
+            output_format or self.output_format
+        )
+
+    @traced("tts.generate", {"tts.voice_id": "voice_id", "tts.format": "output_format"})
     def generate_speech(
         self,
         text: str,
         voice_id: str = None,
-        model_id: str = None
-    ) -> tuple[str, bytes]:
+        model_id: str = None,
+        output_format: str = None
+    ) -> tuple[str, AudioBytes]:
         """
         Generate speech from text using ElevenLabs
-        Returns (file_path, audio_bytes)
+        Returns (file_path, audio_bytes), served from cache when possible.
+        The audio is streamed to disk and into one buffer as it arrives.
         """
         voice = voice_id or self.voice_id
         model = model_id or self.model_id
+        output_format = self.resolve_format(output_format)
+        key = self.cache_key(text, voice, model, output_format)
+
+        span = current_span()
+        span.set_attribute("tts.text_length", len(text))
+
+        started = time.perf_counter()
+        cached = self.cache.get(key, output_format)
+        span.set_attribute("tts.cache_hit", cached is not None)
+        if cached is not None:
+            TTS_SYNTHESIS_SECONDS.labels("hit").observe(time.perf_counter() - started)
+            return cached
 
         try:
             response = self.client.text_to_speech.convert(
                 voice_id=voice,
-                output_format="mp3_22050_32",
+                output_format=output_format,
                 text=text,
                 model_id=model,
                 voice_settings=VoiceSettings(
@@ -51,42 +131,68 @@ class TTSService:
                     style=0.0,
                     use_speaker_boost=True,
                 ),
+                request_options={"max_retries": settings.HTTP_MAX_RETRIES},
             )
 
-            # Save to file
-            import hashlib
-            text_hash = hashlib.md5(text.encode()).hexdigest()[:10]
-            filename = f"tts_{text_hash}.mp3"
-            file_path = self.audio_dir / filename
-
-            audio_data = b""
-            with open(file_path, "wb") as f:
-                for chunk in response:
-                    if chunk:
-                        f.write(chunk)
-                        audio_data += chunk
+            file_path, audio_data = self.cache.put_stream(
+                key, output_format, (chunk for chunk in response if chunk)
+            )
+            TTS_SYNTHESIS_SECONDS.labels("miss").observe(time.perf_counter() - started)
+            TTS_AUDIO_BYTES.labels(output_format).inc(len(audio_data))
+            span.set_attribute("tts.audio_bytes", len(audio_data))
 
-            return str(file_path), audio_data
+            return file_path, audio_data
 
         except Exception as e:
             raise Exception(f"TTS generation failed: {str(e)}")
 
-    def get_audio_base64(self, file_path: str) -> str:
-        """Convert audio file to base64 for embedding"""
-        with open(file_path, "rb") as f:
-            audio_bytes = f.read()
+    async def generate_speech_async(
+        self,
+        text: str,
+        voice_id: str = None,
+        model_id: str = None,
+        output_format: str = None
+    ) -> tuple[str, AudioBytes]:
+        """
+        Generate speech without blocking the event loop.
+        The ElevenLabs SDK call runs in a worker thread once a slot is free;
+        cached clips skip the queue.
+        """
+        output_format = self.resolve_format(output_format)
+        key = self.cache_key(text, voice_id, model_id, output_format)
+        if self.cache.contains(key, output_format):
+            return await asyncio.to_thread(self.generate_speech, text, voice_id, model_id, output_format)
+
+        slot = await self.scheduler.acquire()
+        synthesis = asyncio.ensure_future(
+            asyncio.to_thread(self.generate_speech, text, voice_id, model_id, output_format)
+        )
+
+        def finished(future: asyncio.Future):
+            # The thread can't be interrupted, so the slot is held until it returns
+            slot.release()
+            if not future.cancelled():
+                future.exception()
+
+        synthesis.add_done_callback(finished)
+        return await asyncio.shield(synthesis)
+
+    def save_audio(self, text: str, audio_bytes: AudioBytes, output_format: str = None) -> str:
+        """Cache already-synthesized audio for text (default voice), returns file path"""
+        output_format = output_format or self.output_format
+        return self.cache.put(
+            self.cache_key(text, output_format=output_format), output_format, audio_bytes
+        )
+
+    def close(self):
+        """Close the pooled ElevenLabs connections"""
+        self.http_client.close()
+
+    @staticmethod
+    def encode_audio_base64(audio_bytes: AudioBytes) -> str:
+        """Base64-encode audio bytes already in memory"""
         return base64.b64encode(audio_bytes).decode()
 
-    def cleanup_old_files(self, max_age_hours: int = 24):
-        """Delete audio files older than specified hours"""
-        import time
-        current_time = time.time()
-        max_age_seconds = max_age_hours * 3600
-
-        for file_path in self.audio_dir.glob("*.mp3"):
-            if current_time - file_path.stat().st_mtime > max_age_seconds:
-                file_path.unlink()
-
 
 # Singleton instance
 tts_service = TTSService()
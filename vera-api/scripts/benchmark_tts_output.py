@@ -0,0 +1,120 @@
+"""
+Benchmark the TTS output path: memory and time to collect a synthesized
+clip from the ElevenLabs chunk stream and store it in the audio cache.
+
+Compares:
+- concat:      audio += chunk for every chunk (quadratic copying)
+- join:        collect chunks in a list, b"".join, then AudioCache.put
+- put_stream:  AudioCache.put_stream (chunks go straight to disk and into
+               one buffer, returned as a read-only memoryview)
+
+No API calls are made; the chunk stream is simulated at the configured
+output bitrate. Usage:
+    python scripts/benchmark_tts_output.py [--runs 5] [--chunk-size 4096]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.services.audio_cache import AudioCache
+
+OUTPUT_FORMAT = "mp3_22050_32"
+BYTES_PER_SECOND = 32_000 // 8   # mp3_22050_32
+CHARS_PER_SECOND = 15            # typical narration speed
+
+
+def clip_size(chars: int) -> int:
+    """Approximate encoded size of the speech for `chars` characters"""
+    return chars * BYTES_PER_SECOND // CHARS_PER_SECOND
+
+
+def chunk_stream(size: int, chunk_size: int, template: bytes):
+    """Yield fresh chunk objects, like the HTTP response iterator does"""
+    for offset in range(0, size, chunk_size):
+        yield template[offset:offset + min(chunk_size, size - offset)]
+
+
+def run_concat(cache, key, size, chunk_size, template):
+    audio_data = b""
+    for chunk in chunk_stream(size, chunk_size, template):
+        audio_data += chunk
+    cache.put(key, OUTPUT_FORMAT, audio_data)
+    return audio_data
+
+
+def run_join(cache, key, size, chunk_size, template):
+    audio_data = b"".join(chunk_stream(size, chunk_size, template))
+    cache.put(key, OUTPUT_FORMAT, audio_data)
+    return audio_data
+
+
+def run_put_stream(cache, key, size, chunk_size, template):
+    _, audio_data = cache.put_stream(key, OUTPUT_FORMAT, chunk_stream(size, chunk_size, template))
+    return audio_data
+
+
+STRATEGIES = {
+    "concat": run_concat,
+    "join": run_join,
+    "put_stream": run_put_stream,
+}
+
+
+def measure(strategy, cache, key, size, chunk_size, template, runs):
+    """Best-of-N wall time and tracemalloc peak (bytes) for one strategy"""
+    best_time = float("inf")
+    peak = 0
+    for _ in range(runs):
+        # Keep the memory tier from holding on to earlier runs
+        cache._memory.clear()
+        tracemalloc.start()
+        started = time.perf_counter()
+        audio_data = strategy(cache, key, size, chunk_size, template)
+        elapsed = time.perf_counter() - started
+        _, run_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert len(audio_data) == size
+        del audio_data
+        best_time = min(best_time, elapsed)
+        peak = max(peak, run_peak)
+    return best_time, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--chunk-size", type=int, default=4096)
+    parser.add_argument("--chars", type=int, nargs="+", default=[1000, 2000, 3000, 4000, 5000])
+    args = parser.parse_args()
+
+    template = os.urandom(clip_size(max(args.chars)))
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = AudioCache(
+            directory=directory,
+            max_disk_bytes=1024 * 1024 * 1024,
+            max_age_seconds=3600,
+            max_memory_items=1
+        )
+
+        print(f"{'chars':>6} {'clip KB':>8} {'strategy':>11} {'time ms':>9} {'peak KB':>9} {'peak/clip':>10}")
+        for chars in args.chars:
+            size = clip_size(chars)
+            for name, strategy in STRATEGIES.items():
+                elapsed, peak = measure(
+                    strategy, cache, f"{chars:032x}", size, args.chunk_size, template, args.runs
+                )
+                print(
+                    f"{chars:>6} {size / 1024:>8.0f} {name:>11} {elapsed * 1000:>9.2f} "
+                    f"{peak / 1024:>9.0f} {peak / size:>10.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Admin research-ID listing: aggregated statistics, sorting, paging and X-Total-Count
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from fastapi import FastAPI
+
+from app.api.endpoints import admin
+from app.db.base import get_async_db
+from app.models.database import Conversation, ResearchID, UserSession
+
+AUTH = {"password": "test-admin"}
+START = datetime(2025, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+async def seed(db):
+    """RID001: 2 sessions, 3 messages; RID002: 1 session, 5 messages; RID003: nothing; RID004: inactive"""
+    users = {
+        rid: ResearchID(research_id=rid, is_active=rid != "RID004")
+        for rid in ("RID001", "RID002", "RID003", "RID004")
+    }
+    db.add_all(users.values())
+    await db.flush()
+
+    for rid, sessions, messages in (("RID001", 2, 3), ("RID002", 1, 5), ("RID004", 1, 1)):
+        user_id = users[rid].id
+        db.add_all(
+            UserSession(research_id_fk=user_id, session_token=f"{rid}-{i}")
+            for i in range(sessions)
+        )
+        db.add_all(
+            Conversation(
+                research_id_fk=user_id,
+                conversation_id=f"conv_{rid}",
+                role="user",
+                content=f"m{i}",
+                timestamp=START + timedelta(minutes=i)
+            )
+            for i in range(messages)
+        )
+    await db.commit()
+
+
+def list_research_ids(sqlite_db, *queries):
+    """Run GET /research-ids once per query string against a seeded database"""
+    async def scenario():
+        async with sqlite_db() as sessions:
+            async with sessions() as db:
+                await seed(db)
+
+            async def get_db():
+                async with sessions() as db:
+                    yield db
+
+            app = FastAPI()
+            app.include_router(admin.router, prefix="/admin")
+            app.dependency_overrides[get_async_db] = get_db
+
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return [
+                    await client.request("GET", f"/admin/research-ids{query}", json=AUTH)
+                    for query in queries
+                ]
+
+    return asyncio.run(scenario())
+
+
+def test_lists_aggregated_statistics_with_total_header(sqlite_db):
+    response, = list_research_ids(sqlite_db, "")
+
+    assert response.status_code == 200
+    assert response.headers["x-total-count"] == "3"
+    rows = {row["research_id"]: row for row in response.json()}
+    assert list(rows) == ["RID001", "RID002", "RID003"]
+    assert (rows["RID001"]["total_sessions"], rows["RID001"]["total_messages"]) == (2, 3)
+    assert (rows["RID002"]["total_sessions"], rows["RID002"]["total_messages"]) == (1, 5)
+    assert (rows["RID003"]["total_sessions"], rows["RID003"]["total_messages"]) == (0, 0)
+    assert rows["RID003"]["last_activity"] is None
+    assert rows["RID002"]["last_activity"].startswith("2025-01-01T12:04")
+
+
+def test_sorts_and_pages_with_total_of_all_matches(sqlite_db):
+    by_messages, second_page, with_inactive = list_research_ids(
+        sqlite_db,
+        "?sort_by=total_messages&sort_order=desc",
+        "?sort_by=total_messages&sort_order=desc&limit=2&offset=2",
+        "?include_inactive=true&limit=1",
+    )
+
+    assert [row["research_id"] for row in by_messages.json()] == ["RID002", "RID001", "RID003"]
+    assert [row["research_id"] for row in second_page.json()] == ["RID003"]
+    assert second_page.headers["x-total-count"] == "3"
+    assert len(with_inactive.json()) == 1
+    assert with_inactive.headers["x-total-count"] == "4"
+
+
+def test_rejects_wrong_admin_password():
+    async def no_db():
+        yield None
+
+    async def scenario():
+        app = FastAPI()
+        app.include_router(admin.router, prefix="/admin")
+        app.dependency_overrides[get_async_db] = no_db
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.request("GET", "/admin/research-ids", json={"password": "wrong"})
+
+    assert asyncio.run(scenario()).status_code == 401
@@ -0,0 +1,111 @@
+"""
+Content-addressed TTS audio cache: hits, expiry and eviction
+"""
+import os
+import time
+
+from app.services.audio_cache import AudioCache
+
+FORMAT = "mp3_22050_32"
+
+
+def make_cache(tmp_path, **options):
+    return AudioCache(tmp_path, **{"max_disk_bytes": 10_000, "max_age_seconds": 3600, **options})
+
+
+def age(path, seconds):
+    mtime = time.time() - seconds
+    os.utime(path, (mtime, mtime))
+
+
+def test_key_depends_on_text_voice_model_and_format():
+    key = AudioCache.make_key("Hello", "voice", "model", FORMAT)
+    assert key == AudioCache.make_key("Hello", "voice", "model", FORMAT)
+    assert len({
+        key,
+        AudioCache.make_key("Hello!", "voice", "model", FORMAT),
+        AudioCache.make_key("Hello", "other", "model", FORMAT),
+        AudioCache.make_key("Hello", "voice", "other", FORMAT),
+        AudioCache.make_key("Hello", "voice", "model", "opus_48000_32"),
+    }) == 5
+
+
+def test_memory_then_disk_hits(tmp_path):
+    cache = make_cache(tmp_path)
+    key = AudioCache.make_key("Hello", "voice", "model", FORMAT)
+    assert cache.get(key, FORMAT) is None
+
+    file_path = cache.put(key, FORMAT, b"audio")
+    assert file_path == str(tmp_path / f"tts_{key}.mp3")
+    assert cache.get(key, FORMAT) == (file_path, b"audio")
+
+    # A fresh process only has the disk tier
+    restarted = make_cache(tmp_path)
+    assert restarted.contains(key, FORMAT)
+    path, audio = restarted.get(key, FORMAT)
+    assert (path, bytes(audio)) == (file_path, b"audio")
+
+    assert cache.stats()["misses"] == 1 and cache.stats()["memory_hits"] == 1
+    assert restarted.stats()["disk_hits"] == 1
+
+
+def test_memory_tier_is_lru_bounded(tmp_path):
+    cache = make_cache(tmp_path, max_memory_items=2)
+    for key in ("a" * 32, "b" * 32, "c" * 32):
+        cache.put(key, FORMAT, key.encode())
+    cache.get("b" * 32, FORMAT)
+    cache.put("d" * 32, FORMAT, b"d")
+
+    stats = cache.stats()
+    assert stats["memory_items"] == 2
+    # "c" was evicted from memory but is still served from disk
+    assert cache.get("c" * 32, FORMAT)[1] == b"c" * 32
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_put_stream_returns_one_buffer(tmp_path):
+    cache = make_cache(tmp_path)
+    file_path, audio = cache.put_stream("a" * 32, FORMAT, iter([b"ab", b"cd", b"ef"]))
+
+    assert bytes(audio) == b"abcdef"
+    assert audio.readonly
+    assert open(file_path, "rb").read() == b"abcdef"
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_failed_stream_leaves_no_clip(tmp_path):
+    cache = make_cache(tmp_path)
+
+    def chunks():
+        yield b"partial"
+        raise RuntimeError("connection reset")
+
+    try:
+        cache.put_stream("a" * 32, FORMAT, chunks())
+    except RuntimeError:
+        pass
+    assert not cache.contains("a" * 32, FORMAT)
+    assert not list(tmp_path.iterdir())
+
+
+def test_expired_clips_are_misses_and_evicted(tmp_path):
+    cache = make_cache(tmp_path, max_age_seconds=60)
+    path = cache.put("a" * 32, FORMAT, b"old")
+
+    age(path, 120)
+    assert make_cache(tmp_path, max_age_seconds=60).get("a" * 32, FORMAT) is None
+    assert cache.evict() == 1
+    assert not os.path.exists(path)
+    # The memory entry goes with its file
+    assert cache.get("a" * 32, FORMAT) is None
+
+
+def test_eviction_removes_least_recently_used_until_under_size(tmp_path):
+    cache = make_cache(tmp_path, max_disk_bytes=250)
+    paths = [cache.put(key * 32, FORMAT, b"x" * 100) for key in "abc"]
+    for seconds, path in zip((30, 20, 10), paths):
+        age(path, seconds)
+
+    assert cache.evict() == 1
+    assert [os.path.exists(path) for path in paths] == [False, True, True]
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,83 @@
+"""
+Per-request audio formats: validation, concatenation and PCM stored as WAV
+"""
+import struct
+
+import pytest
+
+from app.services.audio_cache import (
+    WAV_HEADER_BYTES,
+    AudioCache,
+    audio_extension,
+    audio_media_type,
+    concatenable,
+    wav_header,
+)
+from app.services.tts_service import tts_service
+
+PCM = "pcm_16000"
+
+
+def make_cache(tmp_path):
+    return AudioCache(tmp_path, max_disk_bytes=10_000, max_age_seconds=3600)
+
+
+def test_resolve_format_defaults_and_rejects_unknown_formats(monkeypatch):
+    monkeypatch.setattr(tts_service, "output_format", "mp3_22050_32")
+    monkeypatch.setattr(tts_service, "output_formats", {"mp3_22050_32", "opus_48000_32", PCM})
+
+    assert tts_service.resolve_format() == "mp3_22050_32"
+    assert tts_service.resolve_format("") == "mp3_22050_32"
+    assert tts_service.resolve_format("opus_48000_32") == "opus_48000_32"
+    with pytest.raises(ValueError, match="Unsupported audio format 'ulaw_8000'"):
+        tts_service.resolve_format("ulaw_8000")
+
+
+def test_extensions_media_types_and_concatenation():
+    assert audio_extension("mp3_44100_128") == "mp3"
+    assert audio_extension("opus_48000_32") == "opus"
+    assert audio_extension(PCM) == "wav"
+    assert audio_media_type("tts_abc.wav") == "audio/wav"
+    assert audio_media_type("tts_abc.opus") == "audio/ogg"
+    assert audio_media_type("tts_abc.flac") == "application/octet-stream"
+
+    assert concatenable("mp3_22050_32")
+    assert concatenable(PCM)
+    assert concatenable("ulaw_8000")
+    assert not concatenable("opus_48000_32")
+
+
+def test_wav_header_describes_16_bit_mono_pcm():
+    header = wav_header("pcm_24000", 4800)
+
+    assert len(header) == WAV_HEADER_BYTES
+    riff, riff_size, wave, fmt = struct.unpack_from("<4sI4s4s", header)
+    assert (riff, riff_size, wave, fmt) == (b"RIFF", 36 + 4800, b"WAVE", b"fmt ")
+    _, codec, channels, sample_rate, byte_rate, block_align, bits = struct.unpack_from("<IHHIIHH", header, 16)
+    assert (codec, channels, sample_rate, byte_rate, block_align, bits) == (1, 1, 24000, 48000, 2, 16)
+    assert struct.unpack_from("<4sI", header, 36) == (b"data", 4800)
+
+
+def test_pcm_is_stored_as_wav_but_served_as_raw_samples(tmp_path):
+    cache = make_cache(tmp_path)
+    samples = bytes(range(200))
+    key = AudioCache.make_key("Hello", "voice", "model", PCM)
+
+    file_path = cache.put(key, PCM, samples)
+    stored = (tmp_path / f"tts_{key}.wav").read_bytes()
+    assert file_path.endswith(".wav")
+    assert stored[:4] == b"RIFF" and len(stored) == len(samples) + WAV_HEADER_BYTES
+    assert stored[WAV_HEADER_BYTES:] == samples
+
+    # From disk, without the header
+    assert bytes(make_cache(tmp_path).get(key, PCM)[1]) == samples
+
+
+def test_streamed_pcm_gets_the_final_data_length(tmp_path):
+    cache = make_cache(tmp_path)
+    key = AudioCache.make_key("Hello", "voice", "model", PCM)
+
+    file_path, audio = cache.put_stream(key, PCM, [b"\x01\x00" * 50, b"\x02\x00" * 25])
+    stored = open(file_path, "rb").read()
+    assert bytes(audio) == b"\x01\x00" * 50 + b"\x02\x00" * 25
+    assert stored[:WAV_HEADER_BYTES] == wav_header(PCM, 150)
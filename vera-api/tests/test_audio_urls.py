@@ -0,0 +1,125 @@
+"""
+Signed audio URLs and range/conditional requests on the audio endpoint
+"""
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.endpoints import audio
+from app.core.security import CLIP_FILENAME, audio_signature, sign_audio_url, verify_audio_signature
+from app.services.audio_cache import AudioCache
+from app.services.tts_service import tts_service
+
+CLIP = "tts_" + "a" * 32 + ".mp3"
+
+
+def signed_params(url: str) -> dict:
+    return {key: values[0] for key, values in parse_qs(urlsplit(url).query).items()}
+
+
+def test_signed_url_verifies():
+    url = sign_audio_url(f"/tmp/audio/{CLIP}", "RID001")
+    params = signed_params(url)
+
+    assert urlsplit(url).path == f"/api/v1/audio/{CLIP}"
+    assert params["rid"] == "RID001"
+    assert verify_audio_signature(CLIP, "RID001", int(params["exp"]), params["sig"])
+
+
+@pytest.mark.parametrize("output_format", ["mp3_22050_32", "opus_48000_32", "pcm_16000", "ulaw_8000"])
+def test_cached_clip_names_are_signable(tmp_path, output_format):
+    cache = AudioCache(tmp_path, max_disk_bytes=1000, max_age_seconds=60)
+    path = cache.path_for(AudioCache.make_key("Hello", "voice", "model", output_format), output_format)
+    assert CLIP_FILENAME.fullmatch(path.name)
+    assert sign_audio_url(str(path), "RID001") != str(path)
+
+
+def test_repeat_signing_returns_the_same_url():
+    assert sign_audio_url(CLIP, "RID001") == sign_audio_url(CLIP, "RID001")
+
+
+@pytest.mark.parametrize("filename, research_id, signature", [
+    ("tts_" + "b" * 32 + ".mp3", "RID001", None),
+    (CLIP, "RID002", None),
+    (CLIP, "RID001", "0" * 32),
+])
+def test_tampered_url_is_rejected(filename, research_id, signature):
+    params = signed_params(sign_audio_url(CLIP, "RID001"))
+    assert not verify_audio_signature(
+        filename, research_id, int(params["exp"]), signature or params["sig"]
+    )
+
+
+def test_expired_url_is_rejected():
+    expires = int(time.time()) - 1
+    assert not verify_audio_signature(CLIP, "RID001", expires, audio_signature(CLIP, "RID001", expires))
+
+
+@pytest.mark.parametrize("audio_path", [None, "", "https://cdn.example.com/clip.mp3", "/tmp/other.mp3"])
+def test_non_clip_paths_are_returned_unsigned(audio_path):
+    assert sign_audio_url(audio_path, "RID001") == audio_path
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=900-5000", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=0-1,5-6", None),
+    ("items=0-1", None),
+])
+def test_parse_range(header, expected):
+    assert audio.parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=5-2", "bytes=-0"])
+def test_unsatisfiable_range(header):
+    with pytest.raises(ValueError):
+        audio.parse_range(header, 1000)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(tts_service, "audio_dir", tmp_path)
+    (tmp_path / CLIP).write_bytes(bytes(range(256)) * 4)
+    app = FastAPI()
+    app.include_router(audio.router, prefix="/api/v1/audio")
+    return TestClient(app)
+
+
+def test_serves_clip_with_validators(client):
+    response = client.get(sign_audio_url(CLIP, "RID001"))
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "audio/mpeg"
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.content == bytes(range(256)) * 4
+
+    again = client.get(sign_audio_url(CLIP, "RID001"), headers={"If-None-Match": response.headers["etag"]})
+    assert again.status_code == 304
+
+
+def test_serves_byte_ranges(client):
+    url = sign_audio_url(CLIP, "RID001")
+
+    partial = client.get(url, headers={"Range": "bytes=10-19"})
+    assert partial.status_code == 206
+    assert partial.headers["content-range"] == "bytes 10-19/1024"
+    assert partial.content == bytes(range(10, 20))
+
+    assert client.get(url, headers={"Range": "bytes=2000-"}).status_code == 416
+    # A stale If-Range validator gets the whole clip
+    stale = client.get(url, headers={"Range": "bytes=10-19", "If-Range": '"stale"'})
+    assert stale.status_code == 200
+
+
+def test_rejects_bad_signature_and_unknown_clips(client):
+    url = sign_audio_url(CLIP, "RID001")
+    assert client.get(url.replace("rid=RID001", "rid=RID002")).status_code == 403
+
+    missing = "tts_" + "c" * 32 + ".mp3"
+    assert client.get(sign_audio_url(missing, "RID001")).status_code == 404
@@ -0,0 +1,172 @@
+"""
+Identity cache for verified tokens and batched session activity writes
+"""
+import asyncio
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from app.core import auth_cache, security
+from app.core.auth_cache import CurrentUser, IdentityCache, SessionActivityTracker
+from app.models.database import ResearchID, UserSession
+
+
+def user(research_id="RID001", session_id=1):
+    return CurrentUser(id=1, research_id=research_id, is_active=True, created_at=None, session_id=session_id)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(auth_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_cached_identity_expires_after_ttl(clock):
+    cache = IdentityCache(ttl_seconds=30)
+    cache.set("token", user())
+    assert cache.get("token") == user()
+    assert cache.get("other-token") is None
+
+    clock[0] += 31
+    assert cache.get("token") is None
+
+
+def test_invalidate_research_id_drops_all_its_tokens(clock):
+    cache = IdentityCache()
+    cache.set("a", user("RID001", 1))
+    cache.set("b", user("RID001", 2))
+    cache.set("c", user("RID002", 3))
+
+    cache.invalidate_research_id("RID001")
+    assert [cache.get(token) for token in "abc"] == [None, None, user("RID002", 3)]
+
+
+def test_full_cache_drops_expired_entries_first(clock):
+    cache = IdentityCache(ttl_seconds=30, max_entries=2)
+    cache.set("old", user())
+    clock[0] += 20
+    cache.set("new", user())
+    clock[0] += 20
+    cache.set("newest", user())
+
+    assert cache.get("old") is None
+    assert cache.get("new") == user()
+    assert cache.get("newest") == user()
+
+
+async def add_sessions(db, count):
+    research_user = ResearchID(research_id="RID001")
+    db.add(research_user)
+    await db.flush()
+    sessions = [
+        UserSession(
+            research_id_fk=research_user.id,
+            session_token=f"token-{i}",
+            last_active=datetime(2025, 1, 1)
+        )
+        for i in range(count)
+    ]
+    db.add_all(sessions)
+    await db.commit()
+    return [s.id for s in sessions]
+
+
+async def last_active(db):
+    result = await db.execute(select(UserSession.last_active).order_by(UserSession.id))
+    return [row.replace(tzinfo=None) for row in result.scalars()]
+
+
+def test_activity_is_flushed_in_one_batch(sqlite_db):
+    async def scenario():
+        async with sqlite_db() as sessions:
+            async with sessions() as db:
+                session_ids = await add_sessions(db, 3)
+
+            tracker = SessionActivityTracker(sessions)
+            for session_id in session_ids[:2] * 5:
+                tracker.touch(session_id)
+            pending = tracker.pending_count()
+            written = await tracker.flush()
+
+            async with sessions() as db:
+                return pending, written, tracker.pending_count(), await last_active(db)
+
+    pending, written, remaining, timestamps = asyncio.run(scenario())
+    assert (pending, written, remaining) == (2, 2, 0)
+    assert timestamps[0] > datetime(2025, 1, 1)
+    assert timestamps[1] > datetime(2025, 1, 1)
+    assert timestamps[2] == datetime(2025, 1, 1)
+
+
+def test_failed_flush_keeps_activity_for_the_next_one():
+    class BrokenSession:
+        async def __aenter__(self):
+            raise ConnectionError("database unavailable")
+
+        async def __aexit__(self, *exc):
+            return False
+
+    async def scenario():
+        tracker = SessionActivityTracker(BrokenSession)
+        tracker.touch(1)
+        tracker.touch(2)
+        return await tracker.flush(), tracker.pending_count()
+
+    assert asyncio.run(scenario()) == (0, 2)
+
+
+@pytest.fixture
+def fresh_auth_state(monkeypatch):
+    monkeypatch.setattr(security, "identity_cache", IdentityCache())
+    monkeypatch.setattr(security, "session_activity", SessionActivityTracker(None))
+
+
+def test_authenticate_token_queries_once_then_uses_cache(sqlite_db, fresh_auth_state):
+    token = security.create_access_token({"research_id": "RID001", "session_id": 7})
+
+    class CountingSession:
+        """Wraps a session and counts queries"""
+
+        def __init__(self, db):
+            self.db = db
+            self.queries = 0
+
+        async def execute(self, statement):
+            self.queries += 1
+            return await self.db.execute(statement)
+
+    async def scenario():
+        async with sqlite_db() as sessions:
+            async with sessions() as db:
+                db.add(ResearchID(research_id="RID001"))
+                await db.commit()
+
+                counting = CountingSession(db)
+                first = await security.authenticate_token(token, counting)
+                second = await security.authenticate_token(token, counting)
+                return first, second, counting.queries
+
+    first, second, queries = asyncio.run(scenario())
+    assert first == second
+    assert (first.research_id, first.session_id) == ("RID001", 7)
+    assert queries == 1
+    assert security.session_activity.pending_count() == 1
+
+
+def test_inactive_research_id_is_rejected(sqlite_db, fresh_auth_state):
+    token = security.create_access_token({"research_id": "RID001", "session_id": 7})
+
+    async def scenario():
+        async with sqlite_db() as sessions:
+            async with sessions() as db:
+                db.add(ResearchID(research_id="RID001", is_active=False))
+                await db.commit()
+                await security.authenticate_token(token, db)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(scenario())
+    assert error.value.status_code == 401
+    assert security.identity_cache.get(token) is None
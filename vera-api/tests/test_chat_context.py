@@ -0,0 +1,91 @@
+"""
+Per-connection chat context: identity reuse and history loading without
+holding a pooled connection for the socket's lifetime
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core import security
+from app.core.auth_cache import IdentityCache, SessionActivityTracker
+from app.db.base import Base
+from app.models.database import Conversation, ResearchID
+from app.services.chat_context import ChatConnectionContext
+
+START = datetime(2025, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture(autouse=True)
+def fresh_auth_state(monkeypatch):
+    monkeypatch.setattr(security, "identity_cache", IdentityCache())
+    monkeypatch.setattr(security, "session_activity", SessionActivityTracker(None))
+
+
+def test_reads_return_their_connection_to_the_pool(tmp_path):
+    token = security.create_access_token({"research_id": "RID001", "session_id": 1})
+
+    async def scenario():
+        # The same pool class the app uses for PostgreSQL
+        engine = create_async_engine(
+            f"sqlite+aiosqlite:///{tmp_path / 'vera.db'}", poolclass=AsyncAdaptedQueuePool
+        )
+        sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with sessions() as db:
+            user = ResearchID(research_id="RID001")
+            db.add(user)
+            await db.flush()
+            db.add_all(
+                Conversation(
+                    research_id_fk=user.id,
+                    conversation_id="conv",
+                    role="user" if i % 2 == 0 else "assistant",
+                    content=f"m{i}",
+                    timestamp=START + timedelta(seconds=i)
+                )
+                for i in range(5)
+            )
+            await db.commit()
+
+        try:
+            context = ChatConnectionContext(sessions, max_messages=3)
+            user = await context.authenticate(token)
+            after_auth = engine.pool.checkedout()
+            await context.load_conversation("conv")
+            after_load = engine.pool.checkedout()
+            return user, context.history(), after_auth, after_load
+        finally:
+            await engine.dispose()
+
+    user, history, after_auth, after_load = asyncio.run(scenario())
+    assert user.research_id == "RID001"
+    assert [m["content"] for m in history] == ["m2", "m3", "m4"]
+    assert (after_auth, after_load) == (0, 0)
+
+
+def test_fresh_identity_and_loaded_conversation_skip_the_database():
+    opened = []
+
+    def session_factory():
+        opened.append(1)
+        raise AssertionError("no database access expected")
+
+    async def scenario():
+        context = ChatConnectionContext(session_factory, revalidate_seconds=30)
+        context.user = security.CurrentUser(
+            id=1, research_id="RID001", is_active=True, created_at=None, session_id=1
+        )
+        context._token = "token"
+        context._validated_at = time.monotonic()
+        context.conversation_id = "conv"
+
+        await context.load_conversation("conv")
+        return await context.authenticate("token")
+
+    assert asyncio.run(scenario()).research_id == "RID001"
+    assert opened == []
@@ -0,0 +1,251 @@
+"""
+History cursors, keyset pagination and idempotent message saves
+"""
+import asyncio
+import base64
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import func, select, text
+
+from app.models.database import Conversation, ResearchID
+from app.schemas.conversation import MessageSaveRequest
+from app.services.conversation_service import ConversationService
+
+START = datetime(2025, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+async def add_research_id(db, research_id="RID001") -> int:
+    row = ResearchID(research_id=research_id)
+    db.add(row)
+    await db.commit()
+    return row.id
+
+
+def transcript(*messages):
+    return {"transcript": [{"role": role, "message": text} for role, text in messages]}
+
+
+def test_cursor_round_trip():
+    message = Conversation(id=42, timestamp=START)
+    cursor = ConversationService.encode_history_cursor(message)
+    assert ConversationService.decode_history_cursor(cursor) == (START, 42)
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    base64.urlsafe_b64encode(b"no-separator").decode(),
+    base64.urlsafe_b64encode(b"2025-01-01T12:00:00|abc").decode(),
+    base64.urlsafe_b64encode(b"yesterday|1").decode(),
+    base64.urlsafe_b64encode(b"\xff\xfe|1").decode(),
+])
+def test_malformed_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        ConversationService.decode_history_cursor(cursor)
+
+
+def test_keyset_pages_cover_history_once_in_order(sqlite_db):
+    async def scenario():
+        async with sqlite_db() as sessions:
+            async with sessions() as db:
+                research_id_fk = await add_research_id(db)
+                # Pairs of messages share a timestamp, so the id breaks ties
+                db.add_all([
+                    Conversation(
+                        research_id_fk=research_id_fk,
+                        conversation_id="conv",
+                        role="user",
+                        content=f"m{i}",
+                        timestamp=START + timedelta(seconds=i // 2)
+                    )
+                    for i in range(7)
+                ])
+                await db.commit()
+
+                pages, cursor = [], None
+                while True:
+                    messages, total, cursor = await ConversationService.get_conversation_history(
+                        db, "RID001", "conv", limit=3, cursor=cursor, include_total=not pages
+                    )
+                    pages.append(([m.content for m in messages], total))
+                    if cursor is None:
+                        return pages
+
+    pages = asyncio.run(scenario())
+    assert [contents for contents, _ in pages] == [["m0", "m1", "m2"], ["m3", "m4", "m5"], ["m6"]]
+    assert [total for _, total in pages] == [7, None, None]
+
+
+def test_transcript_ids_are_stable_across_syncs():
+    data = transcript(("user", "hi"), ("agent", ""), ("agent", "hello"), ("user", "what is PAD?"))
+    data["transcript"][3]["id"] = "msg_abc"
+
+    first = ConversationService.parse_elevenlabs_transcript(data, 1, "el_conv")
+    second = ConversationService.parse_elevenlabs_transcript(data, 1, "el_conv")
+
+    # Empty entries are skipped and don't take a position
+    assert [row["elevenlabs_message_id"] for row in first] == ["turn_0", "turn_1", "msg_abc"]
+    assert [row["elevenlabs_message_id"] for row in second] == ["turn_0", "turn_1", "msg_abc"]
+    assert [row["role"] for row in first] == ["user", "assistant", "user"]
+
+
+def test_transcript_upsert_is_idempotent(postgres_db):
+    data = transcript(("user", "hi"), ("agent", "hello"), ("user", "what is PAD?"))
+
+    async def scenario():
+        async with postgres_db() as sessions:
+            async with sessions() as db:
+                research_id_fk = await add_research_id(db)
+                rows = ConversationService.parse_elevenlabs_transcript(data, research_id_fk, "el_conv")
+                inserted = []
+                for _ in range(2):
+                    inserted.append(await ConversationService.upsert_elevenlabs_messages(db, rows))
+                    await db.commit()
+
+                # A transcript that grew by one message only adds that message
+                data["transcript"].append({"role": "agent", "message": "PAD is..."})
+                rows = ConversationService.parse_elevenlabs_transcript(data, research_id_fk, "el_conv")
+                inserted.append(await ConversationService.upsert_elevenlabs_messages(db, rows))
+                await db.commit()
+
+                count = await db.scalar(select(func.count()).select_from(Conversation))
+                return inserted, count
+
+    inserted, count = asyncio.run(scenario())
+    assert inserted == [3, 0, 1]
+    assert count == 4
+
+
+def test_concurrent_single_saves_return_one_row(postgres_db):
+    from app.api.endpoints import chat
+    from app.core.auth_cache import CurrentUser
+    from app.core.security import get_current_user
+    from app.db.base import get_async_db
+
+    message = {
+        "research_id": "RID001",
+        "role": "user",
+        "content": "hi",
+        "timestamp": "2025-01-01T12:00:00Z",
+        "provider": "elevenlabs",
+        "elevenlabs_conversation_id": "el_conv",
+        "elevenlabs_message_id": "msg_1",
+    }
+
+    async def scenario():
+        async with postgres_db() as sessions:
+            async with sessions() as db:
+                research_id_fk = await add_research_id(db)
+
+            async def get_db():
+                async with sessions() as db:
+                    yield db
+
+            app = FastAPI()
+            app.include_router(chat.router, prefix="/chat")
+            app.dependency_overrides[get_async_db] = get_db
+            app.dependency_overrides[get_current_user] = lambda: CurrentUser(
+                id=research_id_fk, research_id="RID001", is_active=True, created_at=None, session_id=1
+            )
+
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                responses = await asyncio.gather(*[
+                    client.post("/chat/save-message", json=message) for _ in range(8)
+                ])
+
+            async with sessions() as db:
+                count = await db.scalar(select(func.count()).select_from(Conversation))
+            return responses, count
+
+    responses, count = asyncio.run(scenario())
+    assert [r.status_code for r in responses] == [200] * 8
+    assert len({r.json()["message_id"] for r in responses}) == 1
+    assert count == 1
+
+
+def test_migration_backs_up_duplicates_and_downgrade_restores_them(postgres_db, run_migration):
+    def row(message_id, minute, content):
+        return Conversation(
+            conversation_id="el_conv",
+            role="user",
+            content=content,
+            timestamp=START.replace(minute=minute),
+            provider="elevenlabs",
+            elevenlabs_conversation_id="el_conv",
+            elevenlabs_message_id=message_id
+        )
+
+    async def scenario():
+        async with postgres_db() as sessions:
+            async with sessions() as db:
+                # Rows as they could exist before the unique index
+                await db.execute(text("DROP INDEX uq_elevenlabs_conversation_message"))
+                research_id_fk = await add_research_id(db)
+                rows = [
+                    row("msg_a", 0, "hi"),
+                    row("msg_a", 0, "hi (second sync)"),
+                    row("msg_a", 0, "hi (third sync)"),
+                    row(None, 1, "legacy message without an id"),
+                ]
+                for message in rows:
+                    message.research_id_fk = research_id_fk
+                db.add_all(rows)
+                await db.commit()
+
+                conn = await db.connection()
+                await run_migration(conn, "8b4e1c7d2a90", "upgrade")
+                kept = (await db.execute(text(
+                    "SELECT content, elevenlabs_message_id FROM vera_conversations ORDER BY id"
+                ))).all()
+                backed_up = (await db.execute(text(
+                    "SELECT content FROM vera_conversations_duplicates ORDER BY id"
+                ))).scalars().all()
+
+                await run_migration(conn, "8b4e1c7d2a90", "downgrade")
+                restored = (await db.execute(text(
+                    "SELECT content FROM vera_conversations ORDER BY id"
+                ))).scalars().all()
+                backup_table = await db.scalar(text("SELECT to_regclass('vera_conversations_duplicates')"))
+                return kept, backed_up, restored, backup_table
+
+    kept, backed_up, restored, backup_table = asyncio.run(scenario())
+    assert [tuple(r) for r in kept] == [("hi", "msg_a"), ("legacy message without an id", "turn_1")]
+    assert backed_up == ["hi (second sync)", "hi (third sync)"]
+    assert restored == ["hi", "hi (second sync)", "hi (third sync)", "legacy message without an id"]
+    assert backup_table is None
+
+
+def test_batch_save_reports_duplicates(sqlite_db):
+    def item(message_id, content="hi"):
+        return MessageSaveRequest(
+            research_id="RID001",
+            role="user",
+            content=content,
+            timestamp="2025-01-01T12:00:00Z",
+            provider="elevenlabs",
+            elevenlabs_conversation_id="el_conv",
+            elevenlabs_message_id=message_id
+        )
+
+    async def scenario():
+        async with sqlite_db() as sessions:
+            async with sessions() as db:
+                research_id_fk = await add_research_id(db)
+                first = await ConversationService.save_frontend_messages(
+                    db, "RID001", research_id_fk, [item("m1"), item("m2"), item("m1")]
+                )
+                second = await ConversationService.save_frontend_messages(
+                    db, "RID001", research_id_fk, [item("m2"), item("m3")]
+                )
+                count = await db.scalar(select(func.count()).select_from(Conversation))
+                return first, second, count
+
+    first, second, count = asyncio.run(scenario())
+    assert [r.duplicate for r in first] == [False, False, True]
+    assert first[2].message_id == first[0].message_id
+    assert [r.duplicate for r in second] == [True, False]
+    assert second[0].message_id == first[1].message_id
+    assert count == 3
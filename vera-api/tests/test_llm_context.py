@@ -0,0 +1,68 @@
+"""
+Token budget used to trim conversation history for the LLM
+"""
+from app.services.llm_service import (
+    DEFAULT_CONTEXT_TOKENS,
+    MIN_HISTORY_TOKENS,
+    MODEL_CONTEXT_TOKENS,
+    estimate_tokens,
+    llm_service,
+)
+
+SYSTEM_PROMPT = "You are Vera."
+
+
+def history(turns: int, chars: int = 400):
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"{i:04d}" + "x" * (chars - 4)}
+        for i in range(turns)
+    ]
+
+
+def history_tokens(messages):
+    return sum(estimate_tokens(m["content"]) for m in messages[1:])
+
+
+def test_system_prompt_first_then_chronological_history():
+    turns = history(4)
+    messages = llm_service.build_messages("gpt-4o", SYSTEM_PROMPT, turns)
+    assert messages[0] == {"role": "system", "content": SYSTEM_PROMPT}
+    assert messages[1:] == turns
+
+
+def test_default_websocket_model_has_a_large_context():
+    assert MODEL_CONTEXT_TOKENS["gpt-4.1"] > DEFAULT_CONTEXT_TOKENS
+
+
+def test_history_is_capped_at_history_budget_keeping_newest_turns():
+    turns = history(200)
+    messages = llm_service.build_messages("gpt-4.1", SYSTEM_PROMPT, turns, history_budget=8000)
+
+    kept = messages[1:]
+    assert kept == turns[-len(kept):]
+    assert history_tokens(messages) <= 8000
+    # One more turn would not have fit
+    assert history_tokens(messages) + estimate_tokens(turns[-len(kept) - 1]["content"]) > 8000
+
+
+def test_small_context_leaves_model_context_minus_reserve():
+    turns = history(200)
+    messages = llm_service.build_messages("gemma2-9b-it", SYSTEM_PROMPT, turns, history_budget=100000)
+
+    budget = MODEL_CONTEXT_TOKENS["gemma2-9b-it"] - 5000 - estimate_tokens(SYSTEM_PROMPT)
+    assert 0 < budget - history_tokens(messages) < estimate_tokens(turns[0]["content"])
+
+
+def test_budget_never_drops_below_floor():
+    # Completion reserve larger than the whole context window
+    turns = history(50)
+    messages = llm_service.build_messages("gemma2-9b-it", SYSTEM_PROMPT, turns, max_tokens=20000)
+
+    assert len(messages) > 2
+    assert history_tokens(messages) <= MIN_HISTORY_TOKENS
+
+
+def test_newest_message_is_kept_even_when_over_budget():
+    turns = history(3, chars=40000)
+    messages = llm_service.build_messages("gpt-4.1", SYSTEM_PROMPT, turns, history_budget=1000)
+    assert messages[1:] == turns[-1:]
@@ -0,0 +1,136 @@
+"""
+Provider failover in LLMService: lazy breaker checks and typed errors
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import provider_health
+from app.services.llm_service import LLMProviderError, LLMRoute, LLMService
+from app.services.provider_health import CLOSED, HALF_OPEN, OPEN
+
+MESSAGES = [{"role": "system", "content": "You are Vera."}, {"role": "user", "content": "hi"}]
+
+
+class ProviderError(Exception):
+    """Non-retryable API error (e.g. 400), so routes fail over without retries"""
+    status_code = 400
+
+
+def chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))], usage=None)
+
+
+class FakeStream:
+    def __init__(self, texts, fail_after=None):
+        self.texts = texts
+        self.fail_after = fail_after
+
+    async def __aiter__(self):
+        for i, text in enumerate(self.texts):
+            if i == self.fail_after:
+                raise ConnectionError("stream reset")
+            yield chunk(text)
+
+    async def close(self):
+        pass
+
+
+class FakeClient:
+    """Minimal chat.completions client that answers with `texts` or raises `error`"""
+
+    def __init__(self, texts=("Hello", " there"), error=None, fail_after=None):
+        self.calls = 0
+
+        async def create(**params):
+            self.calls += 1
+            if error is not None:
+                raise error
+            return FakeStream(list(texts), fail_after)
+
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=create))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(provider_health.time, "monotonic", lambda: now[0])
+    return now
+
+
+def make_service(monkeypatch, primary, fallback):
+    service = LLMService()
+    routes = [LLMRoute("openai", primary, "gpt-4.1", {}), LLMRoute("openrouter", fallback, "openai/gpt-4.1", {})]
+    monkeypatch.setattr(service, "_get_routes", lambda model: routes)
+    return service
+
+
+def open_breaker(service, provider, clock):
+    for _ in range(service.health.failure_threshold):
+        service.health.record_failure(provider, RuntimeError("503"))
+    # Cool-down over: the next allow() spends the half-open trial
+    clock[0] += service.health.reset_seconds + 1
+
+
+def stream(service):
+    async def collect():
+        return [text async for text in service.stream_chat_completion("gpt-4.1", MESSAGES)]
+    return asyncio.run(collect())
+
+
+def test_fallback_trial_is_not_spent_when_primary_answers(monkeypatch, clock):
+    fallback = FakeClient()
+    service = make_service(monkeypatch, FakeClient(), fallback)
+    open_breaker(service, "openrouter", clock)
+
+    assert stream(service) == ["Hello", " there"]
+    assert fallback.calls == 0
+    assert service.health.stats()["openrouter"]["state"] == OPEN
+    # The trial is still there for when the primary fails
+    assert service.health.available("openrouter")
+
+
+def test_fails_over_to_half_open_fallback(monkeypatch, clock):
+    fallback = FakeClient(texts=["From", " fallback"])
+    service = make_service(monkeypatch, FakeClient(error=ProviderError("bad request")), fallback)
+    open_breaker(service, "openrouter", clock)
+
+    assert stream(service) == ["From", " fallback"]
+    assert fallback.calls == 1
+    assert service.health.stats()["openrouter"]["state"] == CLOSED
+
+
+def test_open_primary_is_skipped(monkeypatch, clock):
+    primary = FakeClient()
+    service = make_service(monkeypatch, primary, FakeClient(texts=["Fallback"]))
+    for _ in range(service.health.failure_threshold):
+        service.health.record_failure("openai", RuntimeError("503"))
+
+    assert stream(service) == ["Fallback"]
+    assert primary.calls == 0
+
+
+def test_exhausted_failover_raises_instead_of_yielding_error_text(monkeypatch, clock):
+    service = make_service(
+        monkeypatch,
+        FakeClient(error=ProviderError("bad request")),
+        FakeClient(error=ProviderError("model not found"))
+    )
+
+    with pytest.raises(LLMProviderError, match="model not found"):
+        stream(service)
+
+
+def test_stream_breaking_off_raises_after_partial_text(monkeypatch, clock):
+    service = make_service(monkeypatch, FakeClient(texts=["Hello", " there"], fail_after=1), FakeClient())
+    received = []
+
+    async def collect():
+        async for text in service.stream_chat_completion("gpt-4.1", MESSAGES):
+            received.append(text)
+
+    with pytest.raises(LLMProviderError, match="stream reset"):
+        asyncio.run(collect())
+    assert received == ["Hello"]
+    assert service.health.stats()["openai"]["failures"] == 1
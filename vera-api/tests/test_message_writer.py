@@ -0,0 +1,256 @@
+"""
+Write-behind message persistence: batching, retries, dead-lettering, replay and shutdown
+"""
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app.services import message_writer as writer_module
+from app.services.message_writer import MessageWriter
+
+
+class FakeDatabase:
+    """
+    Records inserted rows; fails the first `failures` inserts and any batch
+    containing `poison` (with `poison_error`)
+    """
+
+    def __init__(self, failures: int = 0, poison: str = None, poison_error=None, delay: float = 0.0):
+        self.failures = failures
+        self.poison = poison
+        self.poison_error = poison_error or RuntimeError("value too long")
+        self.delay = delay
+        self.batches = []
+        self.rows = []
+
+    def session(self):
+        database = self
+
+        class Session:
+            async def __aenter__(self):
+                await asyncio.sleep(database.delay)
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def execute(self, statement, rows):
+                if database.failures:
+                    database.failures -= 1
+                    raise RuntimeError("database unavailable")
+                if database.poison and any(row["content"] == database.poison for row in rows):
+                    raise database.poison_error
+                database.batches.append([row["content"] for row in rows])
+                database.rows.extend(rows)
+
+            async def commit(self):
+                pass
+
+        return Session()
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(writer_module, "retry_delay", lambda attempt: 0)
+
+
+def make_writer(database, tmp_path, **options):
+    return MessageWriter(
+        database.session,
+        dead_letter_path=str(tmp_path / "failed_messages.jsonl"),
+        **{"flush_interval_seconds": 0.01, "max_retries": 2, **options}
+    )
+
+
+def dead_letters(tmp_path):
+    path = tmp_path / "failed_messages.jsonl"
+    if not path.exists():
+        return []
+    return [json.loads(line)["content"] for line in path.read_text().splitlines()]
+
+
+def enqueue(writer, *contents):
+    for content in contents:
+        writer.enqueue(research_id_fk=1, conversation_id="conv", role="user", content=content)
+
+
+def test_rows_are_written_in_batches(tmp_path):
+    database = FakeDatabase()
+
+    async def scenario():
+        writer = make_writer(database, tmp_path, batch_size=2)
+        writer.start()
+        enqueue(writer, "a", "b", "c")
+        await writer.stop()
+        return writer.stats()
+
+    stats = asyncio.run(scenario())
+    assert database.batches == [["a", "b"], ["c"]]
+    assert stats["written"] == 3
+    assert dead_letters(tmp_path) == []
+
+
+def test_failed_batch_is_retried(tmp_path):
+    database = FakeDatabase(failures=2)
+
+    async def scenario():
+        writer = make_writer(database, tmp_path)
+        writer.start()
+        enqueue(writer, "a", "b")
+        await writer.stop()
+        return writer.stats()
+
+    stats = asyncio.run(scenario())
+    assert database.batches == [["a", "b"]]
+    assert stats["retries"] == 2
+    assert stats["dead_lettered"] == 0
+
+
+def test_bad_row_is_dead_lettered_alone(tmp_path):
+    database = FakeDatabase(poison="bad")
+
+    async def scenario():
+        writer = make_writer(database, tmp_path)
+        writer.start()
+        enqueue(writer, "a", "bad", "c")
+        await writer.stop()
+        return writer.stats()
+
+    stats = asyncio.run(scenario())
+    assert database.batches == [["a"], ["c"]]
+    assert stats["failed_batches"] == 1
+    assert dead_letters(tmp_path) == ["bad"]
+
+
+def test_rows_being_collected_at_shutdown_are_dead_lettered(tmp_path):
+    # The drain times out while the writer is still inside its flush window
+    database = FakeDatabase()
+
+    async def scenario():
+        writer = make_writer(database, tmp_path, flush_interval_seconds=5.0, drain_timeout_seconds=0.05)
+        writer.start()
+        enqueue(writer, "a", "b")
+        await asyncio.sleep(0.01)
+        await writer.stop()
+        return writer.stats()
+
+    stats = asyncio.run(scenario())
+    assert database.batches == []
+    assert dead_letters(tmp_path) == ["a", "b"]
+    assert stats["dead_lettered"] == 2
+
+
+def test_rows_being_written_at_shutdown_are_dead_lettered(tmp_path):
+    database = FakeDatabase(delay=5.0)
+
+    async def scenario():
+        writer = make_writer(database, tmp_path, drain_timeout_seconds=0.1)
+        writer.start()
+        enqueue(writer, "a", "b")
+        await asyncio.sleep(0.05)
+        enqueue(writer, "c")
+        await writer.stop()
+
+    asyncio.run(scenario())
+    assert sorted(dead_letters(tmp_path)) == ["a", "b", "c"]
+
+
+def test_integrity_errors_are_not_retried(tmp_path):
+    error = IntegrityError("INSERT INTO vera_conversations", {}, Exception("violates foreign key"))
+    database = FakeDatabase(poison="bad", poison_error=error)
+
+    async def scenario():
+        writer = make_writer(database, tmp_path, max_retries=5)
+        writer.start()
+        enqueue(writer, "a", "bad", "c")
+        await writer.stop()
+        return writer.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["retries"] == 0
+    assert database.batches == [["a"], ["c"]]
+    assert dead_letters(tmp_path) == ["bad"]
+
+
+def test_stop_during_row_fallback_dead_letters_only_unwritten_rows(tmp_path):
+    error = IntegrityError("INSERT INTO vera_conversations", {}, Exception("violates foreign key"))
+
+    class SlowRowsDatabase(FakeDatabase):
+        """Rejects the batch, then stores single rows slowly"""
+
+        def session(self):
+            session = super().session()
+            execute = session.execute
+
+            async def slow_execute(statement, rows):
+                if len(rows) > 1:
+                    raise error
+                await asyncio.sleep(0.05)
+                await execute(statement, rows)
+
+            session.execute = slow_execute
+            return session
+
+    database = SlowRowsDatabase()
+
+    async def scenario():
+        writer = make_writer(database, tmp_path, drain_timeout_seconds=0.08)
+        writer.start()
+        enqueue(writer, "a", "b", "c", "d")
+        await writer.stop()
+
+    asyncio.run(scenario())
+    written = [content for batch in database.batches for content in batch]
+    assert 0 < len(written) < 4
+    # Every row is either stored or dead-lettered, never both
+    assert sorted(written + dead_letters(tmp_path)) == ["a", "b", "c", "d"]
+
+
+def test_dead_letters_are_replayed_on_start(tmp_path):
+    database = FakeDatabase(poison="still bad")
+    path = tmp_path / "failed_messages.jsonl"
+    rows = [
+        {"table": "vera_conversations", "research_id_fk": 1, "conversation_id": "conv", "role": "user",
+         "content": content, "model_used": None, "audio_url": None,
+         "timestamp": "2025-01-01 12:00:00+00:00"}
+        for content in ("a", "still bad", "b")
+    ]
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows))
+
+    async def scenario():
+        writer = make_writer(database, tmp_path, max_retries=0)
+        writer.start()
+        await asyncio.sleep(0.05)
+        await writer.stop()
+        return writer.stats()
+
+    stats = asyncio.run(scenario())
+    assert [row["content"] for row in database.rows] == ["a", "b"]
+    assert database.rows[0]["timestamp"] == datetime.fromisoformat("2025-01-01 12:00:00+00:00")
+    # Rows that fail again go to a fresh dead-letter file
+    assert dead_letters(tmp_path) == ["still bad"]
+    assert not (tmp_path / "failed_messages.jsonl.replay").exists()
+    assert stats["written"] == 2
+
+
+def test_interrupted_replay_resumes_with_unwritten_batches(tmp_path):
+    database = FakeDatabase()
+    replay_path = tmp_path / "failed_messages.jsonl.replay"
+    row = {"table": "vera_conversations", "research_id_fk": 1, "conversation_id": "conv",
+           "role": "user", "timestamp": "2025-01-01 12:00:00+00:00"}
+    replay_path.write_text("".join(json.dumps({**row, "content": c}) + "\n" for c in "abc"))
+    (tmp_path / "failed_messages.jsonl").write_text(json.dumps({**row, "content": "newer"}) + "\n")
+
+    async def scenario():
+        writer = make_writer(database, tmp_path, batch_size=2)
+        written = await writer.replay_dead_letters()
+        return written
+
+    assert asyncio.run(scenario()) == 3
+    assert database.batches == [["a", "b"], ["c"]]
+    assert not replay_path.exists()
+    # The newer dead-letter file is left for the next replay
+    assert dead_letters(tmp_path) == ["newer"]
@@ -0,0 +1,96 @@
+"""
+Circuit breaker state machine used for LLM provider failover
+"""
+import pytest
+
+from app.services import provider_health
+from app.services.provider_health import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, ProviderHealth
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.monotonic for the breaker"""
+    now = [1000.0]
+    monkeypatch.setattr(provider_health.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+
+def test_success_resets_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=3)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_lets_one_trial_through_after_cool_down(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30)
+    breaker.record_failure()
+
+    clock[0] += 29
+    assert not breaker.allow()
+
+    clock[0] += 2
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # Only one trial while it is in flight
+    assert not breaker.allow()
+
+
+def test_trial_success_closes_and_failure_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=5, reset_seconds=30)
+    for _ in range(5):
+        breaker.record_failure()
+
+    clock[0] += 31
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    clock[0] += 31
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_unreported_trial_is_retried_after_another_cool_down(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30)
+    breaker.record_failure()
+    clock[0] += 31
+    assert breaker.allow()
+
+    clock[0] += 31
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+
+
+def test_provider_health_tracks_each_provider(clock):
+    health = ProviderHealth(failure_threshold=2, reset_seconds=30)
+    health.record_failure("groq", RuntimeError("503"))
+    health.record_failure("groq", RuntimeError("503"))
+    health.record_success("openai", first_token_seconds=1.0)
+    health.record_success("openai", first_token_seconds=2.0)
+
+    assert not health.available("groq")
+    assert health.available("openai")
+
+    stats = health.stats()
+    assert stats["groq"]["state"] == OPEN
+    assert stats["groq"]["last_error"] == "503"
+    assert stats["openai"]["successes"] == 2
+    assert stats["openai"]["first_token_seconds"] == pytest.approx(1.2)
@@ -0,0 +1,147 @@
+"""
+Provider concurrency limits, fair queuing, rate-limit pauses and header parsing
+"""
+import asyncio
+import email.utils
+import time
+
+import pytest
+
+from app.services.provider_scheduler import (
+    FairScheduler,
+    ProviderBusyError,
+    parse_duration,
+    rate_limit_delay,
+)
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_slots_are_limited_and_released():
+    async def scenario():
+        scheduler = FairScheduler("test", max_concurrency=2)
+        first = await scheduler.acquire("A")
+        second = await scheduler.acquire("A")
+        third = asyncio.create_task(scheduler.acquire("A"))
+        await asyncio.sleep(0.01)
+        blocked = (scheduler.stats()["in_flight"], scheduler.stats()["queued"], third.done())
+
+        first.release()
+        first.release()  # idempotent
+        slot = await asyncio.wait_for(third, 1)
+        after = scheduler.stats()["in_flight"]
+        second.release()
+        slot.release()
+        return blocked, after, scheduler.stats()
+
+    blocked, after, stats = run(scenario())
+    assert blocked == (2, 1, False)
+    assert after == 2
+    assert stats["in_flight"] == 0
+    assert stats["granted"] == 3
+
+
+def test_queued_callers_are_served_round_robin_by_research_id():
+    async def scenario():
+        scheduler = FairScheduler("test", max_concurrency=1)
+        holder = await scheduler.acquire("A")
+        order = []
+
+        async def request(key, n):
+            async with scheduler.slot(key):
+                order.append(f"{key}{n}")
+                await asyncio.sleep(0)
+
+        # A bursts first, then B and C queue behind it
+        tasks = [asyncio.create_task(request("A", n)) for n in range(3)]
+        await asyncio.sleep(0)
+        tasks += [asyncio.create_task(request("B", n)) for n in range(2)]
+        tasks.append(asyncio.create_task(request("C", 0)))
+        await asyncio.sleep(0)
+
+        holder.release()
+        await asyncio.gather(*tasks)
+        return order
+
+    assert run(scenario()) == ["A0", "B0", "C0", "A1", "B1", "A2"]
+
+
+def test_queue_timeout_raises_provider_busy():
+    async def scenario():
+        scheduler = FairScheduler("test", max_concurrency=1, queue_timeout_seconds=0.05)
+        holder = await scheduler.acquire()
+        with pytest.raises(ProviderBusyError):
+            await scheduler.acquire()
+        holder.release()
+        return scheduler.stats()
+
+    stats = run(scenario())
+    assert stats["timeouts"] == 1
+    assert stats["queued"] == 0
+    assert stats["in_flight"] == 0
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        scheduler = FairScheduler("test", max_concurrency=1)
+        holder = await scheduler.acquire()
+        waiter = asyncio.create_task(scheduler.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        holder.release()
+        return scheduler.stats()
+
+    stats = run(scenario())
+    assert stats["queued"] == 0
+    assert stats["in_flight"] == 0
+
+
+def test_backoff_pauses_new_requests():
+    async def scenario():
+        scheduler = FairScheduler("test", max_concurrency=5, max_backoff_seconds=0.2)
+        scheduler.backoff(10)  # capped at max_backoff_seconds
+        started = time.monotonic()
+        slot = await scheduler.acquire()
+        waited = time.monotonic() - started
+        slot.release()
+        return waited, scheduler.stats()
+
+    waited, stats = run(scenario())
+    assert 0.15 <= waited < 1.0
+    assert stats["rate_limited"] == 1
+
+
+@pytest.mark.parametrize("value, seconds", [
+    ("2", 2.0),
+    ("0.5", 0.5),
+    ("250ms", 0.25),
+    ("1s", 1.0),
+    ("6m0s", 360.0),
+    ("1h2m3.5s", 3723.5),
+    ("soon", None),
+])
+def test_parse_duration(value, seconds):
+    assert parse_duration(value) == seconds
+
+
+def test_rate_limit_delay_prefers_retry_after_ms():
+    assert rate_limit_delay({"retry-after-ms": "1500", "retry-after": "9"}) == 1.5
+
+
+def test_rate_limit_delay_accepts_http_dates():
+    date = email.utils.formatdate(time.time() + 30, usegmt=True)
+    assert 25 < rate_limit_delay({"retry-after": date}) <= 31
+
+
+def test_rate_limit_delay_uses_exhausted_budget_reset():
+    headers = {
+        "x-ratelimit-remaining-requests": "0",
+        "x-ratelimit-reset-requests": "2s",
+        "x-ratelimit-remaining-tokens": "1200",
+        "x-ratelimit-reset-tokens": "40s",
+    }
+    assert rate_limit_delay(headers) == 2.0
+    assert rate_limit_delay({"x-ratelimit-reset-requests": "2s"}) is None
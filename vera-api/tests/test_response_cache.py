@@ -0,0 +1,137 @@
+"""
+First-turn response cache: exact and semantic hits, expiry and bounded index
+"""
+import asyncio
+import threading
+
+import pytest
+
+from app.prompts import master_prompt
+from app.services import response_cache as cache_module
+from app.services.llm_service import LLMProviderError
+from app.services.response_cache import ResponseCache, normalize_question, unit_vector
+
+
+def first_turn(question):
+    return [{"role": "system", "content": master_prompt}, {"role": "user", "content": question}]
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    """Fake LLM stream; records the questions it was asked"""
+    asked = []
+    state = {"error": None}
+
+    async def stream_chat_completion(model, messages, max_tokens=5000, stats=None):
+        asked.append(messages[-1]["content"])
+        yield "PAD is "
+        if state["error"]:
+            raise state["error"]
+        yield "narrowing of the leg arteries."
+
+    monkeypatch.setattr(cache_module.llm_service, "stream_chat_completion", stream_chat_completion)
+    return asked, state
+
+
+def ask(cache, question, model="gpt-4.1"):
+    async def collect():
+        return "".join([chunk async for chunk in cache.stream(model, first_turn(question))])
+    return asyncio.run(collect())
+
+
+def test_normalize_question():
+    assert normalize_question("  What is P.A.D.?  ") == "what is pad"
+    assert normalize_question("What   IS pad") == "what is pad"
+
+
+def test_only_first_turns_are_cacheable():
+    assert ResponseCache.cacheable(first_turn("What is PAD?"))
+    assert not ResponseCache.cacheable(first_turn("What is PAD?") + [{"role": "assistant", "content": "..."}])
+    assert not ResponseCache.cacheable([{"role": "system", "content": "other"}, {"role": "user", "content": "hi"}])
+
+
+def test_repeated_question_is_served_from_cache(llm):
+    asked, _ = llm
+    cache = ResponseCache()
+
+    first = ask(cache, "What is PAD?")
+    second = ask(cache, "what is pad")
+    other_model = ask(cache, "What is PAD?", model="gpt-4o")
+
+    assert first == second == other_model == "PAD is narrowing of the leg arteries."
+    # Each model has its own scope
+    assert asked == ["What is PAD?", "What is PAD?"]
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_failed_stream_is_not_cached(llm):
+    asked, state = llm
+    cache = ResponseCache()
+
+    state["error"] = LLMProviderError("all providers failed")
+    with pytest.raises(LLMProviderError):
+        ask(cache, "What is PAD?")
+
+    state["error"] = None
+    assert ask(cache, "What is PAD?") == "PAD is narrowing of the leg arteries."
+    assert len(asked) == 2
+
+
+def test_entries_expire_and_are_lru_bounded(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = ResponseCache(ttl_seconds=60, max_entries=2)
+    scope = cache.scope("gpt-4.1")
+
+    for question in ("a", "b"):
+        cache.put(scope, question, question.upper())
+    assert cache._get_exact(cache.make_key(scope, "a")).response == "A"
+    cache.put(scope, "c", "C")
+
+    # "b" was least recently used
+    assert cache._get_exact(cache.make_key(scope, "b")) is None
+    now[0] += 61
+    assert cache._get_exact(cache.make_key(scope, "a")) is None
+
+
+def test_paraphrase_matches_by_embedding_off_the_event_loop(llm, monkeypatch):
+    asked, _ = llm
+    embeddings = {
+        "what is pad": [1.0, 0.0, 0.0],
+        "whats pad": [0.99, 0.1, 0.0],
+        "how do i walk more": [0.0, 1.0, 0.0],
+    }
+    scan_threads = []
+    match = cache_module.best_match
+
+    def recording_best_match(*args):
+        scan_threads.append(threading.get_ident())
+        return match(*args)
+
+    async def embed(text):
+        return embeddings[text]
+
+    monkeypatch.setattr(cache_module, "best_match", recording_best_match)
+    cache = ResponseCache(semantic=True, similarity_threshold=0.95)
+    monkeypatch.setattr(cache, "_embed", embed)
+
+    ask(cache, "What is PAD?")
+    assert ask(cache, "What's PAD?") == "PAD is narrowing of the leg arteries."
+    ask(cache, "How do I walk more?")
+
+    assert asked == ["What is PAD?", "How do I walk more?"]
+    assert cache.semantic_hits == 1
+    assert scan_threads and threading.get_ident() not in scan_threads
+
+
+def test_semantic_index_is_bounded_per_scope():
+    cache = ResponseCache(semantic=True, max_entries=100, semantic_max_entries=3)
+    scope = cache.scope("gpt-4.1")
+    for i in range(5):
+        cache.put(scope, f"q{i}", "answer", unit_vector([1.0, float(i)]))
+
+    index = cache._index[scope]
+    assert list(index) == [cache.make_key(scope, f"q{i}") for i in (2, 3, 4)]
+    # Exact-match entries are kept beyond the semantic bound
+    assert cache.stats()["entries"] == 5
+    assert cache.stats()["semantic_entries"] == 3
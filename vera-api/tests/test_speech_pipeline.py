@@ -0,0 +1,76 @@
+"""
+Sentence splitting and ordered delivery in the streaming TTS pipeline
+"""
+import asyncio
+
+from app.services.speech_pipeline import SpeechPipeline, split_sentences
+
+
+class FakeTTS:
+    """Synthesizes text as its UTF-8 bytes; later sentences finish first"""
+
+    output_format = "mp3_22050_32"
+
+    def __init__(self, fail_on: str = None):
+        self.fail_on = fail_on
+
+    async def generate_speech_async(self, text, output_format=None):
+        await asyncio.sleep(0.01 if len(text) > 50 else 0.03)
+        if self.fail_on and self.fail_on in text:
+            raise RuntimeError("synthesis failed")
+        return "/tmp/clip.mp3", text.encode()
+
+
+def run_pipeline(tts, chunks):
+    async def scenario():
+        pipeline = SpeechPipeline(tts, min_chars=20)
+        frames = []
+
+        async def send_audio(header, audio_bytes):
+            frames.append((header["index"], bytes(audio_bytes)))
+
+        sender = asyncio.create_task(pipeline.send_to(send_audio))
+        for chunk in chunks:
+            pipeline.feed(chunk)
+        pipeline.close()
+        sent = await sender
+        return pipeline, frames, sent
+
+    return asyncio.run(scenario())
+
+
+def test_split_sentences_keeps_remainder():
+    sentences, remainder = split_sentences("Peripheral artery disease is common. It aff", 10)
+    assert sentences == ["Peripheral artery disease is common."]
+    assert remainder == "It aff"
+
+
+def test_split_sentences_merges_short_fragments():
+    sentences, remainder = split_sentences("Yes. PAD affects the legs. ", 20)
+    assert sentences == ["Yes. PAD affects the legs."]
+    assert remainder == ""
+
+
+def test_split_sentences_on_closing_quotes_and_line_breaks():
+    sentences, _ = split_sentences('He said "walk daily." Then rest\n- next item', 5)
+    assert sentences == ['He said "walk daily."', "Then rest"]
+
+
+def test_audio_is_delivered_in_sentence_order():
+    text = "Short first sentence here. " + "A much longer second sentence that finishes sooner. " + "Tail"
+    pipeline, frames, sent = run_pipeline(FakeTTS(), [text[i:i + 7] for i in range(0, len(text), 7)])
+
+    assert [index for index, _ in frames] == [0, 1, 2]
+    assert frames[2][1] == b"Tail"
+    assert sent == 3
+    assert pipeline.complete
+
+
+def test_failed_sentence_marks_pipeline_incomplete():
+    text = "First sentence is fine here. Second sentence will break now. Third one is fine too."
+    pipeline, frames, sent = run_pipeline(FakeTTS(fail_on="break"), [text])
+
+    assert [index for index, _ in frames] == [0, 2]
+    assert sent == 2
+    assert pipeline.failed_sentences == 1
+    assert not pipeline.complete
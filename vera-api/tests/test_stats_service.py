@@ -0,0 +1,88 @@
+"""
+Admin statistics snapshot over the vera_research_stats materialized view
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from app.models.database import Conversation, ResearchID, UserSession
+from app.services.stats_service import StatsService
+
+
+async def add_activity(db, research_id, messages, conversations=1):
+    user = ResearchID(research_id=research_id)
+    db.add(user)
+    await db.flush()
+    db.add(UserSession(research_id_fk=user.id, session_token=f"token-{research_id}"))
+    db.add_all(
+        Conversation(
+            research_id_fk=user.id,
+            conversation_id=f"conv_{research_id}_{i % conversations}",
+            role="user",
+            content=f"m{i}",
+            timestamp=datetime.utcnow() - timedelta(days=2 if i == 0 else 0)
+        )
+        for i in range(messages)
+    )
+    await db.commit()
+
+
+def test_view_is_refreshed_once_per_interval_across_replicas(postgres_db, run_migration):
+    async def scenario():
+        async with postgres_db() as sessions:
+            async with sessions() as db:
+                await run_migration(await db.connection(), "5d2f8a91c4e7")
+                await db.commit()
+                await add_activity(db, "RID001", messages=3, conversations=2)
+
+            replica_a = StatsService(sessions, refresh_interval_seconds=3600)
+            replica_b = StatsService(sessions, refresh_interval_seconds=3600)
+            first = await replica_a.refresh()
+
+            async with sessions() as db:
+                await add_activity(db, "RID002", messages=2)
+
+            # B starts within A's interval, so it reads the view A refreshed
+            stale = await replica_b.refresh()
+            cached = await replica_a.get_stats()
+            forced = await replica_b.refresh(force=True)
+
+            async with sessions() as db:
+                refreshed_at = await db.scalar(text("SELECT refreshed_at FROM vera_stats_refresh"))
+            return first, stale, cached, forced, refreshed_at
+
+    first, stale, cached, forced, refreshed_at = asyncio.run(scenario())
+
+    assert (first.total_messages, first.total_conversations, first.total_sessions) == (3, 2, 1)
+    assert first.messages_last_24h == 2
+
+    # Whole-table totals come from the view; rolling windows and ID counts are live
+    assert (stale.total_messages, stale.total_sessions) == (3, 1)
+    assert (stale.total_research_ids, stale.messages_last_24h, stale.active_sessions_24h) == (2, 3, 2)
+
+    assert cached is first
+    assert (forced.total_messages, forced.total_conversations, forced.total_sessions) == (5, 3, 2)
+    assert refreshed_at is not None
+
+
+def test_interval_elapsed_refreshes_the_view(postgres_db, run_migration):
+    async def scenario():
+        async with postgres_db() as sessions:
+            async with sessions() as db:
+                await run_migration(await db.connection(), "5d2f8a91c4e7")
+                await db.commit()
+                await add_activity(db, "RID001", messages=1)
+
+            stats = StatsService(sessions, refresh_interval_seconds=3600)
+            await stats.refresh()
+
+            async with sessions() as db:
+                await add_activity(db, "RID002", messages=4)
+                # Pretend the last refresh was over an interval ago
+                await db.execute(text("UPDATE vera_stats_refresh SET refreshed_at = now() - interval '2 hours'"))
+                await db.commit()
+
+            return await stats.refresh()
+
+    assert asyncio.run(scenario()).total_messages == 5